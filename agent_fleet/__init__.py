@@ -3,37 +3,47 @@ Frota de Agentes Autônomos
 
 Este pacote implementa um sistema de agentes autônomos que colaboram para resolver tarefas complexas,
 combinando RAG (Retrieval-Augmented Generation), Agentic Systems, CrewAI, HuggingFace e LangFlow.
+
+Nenhum componente pesado é carregado na importação do pacote: modelos, embeddings,
+banco vetorial e equipes são construídos sob demanda pelo registro de componentes
+(ver `agent_fleet.registry`). Use `warmup()` para pré-aquecê-los explicitamente.
 """
 
 __version__ = "0.1.0"
 
-# Importações principais
-from .crew.crew_manager import get_crew_manager
-from .vector_store.vector_store import get_vector_store
-from .models.model_manager import get_model_manager
+import logging
+
+from .registry import registry, get_component, warmup
+
+# Acessores carregados sob demanda (evitam importar crewai/langchain na importação do pacote)
+_LAZY_ATTRS = {
+    'get_crew_manager': 'agent_fleet.crew.crew_manager',
+    'get_vector_store': 'agent_fleet.vector_store.vector_store',
+    'get_model_manager': 'agent_fleet.models.model_manager',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        import importlib
+        module = importlib.import_module(_LAZY_ATTRS[name])
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-# Inicializa os gerenciadores principais
 def init():
-    """Inicializa os componentes principais do sistema."""
+    """Inicializa (pré-aquece) os componentes principais do sistema."""
     try:
-        # Inicializa o gerenciador de modelos
-        model_manager = get_model_manager()
-        
-        # Inicializa o banco de dados vetorial
-        vector_store = get_vector_store()
-        
-        # Inicializa o gerenciador de equipes
-        crew_manager = get_crew_manager()
-        
+        timings = warmup()
+        logging.getLogger(__name__).info(
+            "Sistema inicializado: " + ", ".join(f"{name}={elapsed:.2f}s" for name, elapsed in timings.items())
+        )
+
         return {
-            'model_manager': model_manager,
-            'vector_store': vector_store,
-            'crew_manager': crew_manager
+            'model_manager': registry.get("models"),
+            'vector_store': registry.get("vector_store"),
+            'crew_manager': registry.get("crew")
         }
     except Exception as e:
-        import logging
         logging.error(f"Erro ao inicializar o sistema: {str(e)}")
         raise
-
-# Inicializa o sistema quando o pacote é importado
-init()
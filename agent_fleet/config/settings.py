@@ -20,10 +20,82 @@ class Settings(BaseSettings):
     VECTOR_STORE_PATH: str = "./data/vector_store"
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
+    VECTOR_STORE_MAX_SEGMENTS: int = 32  # segmentos anexados antes de forçar compação
+    VECTOR_STORE_COMPACTION_RATIO: float = 0.5  # compacta quando segmentos > base * razão
+    VECTOR_STORE_MMAP: bool = False  # carrega a base mapeada em memória (somente leitura)
+    VECTOR_STORE_DEDUP: bool = True  # ignora chunks com conteúdo já indexado
+    VECTOR_STORE_NEAR_DEDUP: str = ""  # "" | simhash | vector
+    VECTOR_STORE_SIMHASH_DISTANCE: int = 3  # bits de diferença tolerados no SimHash
+    VECTOR_STORE_NEAR_DEDUP_DISTANCE: float = 0.05  # distância L2² máxima no modo vector
+    VECTOR_STORE_INDEX_TYPE: str = "flat"  # flat | ivf_flat | ivf_pq | hnsw | sq8 | int8_rerank | binary_rerank
+    VECTOR_STORE_NLIST: int = 0  # listas IVF (0 = ~4 * sqrt(N))
+    VECTOR_STORE_NPROBE: int = 8  # listas IVF visitadas por busca
+    VECTOR_STORE_HNSW_M: int = 32
+    VECTOR_STORE_EF_SEARCH: int = 64
+    VECTOR_STORE_PQ_M: int = 64  # subquantizadores PQ (deve dividir EMBEDDING_DIM)
+    VECTOR_STORE_MIN_TRAIN_SIZE: int = 10000  # abaixo disso o índice permanece exato
+    VECTOR_STORE_RETRAIN_GROWTH: float = 4.0  # retreina quando o corpus cresce esse fator
+    VECTOR_STORE_METADATA_INDEX: bool = True  # pré-filtragem por metadados via índice invertido
+    VECTOR_STORE_METADATA_FIELDS: List[str] = []  # campos indexados (vazio = todos)
+    VECTOR_STORE_MICRO_BATCH_MS: float = 0.0  # janela para agrupar consultas concorrentes (0 = desativado; cada busca espera até esse tempo)
+    VECTOR_STORE_MICRO_BATCH_SIZE: int = 64  # máximo de consultas por lote
+    VECTOR_STORE_MICRO_BATCH_TIMEOUT: float = 30.0  # segundos de espera por um lote antes de buscar diretamente
+    VECTOR_STORE_QUERY_CACHE_SIZE: int = 1024  # resultados de busca em cache (0 = desativado)
+    VECTOR_STORE_QUERY_CACHE_TTL: float = 300  # segundos (0 = sem expiração)
+    VECTOR_STORE_QUERY_CACHE_SIMILARITY: float = 0.0  # cosseno mínimo para acerto semântico (0 = só exato)
+    VECTOR_STORE_BM25: bool = True  # índice léxico BM25 para a busca híbrida
+    VECTOR_STORE_BM25_K1: float = 1.2
+    VECTOR_STORE_BM25_B: float = 0.75
+    VECTOR_STORE_RRF_K: int = 60  # constante do Reciprocal Rank Fusion
+    VECTOR_STORE_SHARDS: int = 0  # processos shard (0 = sem particionamento)
+    VECTOR_STORE_SHARD_PARTITION: str = "hash"  # hash (do conteúdo) | tenant
+    VECTOR_STORE_SHARD_TENANT_FIELD: str = "tenant"  # campo de metadados usado no particionamento por tenant
+    VECTOR_STORE_ID_FIELD: str = "id"  # campo de metadados usado como ID estável (vazio = IDs gerados)
+    VECTOR_STORE_TOMBSTONE_RATIO: float = 0.2  # fração de linhas excluídas que dispara a compação
+    VECTOR_STORE_SNAPSHOTS_KEEP: int = 2  # versões da base mantidas em disco para leitores atrasados
+    VECTOR_STORE_RELOAD_INTERVAL: float = 0.0  # segundos entre verificações de nova versão (0 = desativado)
+    VECTOR_STORE_READ_ONLY: bool = False  # processo apenas lê o banco escrito por outro processo
+    VECTOR_STORE_RERANK_FACTOR: int = 4  # candidatos da primeira passada por resultado (*_rerank)
+    INGESTION_BATCH_SIZE: int = 256  # chunks por lote de embedding na ingestão
+    INGESTION_WORKERS: int = 0  # processos de leitura/divisão (0 = núcleos disponíveis)
     
     # Configurações dos Modelos
     EMBEDDING_MODEL: str = "sentence-transformers/all-mpnet-base-v2"
     EMBEDDING_DIM: int = 768
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_MAX_SEQ_LENGTH: int = 0  # 0 = padrão do modelo
+    EMBEDDING_WORKERS: int = 0  # processos de codificação (0 ou 1 = processo atual)
+    EMBEDDING_BACKEND: str = "torch"  # torch | torch-int8 | onnx | openvino
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "./data/embedding_cache.sqlite"
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 10000  # vetores mantidos no LRU em memória
+    EMBEDDING_CACHE_MAX_BYTES: int = 1024 ** 3  # limite do arquivo em disco
+    MODEL_PRELOAD: List[str] = []  # modelos construídos no aquecimento (os demais, no primeiro uso)
+    MODEL_RETRY_BACKOFF: float = 5.0  # segundos antes de tentar de novo um modelo que falhou
+    MODEL_RETRY_BACKOFF_MAX: float = 300.0  # teto do intervalo (dobra a cada falha consecutiva)
+    LLM_CACHE_ENABLED: bool = True  # cache de respostas (por modelo: "cache" em AVAILABLE_MODELS = True | False | "sampled")
+    LLM_CACHE_PATH: str = "./data/llm_cache.sqlite"
+    LLM_CACHE_MEMORY_ITEMS: int = 1000  # respostas mantidas no LRU em memória
+    LLM_CACHE_MAX_BYTES: int = 256 * 1024 ** 2  # limite do arquivo em disco
+    LLM_CACHE_DETERMINISTIC_ONLY: bool = True  # só cacheia chamadas com temperatura 0 (exceto modelos com "cache": "sampled")
+    LOCAL_LLM_BACKEND: str = "torch"  # torch | torch-int8 (modelos ModelType.LOCAL)
+    LOCAL_LLM_MAX_BATCH_SIZE: int = 8  # gerações simultâneas no lote contínuo
+    LOCAL_LLM_MAX_INPUT_TOKENS: int = 2048  # prompts maiores são truncados pela esquerda
+    LOCAL_LLM_THREADS: int = 0  # threads do torch (0 = padrão)
+    LLM_CLIENT_POOLED: bool = False  # chama as APIs pelo cliente assíncrono em vez dos wrappers do LangChain
+    OPENAI_API_BASE: str = "https://api.openai.com/v1"
+    HUGGINGFACE_API_BASE: str = "https://api-inference.huggingface.co"
+    LLM_CLIENT_MAX_CONNECTIONS: int = 100
+    LLM_CLIENT_MAX_KEEPALIVE: int = 20  # conexões ociosas mantidas abertas
+    LLM_CLIENT_TIMEOUT: float = 120.0  # segundos por requisição
+    LLM_CLIENT_CONCURRENCY: int = 8  # requisições simultâneas por modelo ("concurrency" no modelo)
+    LLM_CLIENT_RATE_LIMIT: float = 0.0  # requisições/s por modelo ("rate_limit" no modelo; 0 = sem limite)
+    LLM_CLIENT_BURST: int = 0  # rajada do token bucket (0 = concorrência)
+    LLM_CLIENT_RETRIES: int = 3  # novas tentativas em erros de rede, 429 e 5xx
+    LLM_CLIENT_BACKOFF: float = 0.5  # base do backoff exponencial com jitter (segundos)
+    LLM_CLIENT_BACKOFF_MAX: float = 20.0
+    LLM_CLIENT_HEDGE: bool = False  # duplica requisições mais lentas que o p95 observado
+    LLM_CLIENT_HEDGE_MIN_DELAY: float = 2.0  # espera mínima antes da cópia (segundos)
     
     # Modelos disponíveis
     AVAILABLE_MODELS: Dict[str, Dict] = {
@@ -31,7 +103,8 @@ class Settings(BaseSettings):
             "type": ModelType.OPENAI,
             "name": "gpt-4",
             "temperature": 0.7,
-            "max_tokens": 2000
+            "max_tokens": 2000,
+            "cost_per_1k_tokens": 0.06
         },
         "llama2-7b": {
             "type": ModelType.HUGGINGFACE,
@@ -44,16 +117,44 @@ class Settings(BaseSettings):
             "name": "google/flan-t5-xxl",
             "temperature": 0.7,
             "max_length": 2000
+        },
+        "tinyllama-local": {
+            "type": ModelType.LOCAL,
+            "name": "TinyLlama/TinyLlama-1.1B-Chat-v1.0",
+            "path": "./models/tinyllama-1.1b-chat",
+            "temperature": 0.7,
+            "max_tokens": 512
         }
     }
     
+    # Roteamento entre modelos (objetivo: quality = ordem da lista | latency = menor latência estimada |
+    # cost = menor "cost_per_1k_tokens", com desempate pela latência)
+    MODEL_ROUTING_ENABLED: bool = True
+    MODEL_ROUTING_POLICIES: Dict[str, Dict] = {
+        "strong": {"models": ["gpt-4", "llama2-7b"], "objective": "quality"},
+        "fast": {"models": ["flan-t5-xxl", "llama2-7b", "gpt-4"], "objective": "cost"}
+    }
+    MODEL_ROUTER_WINDOW: int = 100  # chamadas recentes consideradas por modelo
+    MODEL_ROUTER_DEFAULT_LATENCY: float = 5.0  # p95 assumido (segundos) para modelos ainda sem medições
+    MODEL_BREAKER_FAILURES: int = 5  # falhas seguidas que abrem o circuito
+    MODEL_BREAKER_ERROR_RATE: float = 0.5  # taxa de erro na janela que abre o circuito
+    MODEL_BREAKER_COOLDOWN: float = 30.0  # segundos com o circuito aberto antes de testar de novo
+    
     # Configurações da Interface Web
     STREAMLIT_PORT: int = 8501
     STREAMLIT_THEME: str = "light"
     
     # Configurações dos Agentes
-    AGENT_TIMEOUT: int = 300  # segundos
-    MAX_ITERATIONS: int = 10
+    AGENT_TIMEOUT: int = 300  # segundos por execução (equipe, grafo ou agente)
+    CREW_MAX_PARALLEL_TASKS: int = 4  # tarefas independentes executadas ao mesmo tempo (run_task_graph)
+    CREW_REGISTRY_MAX_ITEMS: int = 256  # tarefas e equipes mantidas em memória (LRU)
+    CREW_REGISTRY_TTL: float = 3600  # segundos até descartar tarefas/equipes (0 = sem expiração)
+    CREW_AGENT_POOL_SIZE: int = 4  # cópias ociosas de cada agente para o caminho rápido
+    AGENT_MODEL_POLICIES: Dict[str, str] = {"researcher": "strong", "analyst": "strong", "executor": "fast"}
+    MAX_ITERATIONS: int = 10  # passos de cada agente por tarefa
+    RUN_MAX_ITERATIONS: int = 0  # passos de todos os agentes por execução (0 = sem limite)
+    RUN_MAX_TOKENS: int = 0  # tokens por execução (0 = sem limite)
+    RUN_MAX_COST: float = 0.0  # custo por execução, pelo "cost_per_1k_tokens" dos modelos (0 = sem limite)
     
     # Configurações de Memória
     SHORT_TERM_MEMORY_LIMIT: int = 10  # itens
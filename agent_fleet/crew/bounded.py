@@ -0,0 +1,94 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, MutableMapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedRegistry(MutableMapping):
+    """Dicionário thread-safe com limite de itens (LRU) e expiração por tempo (TTL).
+
+    Usado para tarefas e equipes do `CrewManager`, que antes cresciam sem limite
+    em servidores de longa duração. Ler um item renova sua posição no LRU e o
+    prazo; itens sem acesso há mais de `ttl_seconds` são descartados.
+    `on_evict(chave, valor)` é chamado para cada item removido por limite ou expiração.
+    """
+
+    def __init__(
+        self,
+        max_items: int = 256,
+        ttl_seconds: float = 0,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None
+    ):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self._items: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._metrics = {"evictions": 0, "expirations": 0}
+
+    def _expired(self, touched: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - touched > self.ttl_seconds
+
+    def _discard(self, key: Hashable, metric: str):
+        value, _ = self._items.pop(key)
+        self._metrics[metric] += 1
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def __getitem__(self, key: Hashable) -> Any:
+        with self._lock:
+            value, touched = self._items[key]
+            now = time.monotonic()
+            if self._expired(touched, now):
+                self._discard(key, "expirations")
+                raise KeyError(key)
+            self._items[key] = (value, now)
+            self._items.move_to_end(key)
+            return value
+
+    def __setitem__(self, key: Hashable, value: Any):
+        with self._lock:
+            self._items[key] = (value, time.monotonic())
+            self._items.move_to_end(key)
+            self.purge()
+            while self.max_items > 0 and len(self._items) > self.max_items:
+                self._discard(next(iter(self._items)), "evictions")
+
+    def __delitem__(self, key: Hashable):
+        with self._lock:
+            del self._items[key]
+
+    def __iter__(self) -> Iterator[Hashable]:
+        with self._lock:
+            self.purge()
+            return iter(list(self._items.keys()))
+
+    def __len__(self) -> int:
+        with self._lock:
+            self.purge()
+            return len(self._items)
+
+    def evict(self, key: Hashable):
+        """Remove um item (se existir) como uma remoção por limite, chamando `on_evict`."""
+        with self._lock:
+            if key in self._items:
+                self._discard(key, "evictions")
+
+    def purge(self):
+        """Remove os itens expirados."""
+        if self.ttl_seconds <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, touched) in self._items.items() if self._expired(touched, now)]
+            for key in expired:
+                # `on_evict` pode ter removido itens da lista em cascata
+                if key in self._items:
+                    self._discard(key, "expirations")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._metrics, items=len(self._items))
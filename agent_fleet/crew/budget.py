@@ -0,0 +1,273 @@
+"""
+Orçamentos de execução (prazo, passos, tokens e custo) com cancelamento cooperativo.
+
+Uma execução (equipe, grafo de tarefas ou agente) roda dentro de um
+`budget_scope`, que torna o `RunBudget` visível por contextvar para todo o
+código chamado a partir dela. Um handler de callbacks registrado no LangChain
+entra automaticamente em todas as chamadas de LLM e ferramentas desse
+contexto: antes de cada uma verifica o orçamento (levantando
+`BudgetExceeded` se o prazo acabou ou a execução foi cancelada) e, ao final
+das chamadas aos modelos, contabiliza tokens e custo. Os passos dos agentes
+são contados pelo `step_callback` do crewai.
+
+O crewai não usa os callbacks do LangChain (chama os modelos pelo LiteLLM ou
+por `BaseLLM.call`): os agentes recebem os adaptadores de
+`agent_fleet.models.crew_llm`, que verificam o orçamento a cada chamada e
+repassam o prompt a um LLM do LangChain, onde o handler faz a contabilização.
+
+Threads novas não herdam contextvars: quem dispara trabalho em outra thread
+deve usar `contextvars.copy_context().run` (como `run_dag` e `run_with_budget`).
+Tarefas com `async_execution` rodam em threads do próprio crewai e ficam fora
+do orçamento.
+"""
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+from agent_fleet.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Wrappers que delegam a outro LLM; só a chamada final ao modelo é contabilizada
+_WRAPPER_TYPES = ("routed",)
+_WRAPPER_PREFIXES = ("cached-",)
+
+
+class BudgetExceeded(RuntimeError):
+    """Prazo, passos, tokens ou custo da execução esgotados (ou execução cancelada)."""
+
+
+class RunBudget:
+    """Limites de uma execução; valores 0 ou `None` desativam o limite correspondente."""
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        max_iterations: int = 0,
+        max_tokens: int = 0,
+        max_cost: float = 0.0
+    ):
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.max_iterations = max_iterations
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.iterations = 0
+        self.tokens = 0
+        self.cost = 0.0
+        self.reason: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, timeout: Optional[float] = None) -> "RunBudget":
+        """Orçamento padrão: `AGENT_TIMEOUT` e os limites `RUN_MAX_*`."""
+        return cls(
+            timeout=timeout if timeout is not None else settings.AGENT_TIMEOUT,
+            max_iterations=settings.RUN_MAX_ITERATIONS,
+            max_tokens=settings.RUN_MAX_TOKENS,
+            max_cost=settings.RUN_MAX_COST
+        )
+
+    def remaining(self) -> Optional[float]:
+        """Segundos até o prazo (`None` sem prazo; 0 se já passou)."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason: str = "execução cancelada"):
+        """Pede a interrupção da execução; o código em andamento para no próximo ponto de verificação."""
+        with self._lock:
+            if self.reason is None:
+                self.reason = reason
+                logger.warning(f"Execução interrompida: {reason}")
+
+    def exhausted(self) -> bool:
+        """Indica se a execução deve parar (marcando o motivo se o prazo acabou)."""
+        if self.reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel(f"tempo esgotado ({self.timeout:g}s)")
+        return self.reason is not None
+
+    def check(self):
+        """Levanta `BudgetExceeded` se a execução deve parar."""
+        if self.exhausted():
+            raise BudgetExceeded(self.reason)
+
+    def add_iteration(self):
+        """Conta um passo de agente e verifica o orçamento."""
+        with self._lock:
+            self.iterations += 1
+            over = self.max_iterations and self.iterations > self.max_iterations
+        if over:
+            self.cancel(f"limite de {self.max_iterations} passos atingido")
+        self.check()
+
+    def add_usage(self, tokens: int, cost: float = 0.0):
+        """Contabiliza o consumo de uma chamada ao modelo."""
+        with self._lock:
+            self.tokens += tokens
+            self.cost += cost
+            over_tokens = self.max_tokens and self.tokens > self.max_tokens
+            over_cost = self.max_cost and self.cost > self.max_cost
+        if over_tokens:
+            self.cancel(f"limite de {self.max_tokens} tokens atingido")
+        elif over_cost:
+            self.cancel(f"limite de custo {self.max_cost:.2f} atingido")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "iterations": self.iterations,
+                "tokens": self.tokens,
+                "cost": round(self.cost, 6),
+                "remaining": self.remaining(),
+                "reason": self.reason
+            }
+
+
+class PartialResult(str):
+    """Saídas concluídas de uma execução interrompida; `reason` diz qual limite foi atingido."""
+
+    partial = True
+
+    def __new__(cls, outputs: List[str], reason: Optional[str]):
+        result = super().__new__(cls, "\n\n".join(outputs))
+        result.outputs = outputs
+        result.reason = reason
+        return result
+
+
+def _model_cost(params: Dict[str, Any]) -> float:
+    """Preço por 1k tokens (`cost_per_1k_tokens` em AVAILABLE_MODELS) do modelo chamado."""
+    model_id = params.get("model_id")
+    config = settings.AVAILABLE_MODELS.get(model_id) if model_id else None
+    if config is None:
+        name = params.get("model_name") or params.get("model") or params.get("repo_id")
+        config = next((c for c in settings.AVAILABLE_MODELS.values() if c.get("name") == name), {})
+    return float(config.get("cost_per_1k_tokens", 0.0))
+
+
+class BudgetCallbackHandler(BaseCallbackHandler):
+    """Verifica o orçamento antes de cada chamada de LLM/ferramenta e contabiliza o consumo."""
+
+    # Exceções dos callbacks interrompem a chamada em vez de só serem registradas
+    raise_error = True
+
+    def __init__(self, budget: RunBudget):
+        self.budget = budget
+        self._calls: Dict[UUID, Tuple[int, float]] = {}
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any):
+        self.budget.check()
+        params = kwargs.get("invocation_params") or {}
+        llm_type = str(params.get("_type", ""))
+        if llm_type in _WRAPPER_TYPES or llm_type.startswith(_WRAPPER_PREFIXES):
+            return
+        self._calls[run_id] = (sum(len(prompt) for prompt in prompts), _model_cost(params))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+        prompt_chars, price = call
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        tokens = usage.get("total_tokens")
+        if not tokens:
+            # Sem contagem do provedor: estimativa de ~4 caracteres por token
+            output_chars = sum(len(g.text) for generations in response.generations for g in generations)
+            tokens = (prompt_chars + output_chars) // 4
+        self.budget.add_usage(tokens, tokens / 1000 * price)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._calls.pop(run_id, None)
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs: Any):
+        self.budget.check()
+
+    def on_agent_action(self, action: Any, **kwargs: Any):
+        self.budget.add_iteration()
+
+
+_current_budget: contextvars.ContextVar[Optional[RunBudget]] = contextvars.ContextVar(
+    "agent_fleet_budget", default=None
+)
+_budget_handler: contextvars.ContextVar[Optional[BudgetCallbackHandler]] = contextvars.ContextVar(
+    "agent_fleet_budget_handler", default=None
+)
+register_configure_hook(_budget_handler, inheritable=True)
+
+
+def current_budget() -> Optional[RunBudget]:
+    """Orçamento da execução em andamento neste contexto, se houver."""
+    return _current_budget.get()
+
+
+def check_budget():
+    """Ponto de cancelamento cooperativo: levanta `BudgetExceeded` se a execução deve parar."""
+    budget = _current_budget.get()
+    if budget is not None:
+        budget.check()
+
+
+def remaining_time() -> Optional[float]:
+    """Segundos até o prazo da execução em andamento (`None` fora de uma execução ou sem prazo)."""
+    budget = _current_budget.get()
+    return budget.remaining() if budget is not None else None
+
+
+def budget_step_callback(step: Any):
+    """`step_callback` dos agentes do crewai: conta o passo e interrompe se o orçamento acabou."""
+    budget = _current_budget.get()
+    if budget is not None:
+        budget.add_iteration()
+
+
+@contextmanager
+def budget_scope(budget: RunBudget) -> Iterator[RunBudget]:
+    """Torna `budget` o orçamento do contexto atual (e das chamadas de LLM feitas nele)."""
+    budget_token = _current_budget.set(budget)
+    handler_token = _budget_handler.set(BudgetCallbackHandler(budget))
+    try:
+        yield budget
+    finally:
+        _budget_handler.reset(handler_token)
+        _current_budget.reset(budget_token)
+
+
+def run_with_budget(fn: Callable[[], Any], budget: RunBudget) -> Tuple[bool, Any]:
+    """Executa `fn` em uma thread própria sob o orçamento, aguardando no máximo até o prazo.
+
+    Retorna `(True, resultado)` ou `(False, None)` se o orçamento acabou; nesse
+    caso a execução é cancelada e a thread termina no próximo ponto de
+    verificação. Outras exceções de `fn` são propagadas.
+    """
+    outcome: Dict[str, Any] = {}
+
+    def target():
+        with budget_scope(budget):
+            try:
+                outcome["value"] = fn()
+            except BaseException as e:
+                outcome["error"] = e
+
+    context = contextvars.copy_context()
+    thread = threading.Thread(target=context.run, args=(target,), name="agent-fleet-run", daemon=True)
+    thread.start()
+    thread.join(budget.remaining())
+    if thread.is_alive():
+        budget.exhausted()
+        budget.cancel("tempo esgotado")
+        return False, None
+
+    error = outcome.get("error")
+    if error is not None:
+        if budget.exhausted():
+            logger.warning(f"Execução interrompida pelo orçamento: {str(error)}")
+            return False, None
+        raise error
+    return True, outcome["value"]
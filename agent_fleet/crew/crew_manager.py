@@ -3,9 +3,17 @@ from langchain.agents import Tool
 from langchain.tools import BaseTool
 from langchain.memory import ConversationBufferMemory
 from crewai import Agent, Task, Crew
+from agent_fleet.config.settings import settings
 from agent_fleet.models.model_manager import get_model_manager
-from agent_fleet.vector_store.vector_store import get_vector_store
+from agent_fleet.crew.dag import DagExecutionError, DagRun, run_dag
+from agent_fleet.crew.budget import (
+    PartialResult, RunBudget, budget_scope, budget_step_callback, check_budget, run_with_budget
+)
+from agent_fleet.crew.bounded import BoundedRegistry
+from agent_fleet.vector_store.vector_store import acquire_vector_store
 import logging
+import threading
+from collections import deque
 
 logger = logging.getLogger(__name__)
 
@@ -14,12 +22,33 @@ class CrewManager:
     
     def __init__(self):
         self.model_manager = get_model_manager()
-        self.vector_store = get_vector_store()
+        self.vector_store = acquire_vector_store()
         self.agents: Dict[str, Any] = {}
-        self.tasks: Dict[str, Any] = {}
-        self.crews: Dict[str, Any] = {}
+        # Tarefas e equipes limitadas por LRU/TTL (evita crescimento sem limite em servidores)
+        self.tasks = BoundedRegistry(
+            settings.CREW_REGISTRY_MAX_ITEMS,
+            settings.CREW_REGISTRY_TTL,
+            on_evict=self._on_task_evicted
+        )
+        self.task_dependencies: Dict[str, List[str]] = {}
+        self.crews = BoundedRegistry(settings.CREW_REGISTRY_MAX_ITEMS, settings.CREW_REGISTRY_TTL)
+        # Equipes com `kickoff` em andamento (inclusive execuções já interrompidas pelo orçamento)
+        self._running_crews: set = set()
+        self._running_lock = threading.Lock()
+        # Cópias ociosas de cada agente para o caminho rápido (`run_agent`), por versão do agente
+        self._agent_pool: Dict[str, deque] = {}
+        self._agent_versions: Dict[str, int] = {}
+        self._pool_lock = threading.Lock()
         self._initialize_default_agents()
     
+    def _on_task_evicted(self, task_id: str, task: Task):
+        """Descarta também as tarefas que dependem da removida (o grafo delas ficaria incompleto)."""
+        self.task_dependencies.pop(task_id, None)
+        dependents = [other for other, deps in self.task_dependencies.items() if task_id in deps]
+        for dependent in dependents:
+            logger.info(f"Tarefa {dependent} descartada junto com a dependência {task_id}.")
+            self.tasks.evict(dependent)
+    
     def _initialize_default_agents(self):
         """Inicializa os agentes padrão da frota."""
         # Agente de Pesquisa
@@ -29,7 +58,8 @@ class CrewManager:
             goal="Encontrar e analisar informações relevantes de forma precisa",
             backstory="""Você é um especialista em pesquisa que usa ferramentas avançadas para 
             encontrar informações precisas e relevantes em diversas fontes.""",
-            model_name="gpt-4"
+            model_name="gpt-4",
+            model_policy=settings.AGENT_MODEL_POLICIES.get("researcher")
         )
         
         # Agente de Análise
@@ -39,7 +69,8 @@ class CrewManager:
             goal="Analisar dados e gerar insights valiosos",
             backstory="""Você é um analista especializado em transformar dados complexos em 
             insights acionáveis e compreensíveis.""",
-            model_name="gpt-4"
+            model_name="gpt-4",
+            model_policy=settings.AGENT_MODEL_POLICIES.get("analyst")
         )
         
         # Agente Executor
@@ -49,17 +80,29 @@ class CrewManager:
             goal="Executar tarefas com base nas informações fornecidas",
             backstory="""Você é um executor eficiente que transforma planos e instruções em 
             ações concretas e resultados mensuráveis.""",
-            model_name="gpt-4"
+            model_name="gpt-4",
+            model_policy=settings.AGENT_MODEL_POLICIES.get("executor")
         )
     
     def add_agent(self, agent_id: str, role: str, goal: str, backstory: str, 
                  model_name: str = "gpt-4", tools: Optional[List[BaseTool]] = None,
-                 verbose: bool = True) -> Agent:
-        """Adiciona um novo agente à frota."""
+                 verbose: bool = True, model_policy: Optional[str] = None) -> Agent:
+        """Adiciona um novo agente à frota.
+        
+        Com `model_policy` (e `MODEL_ROUTING_ENABLED`), o agente usa o modelo
+        escolhido pelo roteador a cada chamada em vez de `model_name`. Cada
+        tarefa do agente fica limitada a `MAX_ITERATIONS` passos, e cada passo
+        e chamada ao modelo contam no orçamento da execução. O prazo é o do
+        orçamento: o `max_execution_time` do crewai executaria o agente em
+        outra thread, fora do contexto do orçamento.
+        """
         if agent_id in self.agents:
             logger.warning(f"Agente com ID '{agent_id}' já existe. Atualizando...")
         
-        llm = self.model_manager.get_model(model_name)
+        if model_policy and settings.MODEL_ROUTING_ENABLED:
+            llm = self.model_manager.get_routed_crew_llm(model_policy)
+        else:
+            llm = self.model_manager.get_crew_llm(model_name)
         
         agent = Agent(
             role=role,
@@ -68,39 +111,60 @@ class CrewManager:
             verbose=verbose,
             llm=llm,
             allow_delegation=True,
-            tools=tools or []
+            tools=tools or [],
+            max_iter=settings.MAX_ITERATIONS,
+            step_callback=budget_step_callback
         )
         
         self.agents[agent_id] = agent
+        self._reset_agent_pool(agent_id)
         return agent
     
     def add_task(self, task_id: str, description: str, agent_id: str, 
-                expected_output: str = "", async_execution: bool = False) -> Task:
-        """Adiciona uma nova tarefa à frota."""
+                expected_output: str = "", async_execution: bool = False,
+                depends_on: Optional[List[str]] = None) -> Task:
+        """Adiciona uma nova tarefa à frota.
+        
+        `depends_on` lista as tarefas cujas saídas esta tarefa recebe como
+        contexto; `run_task_graph` executa o grafo resultante em paralelo.
+        """
         if agent_id not in self.agents:
             raise ValueError(f"Agente com ID '{agent_id}' não encontrado.")
+        depends_on = list(depends_on or [])
+        missing = [dep for dep in depends_on if dep not in self.tasks]
+        if missing:
+            raise ValueError(f"Tarefas de dependência não encontradas: {', '.join(missing)}")
         
+        # Sem dependências declaradas, mantém o contexto padrão do crewai (saídas anteriores)
+        dependencies = {"context": [self.tasks[dep] for dep in depends_on]} if depends_on else {}
         task = Task(
             description=description,
             agent=self.agents[agent_id],
             expected_output=expected_output or description,
-            async_execution=async_execution
+            async_execution=async_execution,
+            **dependencies
         )
         
         self.tasks[task_id] = task
+        self.task_dependencies[task_id] = depends_on
         return task
     
     def create_crew(self, crew_id: str, task_ids: List[str], 
-                   verbose: int = 2, process: str = "sequential") -> Crew:
-        """Cria uma nova equipe de agentes para executar tarefas."""
+                   verbose: int = 2, process: str = "sequential",
+                   agent_ids: Optional[List[str]] = None) -> Crew:
+        """Cria uma nova equipe de agentes para executar tarefas.
+        
+        `agent_ids` restringe os agentes da equipe (padrão: todos os agentes da frota).
+        """
         tasks = [self.tasks[task_id] for task_id in task_ids 
                 if task_id in self.tasks]
         
         if not tasks:
             raise ValueError("Nenhuma tarefa válida fornecida.")
         
+        agents = list(self.agents.values()) if agent_ids is None else [self.get_agent(agent_id) for agent_id in agent_ids]
         crew = Crew(
-            agents=list(self.agents.values()),
+            agents=agents,
             tasks=tasks,
             verbose=verbose,
             process=process
@@ -109,17 +173,160 @@ class CrewManager:
         self.crews[crew_id] = crew
         return crew
     
-    def run_crew(self, crew_id: str, inputs: Optional[Dict] = None) -> str:
-        """Executa uma equipe de agentes."""
+    def run_crew(self, crew_id: str, inputs: Optional[Dict] = None,
+                 budget: Optional[RunBudget] = None) -> str:
+        """Executa uma equipe de agentes dentro de um orçamento (padrão: `RunBudget.from_settings()`).
+        
+        Se o prazo, os passos, os tokens ou o custo acabarem, a execução é
+        cancelada e o retorno é um `PartialResult` com as saídas das tarefas
+        já concluídas. A execução interrompida termina em segundo plano no
+        próximo ponto de verificação; até lá, novas execuções da mesma equipe
+        (que compartilham as mesmas `Task`) são recusadas com `RuntimeError`.
+        """
         if crew_id not in self.crews:
             raise ValueError(f"Equipe com ID '{crew_id}' não encontrada.")
         
+        crew = self.crews[crew_id]
+        with self._running_lock:
+            if crew_id in self._running_crews:
+                raise RuntimeError(f"Equipe '{crew_id}' já está em execução.")
+            self._running_crews.add(crew_id)
+        
+        def kickoff():
+            try:
+                return crew.kickoff(inputs=inputs)
+            finally:
+                with self._running_lock:
+                    self._running_crews.discard(crew_id)
+        
+        budget = budget or RunBudget.from_settings()
+        previous_outputs = {id(task): task.output for task in crew.tasks}
         try:
-            result = self.crews[crew_id].kickoff(inputs=inputs)
-            return result
+            finished, result = run_with_budget(kickoff, budget)
         except Exception as e:
             logger.error(f"Erro ao executar a equipe {crew_id}: {str(e)}")
             raise
+        if finished:
+            return result
+        
+        outputs = [
+            task.output.raw for task in crew.tasks
+            if task.output is not None and task.output is not previous_outputs.get(id(task))
+        ]
+        logger.warning(
+            f"Equipe {crew_id} interrompida ({budget.reason}) com {len(outputs)} de {len(crew.tasks)} tarefas concluídas."
+        )
+        return PartialResult(outputs, budget.reason)
+    
+    def run_agent(self, agent_id: str, description: str, expected_output: str = "",
+                  context: Optional[str] = None, budget: Optional[RunBudget] = None) -> str:
+        """Caminho rápido: executa uma única tarefa com um único agente, sem montar uma `Crew`.
+        
+        A tarefa é efêmera (não entra em `self.tasks`) e o agente vem de um pool
+        de cópias reutilizáveis, o que permite atender sessões simultâneas.
+        Se o orçamento acabar, retorna um `PartialResult` vazio com o motivo.
+        """
+        agent, version = self._checkout_agent(agent_id)
+        budget = budget or RunBudget.from_settings()
+        
+        def execute():
+            task = Task(
+                description=description,
+                agent=agent,
+                expected_output=expected_output or description
+            )
+            return task.execute_sync(agent=agent, context=context)
+        
+        try:
+            finished, output = run_with_budget(execute, budget)
+        except Exception as e:
+            logger.error(f"Erro ao executar o agente {agent_id}: {str(e)}")
+            raise
+        if not finished:
+            # A cópia pode continuar ocupada até o próximo ponto de verificação: não volta ao pool
+            logger.warning(f"Agente {agent_id} interrompido: {budget.reason}")
+            return PartialResult([], budget.reason)
+        # Cópias que falharam são descartadas; as demais voltam ao pool
+        self._checkin_agent(agent_id, agent, version)
+        return output.raw
+    
+    def _checkout_agent(self, agent_id: str):
+        template = self.get_agent(agent_id)
+        with self._pool_lock:
+            version = self._agent_versions.get(agent_id, 0)
+            idle = self._agent_pool.get(agent_id)
+            if idle:
+                return idle.pop(), version
+        return template.copy(), version
+    
+    def _checkin_agent(self, agent_id: str, agent: Agent, version: int):
+        with self._pool_lock:
+            if self._agent_versions.get(agent_id, 0) != version:
+                return
+            idle = self._agent_pool.setdefault(agent_id, deque())
+            if len(idle) < settings.CREW_AGENT_POOL_SIZE:
+                idle.append(agent)
+    
+    def _reset_agent_pool(self, agent_id: str):
+        """Descarta as cópias do agente (ele foi substituído ou alterado)."""
+        with self._pool_lock:
+            self._agent_versions[agent_id] = self._agent_versions.get(agent_id, 0) + 1
+            self._agent_pool.pop(agent_id, None)
+    
+    def run_task_graph(self, task_ids: List[str], inputs: Optional[Dict] = None,
+                       max_parallel: Optional[int] = None,
+                       budget: Optional[RunBudget] = None) -> DagRun:
+        """Executa as tarefas (e suas dependências) como um DAG, com paralelismo limitado.
+        
+        Cada tarefa roda assim que suas dependências terminam, em uma equipe
+        própria com uma cópia do agente (o mesmo agente pode atender tarefas
+        simultâneas); as saídas das dependências chegam como contexto. O
+        resultado traz as saídas, o tempo de cada tarefa e o caminho crítico.
+        
+        Se o orçamento acabar, nenhuma tarefa nova é iniciada e o retorno é o
+        `DagRun` parcial (tarefas interrompidas em `errors`, dependentes em `skipped`).
+        """
+        graph: Dict[str, List[str]] = {}
+        stack = list(task_ids)
+        while stack:
+            task_id = stack.pop()
+            if task_id in graph:
+                continue
+            if task_id not in self.tasks:
+                raise ValueError(f"Tarefa com ID '{task_id}' não encontrada.")
+            graph[task_id] = self.task_dependencies.get(task_id, [])
+            stack.extend(graph[task_id])
+        
+        def run_node(task_id: str, upstream_outputs: Dict[str, Any]) -> str:
+            check_budget()
+            task = self.tasks[task_id]
+            agent = task.agent.copy()
+            # As dependências são as próprias tarefas originais, que já guardam a saída
+            upstream_tasks = [self.tasks[dep] for dep in self.task_dependencies.get(task_id, [])]
+            node = task.copy(agents=[agent], task_mapping={dep.key: dep for dep in upstream_tasks})
+            result = Crew(agents=[agent], tasks=[node], verbose=False).kickoff(inputs=inputs)
+            task.output = node.output
+            return getattr(result, "raw", str(result))
+        
+        budget = budget or RunBudget.from_settings()
+        try:
+            with budget_scope(budget):
+                run = run_dag(
+                    graph, run_node,
+                    max_workers=max_parallel or settings.CREW_MAX_PARALLEL_TASKS,
+                    should_stop=budget.exhausted
+                )
+        except DagExecutionError as e:
+            if not budget.exhausted():
+                logger.error(f"Erro ao executar o grafo de tarefas: {str(e)}")
+                raise
+            logger.warning(f"Grafo de tarefas interrompido ({budget.reason}): {e.run.summary()}")
+            return e.run
+        except Exception as e:
+            logger.error(f"Erro ao executar o grafo de tarefas: {str(e)}")
+            raise
+        logger.info(f"Grafo de tarefas concluído: {run.summary()}")
+        return run
     
     def add_tool_to_agent(self, agent_id: str, tool: BaseTool):
         """Adiciona uma ferramenta a um agente existente."""
@@ -127,6 +334,7 @@ class CrewManager:
             raise ValueError(f"Agente com ID '{agent_id}' não encontrado.")
         
         self.agents[agent_id].tools.append(tool)
+        self._reset_agent_pool(agent_id)
     
     def get_agent(self, agent_id: str) -> Agent:
         """Obtém um agente pelo ID."""
@@ -140,12 +348,25 @@ class CrewManager:
             raise ValueError(f"Tarefa com ID '{task_id}' não encontrada.")
         return self.tasks[task_id]
     
+    def registry_stats(self) -> Dict[str, Dict[str, int]]:
+        """Itens, remoções por limite e expirações dos registros de tarefas e equipes."""
+        return {"tasks": self.tasks.stats(), "crews": self.crews.stats()}
+    
     def get_crew(self, crew_id: str) -> Crew:
         """Obtém uma equipe pelo ID."""
         if crew_id not in self.crews:
             raise ValueError(f"Equipe com ID '{crew_id}' não encontrada.")
         return self.crews[crew_id]
 
-# Instância global
+# Instância global (uma por processo)
+_instance: Optional[CrewManager] = None
+_instance_lock = threading.Lock()
+
 def get_crew_manager() -> CrewManager:
-    return CrewManager()
+    """Obtém a instância compartilhada do gerenciador de equipes."""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = CrewManager()
+    return _instance
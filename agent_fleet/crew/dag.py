@@ -0,0 +1,195 @@
+"""
+Execução de grafos de tarefas (DAG) com paralelismo limitado.
+
+Cada nó roda assim que todas as suas dependências terminam, em um pool de
+threads com no máximo `max_workers` nós simultâneos. O resultado registra a
+saída e os tempos de cada nó (espera na fila e execução) e o caminho
+crítico, a cadeia de dependências que determinou a duração total.
+
+Os nós rodam em cópias do contexto de quem chamou `run_dag` (contextvars),
+de modo que o orçamento da execução (`budget_scope`) vale também para eles.
+"""
+import time
+import logging
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class NodeTiming:
+    """Instantes de um nó, em segundos desde o início do grafo."""
+    ready: float = 0.0
+    started: float = 0.0
+    finished: float = 0.0
+
+    @property
+    def duration(self) -> float:
+        return self.finished - self.started
+
+    @property
+    def wait(self) -> float:
+        return self.started - self.ready
+
+
+@dataclass
+class DagRun:
+    """Resultado da execução de um grafo."""
+    outputs: Dict[str, Any] = field(default_factory=dict)
+    timings: Dict[str, NodeTiming] = field(default_factory=dict)
+    errors: Dict[str, BaseException] = field(default_factory=dict)
+    skipped: List[str] = field(default_factory=list)
+    critical_path: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        nodes = ", ".join(
+            f"{node}={timing.duration:.2f}s (fila {timing.wait:.2f}s)" for node, timing in self.timings.items()
+        )
+        return (
+            f"{len(self.outputs)} tarefas em {self.elapsed:.2f}s; caminho crítico: "
+            f"{' -> '.join(self.critical_path) or '-'}; {nodes}"
+        )
+
+
+class DagExecutionError(RuntimeError):
+    """Falha de um ou mais nós; `run` guarda as saídas e tempos parciais."""
+
+    def __init__(self, message: str, run: DagRun):
+        super().__init__(message)
+        self.run = run
+
+
+def topological_order(dependencies: Dict[str, Sequence[str]]) -> List[str]:
+    """Ordena os nós de forma que as dependências venham antes; rejeita ciclos e nós desconhecidos."""
+    for node, deps in dependencies.items():
+        unknown = [dep for dep in deps if dep not in dependencies]
+        if unknown:
+            raise ValueError(f"Tarefa '{node}' depende de tarefas inexistentes: {', '.join(unknown)}")
+
+    remaining = {node: len(set(deps)) for node, deps in dependencies.items()}
+    dependents: Dict[str, List[str]] = {node: [] for node in dependencies}
+    for node, deps in dependencies.items():
+        for dep in set(deps):
+            dependents[dep].append(node)
+
+    order = [node for node, count in remaining.items() if count == 0]
+    for node in order:
+        for child in dependents[node]:
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                order.append(child)
+    if len(order) != len(dependencies):
+        cycle = sorted(node for node, count in remaining.items() if count > 0)
+        raise ValueError(f"Dependências circulares entre as tarefas: {', '.join(cycle)}")
+    return order
+
+
+def critical_path(dependencies: Dict[str, Sequence[str]], timings: Dict[str, NodeTiming]) -> List[str]:
+    """Cadeia de dependências com a maior soma de durações."""
+    finish: Dict[str, float] = {}
+    previous: Dict[str, Optional[str]] = {}
+    for node in topological_order(dependencies):
+        if node not in timings:
+            continue
+        best = max((dep for dep in dependencies[node] if dep in finish), key=finish.get, default=None)
+        finish[node] = timings[node].duration + (finish[best] if best is not None else 0.0)
+        previous[node] = best
+    if not finish:
+        return []
+    node: Optional[str] = max(finish, key=finish.get)
+    path = []
+    while node is not None:
+        path.append(node)
+        node = previous[node]
+    return path[::-1]
+
+
+def run_dag(
+    dependencies: Dict[str, Sequence[str]],
+    run_node: Callable[[str, Dict[str, Any]], Any],
+    max_workers: int = 4,
+    should_stop: Optional[Callable[[], bool]] = None,
+    poll_interval: float = 0.5
+) -> DagRun:
+    """Executa o grafo; `run_node(nó, saídas_das_dependências)` retorna a saída do nó.
+
+    Se um nó falhar, os que dependem dele são pulados, os independentes
+    continuam, e ao final é levantada `DagExecutionError` com o resultado parcial.
+    `should_stop` é consultado a cada `poll_interval` segundos; quando retorna
+    True, nenhum nó novo é iniciado, os em andamento são abandonados (registrados
+    em `errors` com `TimeoutError`) e o resultado parcial é devolvido na exceção,
+    mesmo que nenhum nó tenha chegado a iniciar.
+    """
+    order = topological_order(dependencies)
+    pending = {node: set(deps) for node, deps in dependencies.items()}
+    run = DagRun()
+    start = time.perf_counter()
+    ready = [node for node in order if not pending[node]]
+    for node in ready:
+        run.timings[node] = NodeTiming(ready=0.0)
+    running: Dict[Future, str] = {}
+
+    def execute(node: str):
+        run.timings[node].started = time.perf_counter() - start
+        try:
+            return run_node(node, {dep: run.outputs[dep] for dep in dependencies[node]})
+        finally:
+            run.timings[node].finished = time.perf_counter() - start
+
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="crew-dag")
+    stopped = False
+    try:
+        while ready or running:
+            if should_stop is not None and should_stop():
+                stopped = True
+                break
+            while ready:
+                node = ready.pop(0)
+                running[executor.submit(contextvars.copy_context().run, execute, node)] = node
+            done, _ = wait(
+                list(running), timeout=poll_interval if should_stop is not None else None,
+                return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                node = running.pop(future)
+                try:
+                    run.outputs[node] = future.result()
+                except Exception as e:
+                    logger.error(f"Erro ao executar a tarefa {node}: {str(e)}")
+                    run.errors[node] = e
+                    continue
+                now = time.perf_counter() - start
+                for child in order:
+                    if node in pending[child]:
+                        pending[child].discard(node)
+                        if not pending[child]:
+                            run.timings[child] = NodeTiming(ready=now)
+                            ready.append(child)
+    finally:
+        # Interrompido: não espera os nós em andamento (eles param no próximo ponto de verificação)
+        executor.shutdown(wait=not stopped, cancel_futures=stopped)
+
+    if stopped:
+        for node in running.values():
+            run.errors[node] = TimeoutError(f"Tarefa {node} interrompida antes de terminar.")
+            run.timings[node].finished = time.perf_counter() - start
+    run.elapsed = time.perf_counter() - start
+    run.skipped = [node for node in order if node not in run.outputs and node not in run.errors]
+    run.critical_path = critical_path(dependencies, {node: run.timings[node] for node in run.outputs})
+    if stopped:
+        raise DagExecutionError(
+            f"Execução interrompida: {len(run.outputs)} tarefa(s) concluída(s), "
+            f"{len(run.errors)} abandonada(s), {len(run.skipped)} não executada(s).",
+            run
+        )
+    if run.errors:
+        raise DagExecutionError(
+            f"{len(run.errors)} tarefa(s) falharam ({', '.join(run.errors)}); "
+            f"{len(run.skipped)} dependente(s) não executada(s).",
+            run
+        )
+    return run
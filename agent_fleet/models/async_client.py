@@ -0,0 +1,419 @@
+"""
+Cliente HTTP assíncrono para as APIs de LLM (OpenAI e HuggingFace Inference).
+
+Um único `httpx.AsyncClient` com conexões keep-alive é compartilhado por todos
+os modelos e roda em um event loop próprio (thread dedicada), de modo que pode
+ser usado tanto de código assíncrono (`await client.complete(...)`, de
+qualquer loop) quanto síncrono (`client.complete_sync(...)`). Para cada modelo:
+
+- semáforo de concorrência (requisições simultâneas)
+- limite de taxa por token bucket (requisições por segundo, com rajada)
+- novas tentativas com backoff exponencial e jitter completo (erros de rede,
+  429 e 5xx; respeita `Retry-After`)
+- hedging opcional: se a resposta demora mais que o p95 observado, uma cópia
+  da requisição é disparada e vence a primeira que responder
+"""
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import httpx
+from langchain.llms.base import LLM
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.outputs import Generation, LLMResult
+from agent_fleet.config.settings import settings, ModelType
+from agent_fleet.crew.budget import remaining_time
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRY_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+
+class TokenBucket:
+    """Limite de taxa: `rate` fichas por segundo, acumulando até `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class RetryableError(Exception):
+    """Falha transitória da API (pode ser repetida)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _ModelLane:
+    """Estado por modelo: semáforo, token bucket e estatísticas recentes."""
+
+    def __init__(self, concurrency: int, rate: float, burst: int):
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.bucket = TokenBucket(rate, burst or concurrency)
+        self.latencies: Deque[float] = deque(maxlen=200)
+        self.in_flight = 0
+        self.waiting = 0
+        self.metrics = {"requests": 0, "errors": 0, "retries": 0, "hedges": 0, "hedge_wins": 0}
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class AsyncLLMClient:
+    """Cliente assíncrono com pool de conexões, limites por modelo, retries e hedging."""
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        timeout: float = 120.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        backoff_max: float = 20.0,
+        hedge: bool = False,
+        hedge_min_delay: float = 2.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self._lanes: Dict[str, _ModelLane] = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True)
+        self._thread.start()
+        self._http: httpx.AsyncClient = self._run(
+            self._create_http(max_connections, max_keepalive, timeout, transport)
+        )
+
+    async def _create_http(
+        self,
+        max_connections: int,
+        max_keepalive: int,
+        timeout: float,
+        transport: Optional[httpx.AsyncBaseTransport]
+    ) -> httpx.AsyncClient:
+        # `transport` substitui a rede (ex.: `httpx.MockTransport` nos testes)
+        return httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive),
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 10.0)),
+            transport=transport
+        )
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def _lane(self, model_id: str, config: Dict[str, Any]) -> _ModelLane:
+        lane = self._lanes.get(model_id)
+        if lane is None:
+            lane = self._lanes[model_id] = _ModelLane(
+                config.get("concurrency", settings.LLM_CLIENT_CONCURRENCY),
+                config.get("rate_limit", settings.LLM_CLIENT_RATE_LIMIT),
+                config.get("burst", settings.LLM_CLIENT_BURST)
+            )
+        return lane
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    async def complete(self, model_id: str, prompt: str, stop: Optional[List[str]] = None, **params) -> str:
+        """Gera a resposta de `model_id` para o prompt (pode ser aguardado de qualquer event loop)."""
+        coroutine = self._complete(model_id, prompt, stop, params)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            return await coroutine
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, self._loop))
+
+    def complete_sync(self, model_id: str, prompt: str, stop: Optional[List[str]] = None, **params) -> str:
+        """Versão bloqueante de `complete`, para código síncrono (threads)."""
+        return self._run(self._complete(model_id, prompt, stop, params))
+
+    def complete_batch_sync(self, model_id: str, prompts: List[str], stop: Optional[List[str]] = None, **params) -> List[str]:
+        """Envia vários prompts concorrentemente (respeitando os limites do modelo)."""
+        return self._run(self._complete_batch(model_id, prompts, stop, params))
+
+    async def complete_batch(self, model_id: str, prompts: List[str], stop: Optional[List[str]] = None, **params) -> List[str]:
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(self._complete_batch(model_id, prompts, stop, params), self._loop)
+        )
+
+    async def _complete_batch(self, model_id: str, prompts: List[str], stop: Optional[List[str]], params: Dict[str, Any]) -> List[str]:
+        return list(await asyncio.gather(*(self._complete(model_id, prompt, stop, params) for prompt in prompts)))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Por modelo: requisições, erros, retries, hedges, em andamento, fila e latências p50/p95."""
+        result = {}
+        for model_id, lane in list(self._lanes.items()):
+            result[model_id] = dict(
+                lane.metrics,
+                in_flight=lane.in_flight,
+                waiting=lane.waiting,
+                p50=lane.percentile(0.5),
+                p95=lane.percentile(0.95)
+            )
+        return result
+
+    def close(self):
+        """Fecha as conexões e encerra o event loop do cliente."""
+        if self._loop.is_closed():
+            return
+        self._run(self._http.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    # ------------------------------------------------------------------
+    # Execução (no loop do cliente)
+    # ------------------------------------------------------------------
+
+    async def _complete(self, model_id: str, prompt: str, stop: Optional[List[str]], params: Dict[str, Any]) -> str:
+        if model_id not in settings.AVAILABLE_MODELS:
+            raise ValueError(f"Modelo {model_id} não encontrado nas configurações.")
+        config = settings.AVAILABLE_MODELS[model_id]
+        lane = self._lane(model_id, config)
+        request = build_request(config, prompt, stop, params)
+        lane.metrics["requests"] += 1
+
+        start = time.monotonic()
+        try:
+            # `timeout` (prazo da execução em andamento) limita a chamada inteira, com retries
+            text = await asyncio.wait_for(self._hedged(lane, config, request), params.get("timeout"))
+        except Exception as e:
+            lane.metrics["errors"] += 1
+            logger.error(f"Erro na chamada ao modelo {model_id}: {str(e)}")
+            raise
+        lane.latencies.append(time.monotonic() - start)
+        return text
+
+    async def _hedged(self, lane: _ModelLane, config: Dict[str, Any], request: Tuple[str, Dict, Dict]) -> str:
+        delay = max(self.hedge_min_delay, lane.percentile(0.95) or 0.0)
+        if not self.hedge or len(lane.latencies) < 20:
+            return await self._with_retries(lane, config, request)
+
+        primary = asyncio.ensure_future(self._with_retries(lane, config, request))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+
+            lane.metrics["hedges"] += 1
+            backup = asyncio.ensure_future(self._with_retries(lane, config, request))
+            tasks.append(backup)
+            pending = {primary, backup}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            lane.metrics["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Perdedora do hedge ou chamada cancelada por fora (prazo): libera semáforo e conexão
+            unfinished = [task for task in tasks if not task.done()]
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                await asyncio.gather(*unfinished, return_exceptions=True)
+
+    async def _with_retries(self, lane: _ModelLane, config: Dict[str, Any], request: Tuple[str, Dict, Dict]) -> str:
+        attempt = 0
+        while True:
+            try:
+                return await self._send(lane, config, request)
+            except (RetryableError,) + RETRY_ERRORS as e:
+                if attempt >= self.retries:
+                    raise
+                retry_after = getattr(e, "retry_after", None)
+                # Backoff exponencial com jitter completo
+                wait = retry_after if retry_after is not None else random.uniform(
+                    0, min(self.backoff_max, self.backoff * 2 ** attempt)
+                )
+                attempt += 1
+                lane.metrics["retries"] += 1
+                logger.warning(f"Falha transitória ({str(e)}); nova tentativa {attempt} em {wait:.2f}s.")
+                await asyncio.sleep(wait)
+
+    async def _send(self, lane: _ModelLane, config: Dict[str, Any], request: Tuple[str, Dict, Dict]) -> str:
+        url, headers, body = request
+        lane.waiting += 1
+        try:
+            await lane.bucket.acquire()
+            await lane.semaphore.acquire()
+        finally:
+            lane.waiting -= 1
+        lane.in_flight += 1
+        try:
+            response = await self._http.post(url, headers=headers, json=body)
+        finally:
+            lane.in_flight -= 1
+            lane.semaphore.release()
+
+        if response.status_code in RETRY_STATUS:
+            retry_after = response.headers.get("retry-after")
+            raise RetryableError(
+                f"HTTP {response.status_code}",
+                float(retry_after) if retry_after and retry_after.replace(".", "", 1).isdigit() else None
+            )
+        response.raise_for_status()
+        return parse_response(config, response.json())
+
+
+def _auth_headers(token: str) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+def _uses_chat_api(config: Dict[str, Any]) -> bool:
+    if "api" in config:
+        return config["api"] == "chat"
+    return config["name"].startswith(("gpt-3.5-turbo", "gpt-4"))
+
+
+def build_request(
+    config: Dict[str, Any],
+    prompt: str,
+    stop: Optional[List[str]],
+    params: Dict[str, Any]
+) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+    """Monta (URL, cabeçalhos, corpo JSON) da chamada para o tipo de modelo configurado."""
+    model_type = config.get("type")
+    temperature = params.get("temperature", config.get("temperature", 0.7))
+
+    if model_type == ModelType.OPENAI:
+        base_url = config.get("base_url", settings.OPENAI_API_BASE).rstrip("/")
+        body: Dict[str, Any] = {
+            "model": config["name"],
+            "temperature": temperature,
+            "max_tokens": params.get("max_tokens", config.get("max_tokens", 2000))
+        }
+        if stop:
+            body["stop"] = stop
+        if _uses_chat_api(config):
+            body["messages"] = [{"role": "user", "content": prompt}]
+            url = f"{base_url}/chat/completions"
+        else:
+            body["prompt"] = prompt
+            url = f"{base_url}/completions"
+        return url, _auth_headers(settings.OPENAI_API_KEY), body
+
+    if model_type == ModelType.HUGGINGFACE:
+        base_url = config.get("base_url", settings.HUGGINGFACE_API_BASE).rstrip("/")
+        parameters: Dict[str, Any] = {
+            "temperature": temperature,
+            "max_new_tokens": params.get("max_tokens", config.get("max_length", 512)),
+            "return_full_text": False
+        }
+        if stop:
+            parameters["stop"] = stop
+        return (
+            f"{base_url}/models/{config['name']}",
+            _auth_headers(settings.HUGGINGFACEHUB_API_TOKEN),
+            {"inputs": prompt, "parameters": parameters}
+        )
+
+    raise ValueError(f"Tipo de modelo não suportado pelo cliente HTTP: {model_type}")
+
+
+def parse_response(config: Dict[str, Any], payload: Any) -> str:
+    """Extrai o texto gerado da resposta da API."""
+    if config.get("type") == ModelType.OPENAI:
+        choice = payload["choices"][0]
+        return choice["message"]["content"] if "message" in choice else choice["text"]
+    if isinstance(payload, list):
+        payload = payload[0]
+    return payload["generated_text"]
+
+
+class PooledLLM(LLM):
+    """LLM do LangChain sobre o `AsyncLLMClient` compartilhado (pool, limites e retries)."""
+
+    client: Any
+    model_id: str
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "pooled-http"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_id": self.model_id, "temperature": self.temperature, "max_tokens": self.max_tokens}
+
+    def _params(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        params = {"temperature": self.temperature, "max_tokens": self.max_tokens, "timeout": remaining_time()}
+        params.update(kwargs)
+        return {key: value for key, value in params.items() if value is not None}
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> str:
+        return self.client.complete_sync(self.model_id, prompt, stop=stop, **self._params(kwargs))
+
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> str:
+        return await self.client.complete(self.model_id, prompt, stop=stop, **self._params(kwargs))
+
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> LLMResult:
+        texts = self.client.complete_batch_sync(self.model_id, prompts, stop=stop, **self._params(kwargs))
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
+
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> LLMResult:
+        texts = await self.client.complete_batch(self.model_id, prompts, stop=stop, **self._params(kwargs))
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
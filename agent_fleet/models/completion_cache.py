@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
+from langchain.llms.base import BaseLLM
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.outputs import Generation, GenerationChunk, LLMResult
+
+logger = logging.getLogger(__name__)
+
+
+class CompletionCache:
+    """Cache persistente de respostas de LLM (LRU em memória + SQLite local).
+
+    A chave é o hash de (ID do modelo, temperatura, máximo de tokens, stop e
+    demais parâmetros da chamada, prompt exato). O arquivo em disco tem limite
+    de tamanho: as entradas acessadas há mais tempo são removidas primeiro.
+    """
+
+    def __init__(self, path: str, memory_items: int = 1000, max_disk_bytes: int = 256 * 1024 ** 2):
+        self.path = path
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[bytes, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "skipped": 0, "evictions": 0}
+        self._writes_since_check = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS completions (
+                key BLOB PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_access ON completions(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(model_id: str, prompt: str, params: Dict[str, Any]) -> bytes:
+        payload = json.dumps([model_id, params, prompt], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).digest()
+
+    def _remember(self, key: bytes, generations: List[Dict[str, Any]]):
+        self._memory[key] = generations
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key: bytes) -> Optional[List[Dict[str, Any]]]:
+        """Gerações armazenadas para a chave (None se ausente)."""
+        with self._lock:
+            generations = self._memory.get(key)
+            if generations is not None:
+                self._memory.move_to_end(key)
+                self._metrics["memory_hits"] += 1
+                return generations
+
+            row = self._conn.execute("SELECT response FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._metrics["misses"] += 1
+                return None
+            generations = json.loads(row[0])
+            self._conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self._remember(key, generations)
+            self._metrics["disk_hits"] += 1
+            return generations
+
+    def put(self, key: bytes, model_id: str, generations: List[Dict[str, Any]]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, model, response, last_access) VALUES (?, ?, ?, ?)",
+                (key, model_id, json.dumps(generations, default=str), time.time())
+            )
+            self._remember(key, generations)
+            self._writes_since_check += 1
+            if self._writes_since_check >= 100:
+                self._writes_since_check = 0
+                self._enforce_disk_limit()
+            self._conn.commit()
+
+    def count_skipped(self):
+        """Conta uma chamada que não pôde usar o cache (desativado ou não determinística)."""
+        with self._lock:
+            self._metrics["skipped"] += 1
+
+    def _enforce_disk_limit(self):
+        """Remove as entradas menos acessadas até o arquivo caber no limite."""
+        page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        size = page_size * (page_count - free_pages)
+        if size <= self.max_disk_bytes:
+            return
+
+        total = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        # Remove a fração excedente mais uma folga de 10%
+        to_remove = int(total * (1 - (self.max_disk_bytes * 0.9) / size)) + 1
+        self._conn.execute(
+            "DELETE FROM completions WHERE key IN "
+            "(SELECT key FROM completions ORDER BY last_access LIMIT ?)",
+            (to_remove,)
+        )
+        self._metrics["evictions"] += to_remove
+        logger.info(f"Cache de respostas: {to_remove} entradas removidas por limite de disco.")
+
+    def stats(self) -> Dict[str, float]:
+        """Métricas de acerto/erro do cache."""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["memory_items"] = len(self._memory)
+        hits = metrics["memory_hits"] + metrics["disk_hits"]
+        total = hits + metrics["misses"]
+        metrics["hit_rate"] = hits / total if total else 0.0
+        return metrics
+
+    def clear(self, model_id: Optional[str] = None):
+        """Limpa o cache (todas as entradas ou apenas as de um modelo)."""
+        with self._lock:
+            self._memory.clear()
+            if model_id is None:
+                self._conn.execute("DELETE FROM completions")
+            else:
+                self._conn.execute("DELETE FROM completions WHERE model = ?", (model_id,))
+            self._conn.commit()
+
+
+class CachedLLM(BaseLLM):
+    """LLM que consulta o `CompletionCache` antes de chamar o modelo de origem.
+
+    Só respostas determinísticas (temperatura 0) são cacheadas quando
+    `deterministic_only` está ativo (padrão de `LLM_CACHE_DETERMINISTIC_ONLY`).
+    Um modelo com `"cache": "sampled"` em `AVAILABLE_MODELS` desativa essa
+    restrição: o mesmo prompt com temperatura > 0 passa a repetir a primeira
+    resposta, trocando a variação da amostragem por menos chamadas ao modelo.
+    O cache pode ser ligado/desligado por
+    modelo (`enabled`) ou por chamada (`llm.invoke(prompt, cache=False)`);
+    a temperatura também pode ser sobrescrita por chamada.
+    """
+
+    llm: BaseLLM
+    model_id: str
+    completion_cache: Any
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    enabled: bool = True
+    deterministic_only: bool = True
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cached-{self.llm._llm_type}"
+
+    def _cache_params(self, stop: Optional[List[str]], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        params = {"temperature": self.temperature, "max_tokens": self.max_tokens, "stop": stop}
+        params.update(kwargs)
+        params.pop("cache", None)
+        return params
+
+    def _cacheable(self, use_cache: Optional[bool], params: Dict[str, Any]) -> bool:
+        if not (self.enabled if use_cache is None else use_cache):
+            return False
+        return not self.deterministic_only or params.get("temperature") == 0
+
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> LLMResult:
+        params = self._cache_params(stop, kwargs)
+        if not self._cacheable(kwargs.pop("cache", None), params):
+            for _ in prompts:
+                self.completion_cache.count_skipped()
+            return self.llm.generate(prompts, stop=stop, **kwargs)
+
+        keys = [CompletionCache.key(self.model_id, prompt, params) for prompt in prompts]
+        generations: List[Optional[List[Generation]]] = []
+        missing: Dict[str, List[int]] = {}
+        for position, (key, prompt) in enumerate(zip(keys, prompts)):
+            cached = self.completion_cache.get(key)
+            generations.append([Generation(**item) for item in cached] if cached is not None else None)
+            if cached is None:
+                missing.setdefault(prompt, []).append(position)
+
+        llm_output = None
+        if missing:
+            result = self.llm.generate(list(missing.keys()), stop=stop, **kwargs)
+            llm_output = result.llm_output
+            for positions, computed in zip(missing.values(), result.generations):
+                self.completion_cache.put(
+                    keys[positions[0]],
+                    self.model_id,
+                    [{"text": item.text, "generation_info": item.generation_info} for item in computed]
+                )
+                for position in positions:
+                    generations[position] = computed
+
+        return LLMResult(generations=generations, llm_output=llm_output)
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> Iterator[GenerationChunk]:
+        """Repassa o streaming do modelo de origem; um acerto no cache é entregue de uma vez."""
+        params = self._cache_params(stop, kwargs)
+        cacheable = self._cacheable(kwargs.pop("cache", None), params)
+        key = CompletionCache.key(self.model_id, prompt, params) if cacheable else None
+        cached = self.completion_cache.get(key) if cacheable else None
+        if cached is not None:
+            chunks = [item["text"] for item in cached]
+        else:
+            if not cacheable:
+                self.completion_cache.count_skipped()
+            chunks = self.llm.stream(prompt, stop=stop, **kwargs)
+
+        text = ""
+        for chunk in chunks:
+            text += chunk
+            if run_manager:
+                run_manager.on_llm_new_token(chunk)
+            yield GenerationChunk(text=chunk)
+        if cacheable and cached is None:
+            self.completion_cache.put(key, self.model_id, [{"text": text, "generation_info": None}])
@@ -0,0 +1,121 @@
+"""
+Adaptadores dos modelos da frota para o crewai.
+
+O crewai chama os modelos pela interface `crewai.llms.base_llm.BaseLLM`
+(`call(messages)`); um LLM do LangChain passado como `llm` de um agente vira
+um nome de modelo inválido para o LiteLLM. `CrewLLM` expõe um modelo do
+`ModelManager` (com o cache de respostas, o cliente em pool ou o motor local)
+nessa interface, e `RoutedCrewLLM` escolhe o modelo de cada chamada pelo
+`ModelRouter`.
+
+Os modelos não declaram chamada de funções nativa: o crewai descreve as
+ferramentas no próprio prompt (formato ReAct) e interpreta a resposta em
+texto, então as mensagens são convertidas em um único prompt.
+
+Cada chamada verifica antes o orçamento da execução (prazo, passos, tokens e
+custo); a chamada final ao modelo passa pelos callbacks do LangChain, que
+contabilizam tokens e custo (ver `agent_fleet.crew.budget`).
+"""
+import logging
+from typing import Any, Callable, Dict, List, Optional, Union
+from crewai.llms.base_llm import BaseLLM as CrewBaseLLM
+from langchain.llms.base import BaseLLM
+from agent_fleet.config.settings import settings
+from agent_fleet.crew.budget import BudgetExceeded, check_budget
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT_WINDOW = 4096
+
+
+def _invoke(llm: BaseLLM, prompt: str, stop: Optional[List[str]]) -> str:
+    return llm.invoke(prompt, stop=stop or None)
+
+
+def messages_to_prompt(messages: Union[str, List[Dict[str, str]]]) -> str:
+    """Concatena as mensagens do crewai (sistema, usuário e passos anteriores) em um prompt."""
+    if isinstance(messages, str):
+        return messages
+    return "\n\n".join(str(message.get("content") or "") for message in messages)
+
+
+class CrewLLM(CrewBaseLLM):
+    """Modelo de `AVAILABLE_MODELS` na interface de LLM do crewai.
+
+    O modelo do LangChain é obtido a cada chamada por `get_llm` (normalmente
+    `ModelManager.get_model`), que o constrói no primeiro uso e respeita o
+    intervalo entre tentativas após falhas.
+    """
+
+    def __init__(self, model_id: str, get_llm: Callable[[str], BaseLLM]):
+        config = settings.AVAILABLE_MODELS.get(model_id, {})
+        super().__init__(model=model_id, temperature=config.get("temperature"))
+        self.model_id = model_id
+        self.get_llm = get_llm
+        self.context_window = config.get("context_window", DEFAULT_CONTEXT_WINDOW)
+
+    def call(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> str:
+        check_budget()
+        try:
+            return _invoke(self.get_llm(self.model_id), messages_to_prompt(messages), self.stop)
+        except BudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Erro na chamada ao modelo {self.model_id}: {str(e)}")
+            raise
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return True
+
+    def get_context_window_size(self) -> int:
+        return self.context_window
+
+
+class RoutedCrewLLM(CrewBaseLLM):
+    """Política de `MODEL_ROUTING_POLICIES` na interface de LLM do crewai.
+
+    Cada chamada vai ao modelo escolhido pelo `ModelRouter`, com fallback
+    entre os candidatos da política (ver `ModelRouter.call`).
+    """
+
+    def __init__(self, router: Any, policy: str, get_llm: Callable[[str], BaseLLM]):
+        super().__init__(model=f"routed/{policy}")
+        self.router = router
+        self.policy = policy
+        self.get_llm = get_llm
+
+    def call(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> str:
+        check_budget()
+        prompt = messages_to_prompt(messages)
+        _, text = self.router.call(self.policy, lambda model_id: _invoke(self.get_llm(model_id), prompt, self.stop))
+        return text
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return True
+
+    def get_context_window_size(self) -> int:
+        # O fallback pode cair em qualquer modelo da política: vale a menor janela
+        return min(
+            settings.AVAILABLE_MODELS.get(model_id, {}).get("context_window", DEFAULT_CONTEXT_WINDOW)
+            for model_id in self.router.policies[self.policy]["models"]
+        )
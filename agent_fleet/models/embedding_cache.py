@@ -0,0 +1,206 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class CachedEmbeddings(Embeddings):
+    """Cache de embeddings endereçado por conteúdo, na frente de outro modelo.
+
+    A chave é o hash de (nome do modelo, texto). Os vetores ficam em um LRU em
+    memória e em um arquivo SQLite local, com limite de tamanho em disco
+    (os itens acessados há mais tempo são removidos primeiro).
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        path: str,
+        memory_items: int = 10000,
+        max_disk_bytes: int = 1024 ** 3
+    ):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.path = path
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._writes_since_check = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key BLOB PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings(last_access)")
+        self._conn.commit()
+
+    def _key(self, text: str, kind: str = "doc") -> bytes:
+        # Consultas e documentos podem ter embeddings diferentes (ex.: modelos com prefixo)
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{text}".encode("utf-8")).digest()
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Busca as chaves no LRU e, para as restantes, no SQLite."""
+        found: Dict[bytes, np.ndarray] = {}
+        disk_keys = []
+        for key in keys:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                found[key] = vector
+                self._metrics["memory_hits"] += 1
+            else:
+                disk_keys.append(key)
+
+        # Consulta em blocos para respeitar o limite de parâmetros do SQLite
+        now = time.time()
+        for start in range(0, len(disk_keys), 500):
+            block = disk_keys[start:start + 500]
+            placeholders = ",".join("?" * len(block))
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                block
+            ).fetchall()
+            for key, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                found[key] = vector
+                self._remember(key, vector)
+            if rows:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key, _ in rows]
+                )
+                self._metrics["disk_hits"] += len(rows)
+        return found
+
+    def _store(self, items: Dict[bytes, np.ndarray]):
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, model, vector, last_access) VALUES (?, ?, ?, ?)",
+            [(key, self.model_name, vector.tobytes(), now) for key, vector in items.items()]
+        )
+        for key, vector in items.items():
+            self._remember(key, vector)
+
+        self._writes_since_check += len(items)
+        if self._writes_since_check >= 1000:
+            self._writes_since_check = 0
+            self._enforce_disk_limit()
+
+    def _enforce_disk_limit(self):
+        """Remove as entradas menos acessadas até o arquivo caber no limite."""
+        page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        size = page_size * (page_count - free_pages)
+        if size <= self.max_disk_bytes:
+            return
+
+        total = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        # Remove a fração excedente mais uma folga de 10%
+        to_remove = int(total * (1 - (self.max_disk_bytes * 0.9) / size)) + 1
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+            (to_remove,)
+        )
+        self._metrics["evictions"] += to_remove
+        logger.info(f"Cache de embeddings: {to_remove} entradas removidas por limite de disco.")
+
+    def _embed_cached(self, texts: List[str], kind: str, compute) -> List[List[float]]:
+        """Busca os textos no cache e calcula, em um único lote, apenas os ausentes."""
+        keys = [self._key(text, kind=kind) for text in texts]
+
+        with self._lock:
+            found = self._lookup(keys)
+
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = compute(list(missing.values()))
+            computed = {
+                key: np.asarray(vector, dtype=np.float32)
+                for key, vector in zip(missing.keys(), vectors)
+            }
+            with self._lock:
+                self._metrics["misses"] += len(computed)
+                self._store(computed)
+                self._conn.commit()
+            found.update(computed)
+        else:
+            with self._lock:
+                self._conn.commit()
+
+        return [found[key].tolist() for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Retorna os embeddings, calculando apenas os textos ausentes do cache."""
+        return self._embed_cached(texts, "doc", self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Retorna o embedding de uma consulta, usando o cache."""
+        key = self._key(text, kind="query")
+        with self._lock:
+            found = self._lookup([key])
+            if key in found:
+                self._conn.commit()
+                return found[key].tolist()
+
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        with self._lock:
+            self._metrics["misses"] += 1
+            self._store({key: vector})
+            self._conn.commit()
+        return vector.tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings de várias consultas; as ausentes do cache são calculadas em um único lote."""
+        compute = getattr(self.embeddings, "embed_queries", self.embeddings.embed_documents)
+        return self._embed_cached(texts, "query", compute)
+
+    def stats(self) -> Dict[str, float]:
+        """Métricas de acerto/erro do cache."""
+        with self._lock:
+            metrics = dict(self._metrics)
+        hits = metrics["memory_hits"] + metrics["disk_hits"]
+        total = hits + metrics["misses"]
+        metrics["hit_rate"] = hits / total if total else 0.0
+        metrics["memory_items"] = len(self._memory)
+        return metrics
+
+    def clear(self, model_only: bool = True):
+        """Limpa o cache (por padrão, apenas as entradas deste modelo)."""
+        with self._lock:
+            self._memory.clear()
+            if model_only:
+                self._conn.execute("DELETE FROM embeddings WHERE model = ?", (self.model_name,))
+            else:
+                self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
@@ -0,0 +1,232 @@
+"""
+Motor de embeddings em lote para CPU.
+
+Substitui o `HuggingFaceEmbeddings` padrão com lotes configuráveis, comprimento
+máximo de sequência, codificação em múltiplos processos e backends otimizados
+(ONNX/OpenVINO ou quantização int8 dinâmica), quando disponíveis localmente.
+
+Benchmark pela linha de comando:
+
+    python -m agent_fleet.models.embedding_engine --batch-sizes 16,32,64 --workers 1,4 --backends torch,onnx
+"""
+import atexit
+import time
+import logging
+import argparse
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+from langchain.embeddings.base import Embeddings
+from agent_fleet.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_BACKENDS = ("torch", "torch-int8", "onnx", "openvino")
+
+
+class BatchedEmbeddings(Embeddings):
+    """Embeddings do sentence-transformers com lotes e paralelismo configuráveis."""
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 64,
+        max_seq_length: Optional[int] = None,
+        num_workers: int = 0,
+        backend: str = "torch",
+        normalize_embeddings: bool = False
+    ):
+        if backend not in SUPPORTED_BACKENDS:
+            raise ValueError(f"Backend de embeddings não suportado: {backend}")
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_seq_length = max_seq_length
+        self.num_workers = num_workers
+        self.backend = backend
+        self.normalize_embeddings = normalize_embeddings
+        # Backend efetivamente carregado (onnx/openvino voltam para torch se indisponíveis)
+        self.loaded_backend: Optional[str] = None
+        self._model = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        """Carrega o modelo na primeira utilização."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    def _load_model(self):
+        from sentence_transformers import SentenceTransformer
+
+        model = None
+        if self.backend in ("onnx", "openvino"):
+            try:
+                model = SentenceTransformer(self.model_name, device="cpu", backend=self.backend)
+                self.loaded_backend = self.backend
+            except Exception as e:
+                logger.warning(
+                    f"Backend {self.backend} indisponível para {self.model_name} ({str(e)}); "
+                    "usando torch."
+                )
+        if model is None:
+            model = SentenceTransformer(self.model_name, device="cpu")
+            self.loaded_backend = "torch"
+            if self.backend == "torch-int8":
+                import torch
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                self.loaded_backend = "torch-int8"
+
+        if self.max_seq_length:
+            model.max_seq_length = self.max_seq_length
+        return model
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = self.model.start_multi_process_pool(
+                        target_devices=["cpu"] * self.num_workers
+                    )
+                    atexit.register(self.close)
+        return self._pool
+
+    def _encode(self, texts: List[str]):
+        # Lotes pequenos não compensam o custo de distribuir entre processos
+        if self.num_workers > 1 and len(texts) >= self.batch_size * self.num_workers:
+            return self.model.encode_multi_process(
+                texts,
+                self._get_pool(),
+                batch_size=self.batch_size,
+                normalize_embeddings=self.normalize_embeddings
+            )
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=self.normalize_embeddings,
+            show_progress_bar=False
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Calcula os embeddings de uma lista de textos, em lotes."""
+        if not texts:
+            return []
+        texts = [text.replace("\n", " ") for text in texts]
+        return self._encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Calcula o embedding de uma consulta."""
+        return self.embed_documents([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Calcula os embeddings de várias consultas em uma única passada."""
+        return self.embed_documents(texts)
+
+    def close(self):
+        """Encerra o pool de processos, se houver."""
+        if self._pool is not None:
+            from sentence_transformers import SentenceTransformer
+            SentenceTransformer.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+
+def benchmark(
+    texts: List[str],
+    model_name: Optional[str] = None,
+    batch_sizes: Iterable[int] = (32,),
+    workers: Iterable[int] = (0,),
+    backends: Iterable[str] = ("torch",),
+    max_seq_length: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Mede a vazão (textos/s) de cada combinação de configuração.
+
+    `backend` é o backend efetivamente carregado; `requested_backend`, o pedido
+    (diferem quando onnx/openvino não estão disponíveis e o motor usa torch).
+    """
+    model_name = model_name or settings.EMBEDDING_MODEL
+    results = []
+    for backend in backends:
+        for num_workers in workers:
+            for batch_size in batch_sizes:
+                engine = BatchedEmbeddings(
+                    model_name,
+                    batch_size=batch_size,
+                    max_seq_length=max_seq_length,
+                    num_workers=num_workers,
+                    backend=backend
+                )
+                try:
+                    # Aquecimento: carrega o modelo (e o pool) fora da medição
+                    engine.embed_documents(texts[:batch_size * max(num_workers, 1)])
+                    if engine.loaded_backend != backend:
+                        logger.warning(
+                            f"Benchmark de {backend} medido com o backend {engine.loaded_backend} (fallback)."
+                        )
+                    start = time.perf_counter()
+                    engine.embed_documents(texts)
+                    elapsed = time.perf_counter() - start
+                    results.append({
+                        "backend": engine.loaded_backend,
+                        "requested_backend": backend,
+                        "workers": num_workers,
+                        "batch_size": batch_size,
+                        "texts": len(texts),
+                        "seconds": elapsed,
+                        "texts_per_sec": len(texts) / elapsed if elapsed else 0.0
+                    })
+                except Exception as e:
+                    logger.error(
+                        f"Erro no benchmark (backend={backend}, workers={num_workers}, "
+                        f"batch_size={batch_size}): {str(e)}"
+                    )
+                finally:
+                    engine.close()
+    return results
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main(argv: Optional[List[str]] = None):
+    """Ponto de entrada do benchmark pela linha de comando."""
+    parser = argparse.ArgumentParser(description="Benchmark do motor de embeddings em CPU.")
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--samples", type=int, default=2000, help="Quantidade de textos sintéticos")
+    parser.add_argument("--text-length", type=int, default=500, help="Caracteres por texto")
+    parser.add_argument("--batch-sizes", type=_int_list, default=[16, 32, 64])
+    parser.add_argument("--workers", type=_int_list, default=[0])
+    parser.add_argument("--backends", default="torch")
+    parser.add_argument("--max-seq-length", type=int, default=settings.EMBEDDING_MAX_SEQ_LENGTH or None)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    words = "agentes autônomos recuperam informações relevantes para responder perguntas".split()
+    texts = [
+        " ".join(words[(i + j) % len(words)] for j in range(args.text_length // 8))
+        for i in range(args.samples)
+    ]
+
+    results = benchmark(
+        texts,
+        model_name=args.model,
+        batch_sizes=args.batch_sizes,
+        workers=args.workers,
+        backends=[backend.strip() for backend in args.backends.split(",") if backend.strip()],
+        max_seq_length=args.max_seq_length
+    )
+    print(f"{'backend':<24}{'workers':>8}{'batch':>8}{'textos/s':>12}")
+    for result in results:
+        backend = result["backend"]
+        if backend != result["requested_backend"]:
+            backend = f"{backend} (pedido {result['requested_backend']})"
+        print(f"{backend:<24}{result['workers']:>8}{result['batch_size']:>8}"
+              f"{result['texts_per_sec']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+"""
+Backend local de LLM (`ModelType.LOCAL`) com lotes contínuos na CPU.
+
+O modelo causal é carregado do disco com transformers (opcionalmente com
+quantização int8 dinâmica). Uma thread de agendamento mantém um único lote de
+gerações em andamento: a cada passo gera um token para todas as sequências
+ativas, admite novos pedidos da fila assim que há vaga (sem esperar o lote
+terminar) e libera as sequências concluídas. Os tokens são entregues por
+streaming a cada pedido.
+"""
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional
+from langchain.llms.base import LLM
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.outputs import Generation, GenerationChunk, LLMResult
+from agent_fleet.crew.budget import check_budget, remaining_time
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_BACKENDS = ("torch", "torch-int8")
+
+
+class GenerationRequest:
+    """Pedido de geração na fila do motor; iterar sobre ele produz o texto em partes."""
+
+    def __init__(self, prompt_ids: List[int], max_new_tokens: int, temperature: float, stop: Optional[List[str]]):
+        self.prompt_ids = prompt_ids
+        self.max_new_tokens = max(1, max_new_tokens)
+        self.temperature = temperature
+        self.stop = [item for item in (stop or []) if item]
+        self.tokens: List[int] = []
+        self.text = ""
+        self.error: Optional[BaseException] = None
+        self.cancelled = False
+        self.submitted = time.monotonic()
+        self._chunks: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def cancel(self):
+        """Interrompe a geração no próximo passo do lote."""
+        self.cancelled = True
+
+    def _emit(self, chunk: str):
+        self.text += chunk
+        self._chunks.put(chunk)
+
+    def _finish(self, error: Optional[BaseException] = None):
+        if self._done.is_set():
+            return
+        self.error = error
+        self._done.set()
+        self._chunks.put(None)
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                break
+            yield chunk
+        if self.error is not None:
+            raise self.error
+
+    def result(self, timeout: Optional[float] = None) -> str:
+        """Aguarda o fim da geração e retorna o texto completo."""
+        if not self._done.wait(timeout):
+            raise TimeoutError("Geração local não concluída no tempo limite.")
+        if self.error is not None:
+            raise self.error
+        return self.text
+
+
+class _TorchRunner:
+    """Executa prefill e passos de decodificação de um lote com cache KV (transformers).
+
+    As sequências ficam alinhadas à direita (padding à esquerda): novas
+    sequências são concatenadas ao lote em andamento completando com zeros a
+    parte mais curta do cache e da máscara de atenção.
+    """
+
+    def __init__(self, model_path: str, backend: str = "torch", threads: int = 0, max_input_tokens: int = 2048):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        model = AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=torch.float32)
+        model.eval()
+        if backend == "torch-int8":
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.max_input_tokens = max_input_tokens
+        self.eos_token_id = self.tokenizer.eos_token_id
+        self.pad_token_id = self.tokenizer.pad_token_id if self.tokenizer.pad_token_id is not None else (self.eos_token_id or 0)
+        self._cache = None  # por camada: (chaves, valores) com forma [lote, cabeças, posições, dim]
+        self._mask = None  # [lote, posições]
+        self._last = None  # último token de cada sequência, [lote, 1]
+        self._temperatures: List[float] = []
+
+    def encode(self, prompt: str) -> List[int]:
+        ids = self.tokenizer(prompt)["input_ids"]
+        return ids[-self.max_input_tokens:] if self.max_input_tokens else ids
+
+    def decode(self, ids: List[int]) -> str:
+        return self.tokenizer.decode(ids, skip_special_tokens=True)
+
+    @staticmethod
+    def _legacy(past_key_values):
+        return past_key_values.to_legacy_cache() if hasattr(past_key_values, "to_legacy_cache") else past_key_values
+
+    @staticmethod
+    def _wrap(cache):
+        try:
+            from transformers import DynamicCache
+            return DynamicCache.from_legacy_cache(cache)
+        except ImportError:
+            return cache
+
+    def _pad_left(self, cache, mask, width: int):
+        if width <= 0:
+            return cache, mask
+        torch = self.torch
+        cache = tuple(
+            tuple(torch.nn.functional.pad(tensor, (0, 0, width, 0)) for tensor in layer)
+            for layer in cache
+        )
+        return cache, torch.nn.functional.pad(mask, (width, 0))
+
+    def _sample(self, logits, temperatures: List[float]):
+        torch = self.torch
+        tokens = logits.argmax(dim=-1)
+        temps = torch.tensor(temperatures, dtype=logits.dtype)
+        if bool((temps > 0).any()):
+            probs = torch.softmax(logits / temps.clamp(min=1e-5)[:, None], dim=-1)
+            sampled = torch.multinomial(probs, 1).squeeze(-1)
+            tokens = torch.where(temps > 0, sampled, tokens)
+        return tokens
+
+    def prefill(self, prompts: List[List[int]], temperatures: List[float]) -> List[int]:
+        """Processa os prompts de novas sequências e as anexa ao lote; retorna o primeiro token de cada."""
+        torch = self.torch
+        length = max(len(ids) for ids in prompts)
+        input_ids = torch.full((len(prompts), length), self.pad_token_id, dtype=torch.long)
+        mask = torch.zeros((len(prompts), length), dtype=torch.long)
+        for row, ids in enumerate(prompts):
+            input_ids[row, length - len(ids):] = torch.tensor(ids, dtype=torch.long)
+            mask[row, length - len(ids):] = 1
+
+        with torch.inference_mode():
+            output = self.model(
+                input_ids=input_ids,
+                attention_mask=mask,
+                position_ids=(mask.cumsum(-1) - 1).clamp(min=0),
+                use_cache=True
+            )
+        cache = self._legacy(output.past_key_values)
+        tokens = self._sample(output.logits[:, -1, :], temperatures)
+
+        if self._cache is None:
+            self._cache, self._mask, self._last = cache, mask, tokens[:, None]
+        else:
+            width = max(self._mask.shape[1], mask.shape[1])
+            old_cache, old_mask = self._pad_left(self._cache, self._mask, width - self._mask.shape[1])
+            cache, mask = self._pad_left(cache, mask, width - mask.shape[1])
+            self._cache = tuple(
+                tuple(torch.cat([old, new], dim=0) for old, new in zip(old_layer, new_layer))
+                for old_layer, new_layer in zip(old_cache, cache)
+            )
+            self._mask = torch.cat([old_mask, mask], dim=0)
+            self._last = torch.cat([self._last, tokens[:, None]], dim=0)
+        self._temperatures.extend(temperatures)
+        return tokens.tolist()
+
+    def step(self) -> List[int]:
+        """Gera o próximo token de todas as sequências do lote."""
+        torch = self.torch
+        self._mask = torch.cat([self._mask, torch.ones((self._mask.shape[0], 1), dtype=self._mask.dtype)], dim=1)
+        with torch.inference_mode():
+            output = self.model(
+                input_ids=self._last,
+                attention_mask=self._mask,
+                position_ids=self._mask.sum(-1, keepdim=True) - 1,
+                past_key_values=self._wrap(self._cache),
+                use_cache=True
+            )
+        self._cache = self._legacy(output.past_key_values)
+        tokens = self._sample(output.logits[:, -1, :], self._temperatures)
+        self._last = tokens[:, None]
+        return tokens.tolist()
+
+    def keep(self, rows: List[int]):
+        """Mantém apenas as linhas indicadas do lote (na ordem dada)."""
+        if not rows:
+            self._cache = self._mask = self._last = None
+            self._temperatures = []
+            return
+        torch = self.torch
+        index = torch.tensor(rows, dtype=torch.long)
+        mask = self._mask.index_select(0, index)
+        # Descarta as colunas iniciais que ficaram só com padding
+        start = int((mask.sum(0) > 0).nonzero()[0])
+        self._cache = tuple(
+            tuple(tensor.index_select(0, index)[:, :, start:, :] for tensor in layer)
+            for layer in self._cache
+        )
+        self._mask = mask[:, start:]
+        self._last = self._last.index_select(0, index)
+        self._temperatures = [self._temperatures[row] for row in rows]
+
+
+class LocalGenerationEngine:
+    """Fila de pedidos e agendador de lotes contínuos sobre um executor de modelo.
+
+    O executor precisa expor `encode`, `decode`, `prefill`, `step`, `keep` e
+    `eos_token_id` (ver `_TorchRunner`).
+    """
+
+    def __init__(self, runner, max_batch_size: int = 8, name: str = "local"):
+        self.runner = runner
+        self.max_batch_size = max(1, max_batch_size)
+        self.name = name
+        self._waiting: Deque[GenerationRequest] = deque()
+        self._active: List[GenerationRequest] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._metrics = {"requests": 0, "tokens": 0, "steps": 0, "batched_rows": 0, "errors": 0}
+        self._thread = threading.Thread(target=self._run, name=f"local-llm-{name}", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_pretrained(
+        cls,
+        model_path: str,
+        backend: str = "torch",
+        max_batch_size: int = 8,
+        threads: int = 0,
+        max_input_tokens: int = 2048
+    ) -> "LocalGenerationEngine":
+        if backend not in SUPPORTED_BACKENDS:
+            raise ValueError(f"Backend de LLM local não suportado: {backend}")
+        runner = _TorchRunner(model_path, backend=backend, threads=threads, max_input_tokens=max_input_tokens)
+        return cls(runner, max_batch_size=max_batch_size, name=model_path)
+
+    def submit(
+        self,
+        prompt: str,
+        max_new_tokens: int = 512,
+        temperature: float = 0.7,
+        stop: Optional[List[str]] = None
+    ) -> GenerationRequest:
+        """Enfileira um pedido; o resultado é lido por iteração (streaming) ou `result()`."""
+        request = GenerationRequest(self.runner.encode(prompt), max_new_tokens, temperature, stop)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"Motor local {self.name} encerrado.")
+            self._waiting.append(request)
+            self._metrics["requests"] += 1
+            self._cond.notify()
+        return request
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        return self.submit(prompt, **kwargs).result()
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        return iter(self.submit(prompt, **kwargs))
+
+    @property
+    def queue_depth(self) -> int:
+        """Pedidos aguardando vaga no lote mais os em geração."""
+        with self._cond:
+            return len(self._waiting) + len(self._active)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._waiting and not self._active and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._waiting and not self._active:
+                    return
+                active = list(self._active)
+                admitted = []
+                while self._waiting and len(active) + len(admitted) < self.max_batch_size:
+                    request = self._waiting.popleft()
+                    # Cancelado (ou concluído) enquanto aguardava vaga: não ocupa o lote
+                    if request.cancelled or request.done:
+                        request._finish()
+                        continue
+                    admitted.append(request)
+                self._active = active + admitted
+
+            # O lote é processado fora do lock em uma cópia local, publicada ao final
+            try:
+                if admitted:
+                    tokens = self.runner.prefill([r.prompt_ids for r in admitted], [r.temperature for r in admitted])
+                    active.extend(admitted)
+                    self._advance(admitted, tokens)
+                    active = self._prune(active)
+                if active:
+                    tokens = self.runner.step()
+                    self._metrics["steps"] += 1
+                    self._metrics["batched_rows"] += len(active)
+                    self._advance(active, tokens)
+                    active = self._prune(active)
+            except Exception as e:
+                logger.error(f"Erro na geração local ({self.name}): {str(e)}")
+                self._metrics["errors"] += 1
+                # Pedidos recém-admitidos só entram no lote após o prefill
+                for request in active + admitted:
+                    request._finish(e)
+                active = []
+                self.runner.keep([])
+            with self._cond:
+                self._active = active
+
+    def _advance(self, requests: List[GenerationRequest], tokens: List[int]):
+        """Acrescenta um token a cada pedido, emitindo o texto novo e marcando os concluídos."""
+        for request, token in zip(requests, tokens):
+            if request.done:
+                continue
+            if request.cancelled or token == self.runner.eos_token_id:
+                self._complete(request, self.runner.decode(request.tokens))
+                continue
+            request.tokens.append(token)
+            self._metrics["tokens"] += 1
+            text = self.runner.decode(request.tokens)
+            stop_at = min((text.find(item) for item in request.stop if item in text), default=-1)
+            if stop_at >= 0 or len(request.tokens) >= request.max_new_tokens:
+                self._complete(request, text[:stop_at] if stop_at >= 0 else text)
+                continue
+            # Retém o final que ainda pode virar um stop (ou um caractere multibyte incompleto)
+            held = max((size for item in request.stop for size in range(1, len(item)) if text.endswith(item[:size])), default=0)
+            ready = text[:len(text) - held]
+            if len(ready) > len(request.text) and not ready.endswith("\ufffd"):
+                request._emit(ready[len(request.text):])
+
+    @staticmethod
+    def _complete(request: GenerationRequest, text: str):
+        if len(text) > len(request.text):
+            request._emit(text[len(request.text):])
+        request._finish()
+
+    def _prune(self, active: List[GenerationRequest]) -> List[GenerationRequest]:
+        """Remove do lote (e do cache KV) os pedidos concluídos."""
+        if not any(request.done for request in active):
+            return active
+        rows = [row for row, request in enumerate(active) if not request.done]
+        self.runner.keep(rows)
+        return [active[row] for row in rows]
+
+    def stats(self) -> Dict[str, float]:
+        """Pedidos, tokens gerados, passos e tamanho médio do lote."""
+        metrics = dict(self._metrics)
+        metrics["queue_depth"] = self.queue_depth
+        metrics["avg_batch_size"] = metrics["batched_rows"] / metrics["steps"] if metrics["steps"] else 0.0
+        return metrics
+
+    def close(self):
+        """Encerra o agendador depois de concluir os pedidos já enfileirados."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+
+class LocalLLM(LLM):
+    """LLM do LangChain sobre um `LocalGenerationEngine` compartilhado.
+
+    Várias chamadas concorrentes (ou vários prompts de um mesmo `generate`)
+    entram no mesmo lote contínuo do motor.
+    """
+
+    engine: Any
+    model_id: str = "local"
+    temperature: float = 0.7
+    max_tokens: int = 512
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "local"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_id": self.model_id, "temperature": self.temperature, "max_tokens": self.max_tokens}
+
+    def _submit(self, prompt: str, stop: Optional[List[str]], kwargs: Dict[str, Any]) -> GenerationRequest:
+        return self.engine.submit(
+            prompt,
+            max_new_tokens=kwargs.get("max_tokens", self.max_tokens),
+            temperature=kwargs.get("temperature", self.temperature),
+            stop=stop
+        )
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> str:
+        text = ""
+        for chunk in self._stream(prompt, stop=stop, run_manager=run_manager, **kwargs):
+            text += chunk.text
+        return text
+
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> LLMResult:
+        # Enfileira todos os prompts antes de aguardar, para que sejam gerados no mesmo lote
+        requests = [self._submit(prompt, stop, kwargs) for prompt in prompts]
+        try:
+            # Aguarda no máximo até o prazo da execução em andamento
+            texts = [request.result(remaining_time()) for request in requests]
+        except BaseException:
+            for request in requests:
+                request.cancel()
+            raise
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> Iterator[GenerationChunk]:
+        request = self._submit(prompt, stop, kwargs)
+        try:
+            for text in request:
+                check_budget()
+                if run_manager:
+                    run_manager.on_llm_new_token(text)
+                yield GenerationChunk(text=text)
+        finally:
+            request.cancel()
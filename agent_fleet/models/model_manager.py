@@ -1,9 +1,17 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, Optional, Tuple
 from langchain_community.llms import HuggingFaceHub, OpenAI
-from langchain_community.embeddings import HuggingFaceEmbeddings, OpenAIEmbeddings
+from langchain_community.embeddings import OpenAIEmbeddings
 from langchain.llms.base import BaseLLM
 from agent_fleet.config.settings import settings, ModelType
+from agent_fleet.models.embedding_cache import CachedEmbeddings
+from agent_fleet.models.completion_cache import CachedLLM, CompletionCache
+from agent_fleet.models.local_llm import LocalGenerationEngine, LocalLLM
+from agent_fleet.models.async_client import AsyncLLMClient, PooledLLM
+from agent_fleet.models.router import ModelRouter, RoutedLLM
+from agent_fleet.models.embedding_engine import BatchedEmbeddings
+import time
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -11,64 +19,277 @@ class ModelManager:
     """Gerenciador centralizado para modelos de linguagem e embeddings."""
     
     _instance = None
+    _instance_lock = threading.RLock()
     _models: Dict[str, Any] = {}
     _embeddings: Dict[str, Any] = {}
     
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(ModelManager, cls).__new__(cls)
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = super(ModelManager, cls).__new__(cls)
         return cls._instance
     
     def __init__(self):
         if not hasattr(self, '_initialized'):
-            self._initialized = True
-            self._initialize_models()
+            with self._instance_lock:
+                if not hasattr(self, '_initialized'):
+                    # Modelos são construídos sob demanda em `get_model` (ou via `preload`)
+                    self._model_locks: Dict[str, threading.Lock] = {}
+                    # model_id -> (falhas consecutivas, instante da próxima tentativa, último erro)
+                    self._failures: Dict[str, Tuple[int, float, str]] = {}
+                    self._completion_cache: Optional[CompletionCache] = None
+                    # Motores locais por caminho do modelo (compartilhados entre IDs)
+                    self._local_engines: Dict[str, LocalGenerationEngine] = {}
+                    self._engine_locks: Dict[str, threading.Lock] = {}
+                    self._async_client: Optional[AsyncLLMClient] = None
+                    self._router: Optional[ModelRouter] = None
+                    self._routed: Dict[str, RoutedLLM] = {}
+                    self._crew_llms: Dict[str, Any] = {}
+                    self._routed_crew_llms: Dict[str, Any] = {}
+                    self._initialized = True
     
-    def _initialize_models(self):
-        """Inicializa os modelos configurados."""
-        for model_id, config in settings.AVAILABLE_MODELS.items():
+    def _model_lock(self, model_id: str) -> threading.Lock:
+        with self._instance_lock:
+            return self._model_locks.setdefault(model_id, threading.Lock())
+    
+    def preload(self, model_ids: Optional[Iterable[str]] = None) -> Dict[str, bool]:
+        """Constrói antecipadamente os modelos indicados (padrão: `MODEL_PRELOAD`).
+        
+        Falhas são registradas e não interrompem os demais; retorna quais modelos
+        ficaram disponíveis.
+        """
+        model_ids = list(model_ids) if model_ids is not None else list(settings.MODEL_PRELOAD)
+        loaded = {}
+        for model_id in model_ids:
             try:
                 self.get_model(model_id)
+                loaded[model_id] = True
                 logger.info(f"Modelo {model_id} inicializado com sucesso.")
             except Exception as e:
+                loaded[model_id] = False
                 logger.error(f"Erro ao inicializar modelo {model_id}: {str(e)}")
+        return loaded
     
     def get_model(self, model_id: str) -> BaseLLM:
-        """Obtém uma instância do modelo pelo ID."""
+        """Obtém uma instância do modelo pelo ID, construindo-a no primeiro uso.
+        
+        Se a construção falhar, novas tentativas só ocorrem após um intervalo
+        que dobra a cada falha consecutiva (de `MODEL_RETRY_BACKOFF` até
+        `MODEL_RETRY_BACKOFF_MAX` segundos); antes disso o erro é repetido
+        sem nova chamada de rede.
+        """
         if model_id in self._models:
             return self._models[model_id]
         
         if model_id not in settings.AVAILABLE_MODELS:
             raise ValueError(f"Modelo {model_id} não encontrado nas configurações.")
         
-        model_config = settings.AVAILABLE_MODELS[model_id]
+        with self._model_lock(model_id):
+            if model_id in self._models:
+                return self._models[model_id]
+            
+            failure = self._failures.get(model_id)
+            if failure is not None and time.monotonic() < failure[1]:
+                raise RuntimeError(
+                    f"Modelo {model_id} indisponível (nova tentativa em "
+                    f"{failure[1] - time.monotonic():.1f}s): {failure[2]}"
+                )
+            
+            try:
+                self._models[model_id] = self._build_model(model_id, settings.AVAILABLE_MODELS[model_id])
+            except Exception as e:
+                self._record_failure(model_id, e)
+                logger.error(f"Erro ao carregar modelo {model_id}: {str(e)}")
+                raise
+            
+            self._failures.pop(model_id, None)
+            return self._models[model_id]
+    
+    def _build_model(self, model_id: str, model_config: Dict[str, Any]) -> BaseLLM:
         model_type = model_config.get("type")
         
-        try:
-            if model_type == ModelType.OPENAI:
-                self._models[model_id] = OpenAI(
-                    model_name=model_config["name"],
-                    temperature=model_config.get("temperature", 0.7),
-                    max_tokens=model_config.get("max_tokens", 2000),
-                    openai_api_key=settings.OPENAI_API_KEY
-                )
-            elif model_type == ModelType.HUGGINGFACE:
-                self._models[model_id] = HuggingFaceHub(
-                    repo_id=model_config["name"],
-                    model_kwargs={
-                        "temperature": model_config.get("temperature", 0.7),
-                        "max_length": model_config.get("max_length", 512)
-                    },
-                    huggingfacehub_api_token=settings.HUGGINGFACEHUB_API_TOKEN
+        if settings.LLM_CLIENT_POOLED and model_type in (ModelType.OPENAI, ModelType.HUGGINGFACE):
+            # Chamadas diretas às APIs pelo cliente assíncrono compartilhado
+            max_tokens = model_config.get("max_tokens", model_config.get("max_length", 512))
+            llm = PooledLLM(
+                client=self.get_async_client(),
+                model_id=model_id,
+                temperature=model_config.get("temperature", 0.7),
+                max_tokens=max_tokens
+            )
+        elif model_type == ModelType.OPENAI:
+            max_tokens = model_config.get("max_tokens", 2000)
+            llm = OpenAI(
+                model_name=model_config["name"],
+                temperature=model_config.get("temperature", 0.7),
+                max_tokens=max_tokens,
+                openai_api_key=settings.OPENAI_API_KEY
+            )
+        elif model_type == ModelType.HUGGINGFACE:
+            max_tokens = model_config.get("max_length", 512)
+            llm = HuggingFaceHub(
+                repo_id=model_config["name"],
+                model_kwargs={
+                    "temperature": model_config.get("temperature", 0.7),
+                    "max_length": max_tokens
+                },
+                huggingfacehub_api_token=settings.HUGGINGFACEHUB_API_TOKEN
+            )
+        elif model_type == ModelType.LOCAL:
+            max_tokens = model_config.get("max_tokens", 512)
+            llm = LocalLLM(
+                engine=self.get_local_engine(model_config.get("path", model_config["name"])),
+                model_id=model_id,
+                temperature=model_config.get("temperature", 0.7),
+                max_tokens=max_tokens
+            )
+        else:
+            raise ValueError(f"Tipo de modelo não suportado: {model_type}")
+        
+        if not settings.LLM_CACHE_ENABLED:
+            return llm
+        # "cache": True | False | "sampled" (também cacheia chamadas com temperatura > 0)
+        cache_mode = model_config.get("cache", True)
+        return CachedLLM(
+            llm=llm,
+            model_id=model_id,
+            completion_cache=self.get_completion_cache(),
+            temperature=model_config.get("temperature", 0.7),
+            max_tokens=max_tokens,
+            enabled=bool(cache_mode),
+            deterministic_only=settings.LLM_CACHE_DETERMINISTIC_ONLY and cache_mode != "sampled"
+        )
+    
+    def get_crew_llm(self, model_id: str):
+        """Modelo no formato esperado pelos agentes do crewai (`CrewLLM`), construído no primeiro uso."""
+        from agent_fleet.models.crew_llm import CrewLLM
+        
+        if model_id not in settings.AVAILABLE_MODELS:
+            raise ValueError(f"Modelo {model_id} não encontrado nas configurações.")
+        with self._instance_lock:
+            if model_id not in self._crew_llms:
+                self._crew_llms[model_id] = CrewLLM(model_id, get_llm=self.get_model)
+            return self._crew_llms[model_id]
+    
+    def get_router(self) -> ModelRouter:
+        """Roteador compartilhado entre os modelos (políticas em `MODEL_ROUTING_POLICIES`)."""
+        if self._router is None:
+            with self._instance_lock:
+                if self._router is None:
+                    self._router = ModelRouter(
+                        settings.MODEL_ROUTING_POLICIES,
+                        window=settings.MODEL_ROUTER_WINDOW,
+                        breaker_failures=settings.MODEL_BREAKER_FAILURES,
+                        breaker_error_rate=settings.MODEL_BREAKER_ERROR_RATE,
+                        breaker_cooldown=settings.MODEL_BREAKER_COOLDOWN,
+                        default_latency=settings.MODEL_ROUTER_DEFAULT_LATENCY,
+                        prices={
+                            model_id: config.get("cost_per_1k_tokens", 0.0)
+                            for model_id, config in settings.AVAILABLE_MODELS.items()
+                        }
+                    )
+        return self._router
+    
+    def get_routed_model(self, policy: str) -> RoutedLLM:
+        """LLM que escolhe, a cada chamada, um modelo da política (com fallback entre eles)."""
+        with self._instance_lock:
+            if policy not in self._routed:
+                router = self.get_router()
+                if policy not in router.policies:
+                    raise ValueError(f"Política de roteamento {policy} não encontrada nas configurações.")
+                self._routed[policy] = RoutedLLM(router=router, policy=policy, get_llm=self.get_model)
+            return self._routed[policy]
+    
+    def get_routed_crew_llm(self, policy: str):
+        """Política de roteamento no formato esperado pelos agentes do crewai (`RoutedCrewLLM`)."""
+        from agent_fleet.models.crew_llm import RoutedCrewLLM
+        
+        with self._instance_lock:
+            if policy not in self._routed_crew_llms:
+                router = self.get_router()
+                if policy not in router.policies:
+                    raise ValueError(f"Política de roteamento {policy} não encontrada nas configurações.")
+                self._routed_crew_llms[policy] = RoutedCrewLLM(router, policy, get_llm=self.get_model)
+            return self._routed_crew_llms[policy]
+    
+    def get_local_engine(self, model_path: str) -> LocalGenerationEngine:
+        """Motor de geração local (lotes contínuos) para os pesos em `model_path`.
+        
+        O carregamento dos pesos trava apenas este caminho: outros modelos seguem disponíveis.
+        """
+        if model_path in self._local_engines:
+            return self._local_engines[model_path]
+        with self._instance_lock:
+            lock = self._engine_locks.setdefault(model_path, threading.Lock())
+        with lock:
+            if model_path not in self._local_engines:
+                self._local_engines[model_path] = LocalGenerationEngine.from_pretrained(
+                    model_path,
+                    backend=settings.LOCAL_LLM_BACKEND,
+                    max_batch_size=settings.LOCAL_LLM_MAX_BATCH_SIZE,
+                    threads=settings.LOCAL_LLM_THREADS,
+                    max_input_tokens=settings.LOCAL_LLM_MAX_INPUT_TOKENS
                 )
+            return self._local_engines[model_path]
+    
+    def get_async_client(self) -> AsyncLLMClient:
+        """Cliente HTTP assíncrono compartilhado (pool de conexões, limites por modelo, retries, hedging)."""
+        if self._async_client is None:
+            with self._instance_lock:
+                if self._async_client is None:
+                    self._async_client = AsyncLLMClient(
+                        max_connections=settings.LLM_CLIENT_MAX_CONNECTIONS,
+                        max_keepalive=settings.LLM_CLIENT_MAX_KEEPALIVE,
+                        timeout=settings.LLM_CLIENT_TIMEOUT,
+                        retries=settings.LLM_CLIENT_RETRIES,
+                        backoff=settings.LLM_CLIENT_BACKOFF,
+                        backoff_max=settings.LLM_CLIENT_BACKOFF_MAX,
+                        hedge=settings.LLM_CLIENT_HEDGE,
+                        hedge_min_delay=settings.LLM_CLIENT_HEDGE_MIN_DELAY
+                    )
+        return self._async_client
+    
+    def get_completion_cache(self) -> CompletionCache:
+        """Cache de respostas compartilhado por todos os modelos (`LLM_CACHE_*`)."""
+        if self._completion_cache is None:
+            with self._instance_lock:
+                if self._completion_cache is None:
+                    self._completion_cache = CompletionCache(
+                        path=settings.LLM_CACHE_PATH,
+                        memory_items=settings.LLM_CACHE_MEMORY_ITEMS,
+                        max_disk_bytes=settings.LLM_CACHE_MAX_BYTES
+                    )
+        return self._completion_cache
+    
+    def _record_failure(self, model_id: str, error: Exception):
+        attempts = self._failures.get(model_id, (0, 0.0, ""))[0] + 1
+        delay = min(settings.MODEL_RETRY_BACKOFF * 2 ** (attempts - 1), settings.MODEL_RETRY_BACKOFF_MAX)
+        self._failures[model_id] = (attempts, time.monotonic() + delay, str(error))
+    
+    def reset_model(self, model_id: Optional[str] = None):
+        """Descarta a instância e o histórico de falhas de um modelo (ou de todos)."""
+        with self._instance_lock:
+            if model_id is None:
+                self._models.clear()
+                self._failures.clear()
             else:
-                raise ValueError(f"Tipo de modelo não suportado: {model_type}")
-            
-            return self._models[model_id]
-            
-        except Exception as e:
-            logger.error(f"Erro ao carregar modelo {model_id}: {str(e)}")
-            raise
+                self._models.pop(model_id, None)
+                self._failures.pop(model_id, None)
+    
+    def model_status(self) -> Dict[str, Dict[str, Any]]:
+        """Estado de cada modelo configurado: carregado, falhas consecutivas e último erro."""
+        now = time.monotonic()
+        status = {}
+        for model_id in settings.AVAILABLE_MODELS:
+            attempts, retry_at, error = self._failures.get(model_id, (0, 0.0, ""))
+            status[model_id] = {
+                "loaded": model_id in self._models,
+                "failures": attempts,
+                "retry_in": max(0.0, retry_at - now) if attempts else 0.0,
+                "error": error or None
+            }
+        return status
     
     def get_embeddings(self, model_name: str = None) -> Any:
         """Obtém um modelo de embeddings."""
@@ -77,25 +298,43 @@ class ModelManager:
         if model_name in self._embeddings:
             return self._embeddings[model_name]
         
-        try:
-            if model_name.startswith("text-embedding"):
-                # Modelo da OpenAI
-                self._embeddings[model_name] = OpenAIEmbeddings(
-                    model=model_name,
-                    openai_api_key=settings.OPENAI_API_KEY
-                )
-            else:
-                # Modelo do HuggingFace
-                self._embeddings[model_name] = HuggingFaceEmbeddings(
-                    model_name=model_name,
-                    model_kwargs={"device": "cpu"}
-                )
+        with self._instance_lock:
+            if model_name in self._embeddings:
+                return self._embeddings[model_name]
             
-            return self._embeddings[model_name]
-            
-        except Exception as e:
-            logger.error(f"Erro ao carregar modelo de embeddings {model_name}: {str(e)}")
-            raise
+            try:
+                if model_name.startswith("text-embedding"):
+                    # Modelo da OpenAI
+                    embeddings = OpenAIEmbeddings(
+                        model=model_name,
+                        openai_api_key=settings.OPENAI_API_KEY
+                    )
+                else:
+                    # Modelo do HuggingFace (sentence-transformers em lotes, na CPU)
+                    embeddings = BatchedEmbeddings(
+                        model_name=model_name,
+                        batch_size=settings.EMBEDDING_BATCH_SIZE,
+                        max_seq_length=settings.EMBEDDING_MAX_SEQ_LENGTH or None,
+                        num_workers=settings.EMBEDDING_WORKERS,
+                        backend=settings.EMBEDDING_BACKEND
+                    )
+                
+                if settings.EMBEDDING_CACHE_ENABLED:
+                    embeddings = CachedEmbeddings(
+                        embeddings,
+                        model_name=model_name,
+                        path=settings.EMBEDDING_CACHE_PATH,
+                        memory_items=settings.EMBEDDING_CACHE_MEMORY_ITEMS,
+                        max_disk_bytes=settings.EMBEDDING_CACHE_MAX_BYTES
+                    )
+                
+                # Publicado já com o cache: leitores sem lock nunca veem o modelo sem ele
+                self._embeddings[model_name] = embeddings
+                return embeddings
+                
+            except Exception as e:
+                logger.error(f"Erro ao carregar modelo de embeddings {model_name}: {str(e)}")
+                raise
     
     def list_available_models(self) -> Dict[str, Dict]:
         """Lista todos os modelos disponíveis."""
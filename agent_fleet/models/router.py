@@ -0,0 +1,274 @@
+"""
+Roteamento de chamadas entre os modelos de `AVAILABLE_MODELS`.
+
+Cada política (`MODEL_ROUTING_POLICIES`) lista os modelos candidatos em ordem
+de preferência e um objetivo:
+
+- `quality`: usa o primeiro modelo saudável da lista (opcionalmente só se o
+  p95 observado estiver abaixo de `max_p95`)
+- `latency`: usa o modelo de menor custo estimado, p95 x (1 + fila) x
+  (1 + 4 * taxa de erro)
+- `cost`: usa o modelo de menor preço (`cost_per_1k_tokens`; sem preço conta
+  como 0), com desempate pelo custo estimado de latência
+
+Modelos com o circuito aberto (falhas consecutivas ou taxa de erro alta na
+janela recente) ficam fora até o fim do `cooldown`, quando uma única chamada
+de teste decide se o circuito fecha. Se o modelo escolhido falhar, a chamada
+segue para o próximo candidato (`ModelRouter.call`).
+"""
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from langchain.llms.base import BaseLLM
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.outputs import LLMResult
+from agent_fleet.crew.budget import BudgetExceeded, current_budget
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class _ModelHealth:
+    """Janela recente de latências e resultados de um modelo, com o circuit breaker."""
+
+    def __init__(self, window: int):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.metrics = {"calls": 0, "failures": 0, "fallbacks": 0, "circuit_opens": 0}
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+
+class ModelRouter:
+    """Escolhe o modelo de cada chamada pelas latências, erros e fila observados."""
+
+    def __init__(
+        self,
+        policies: Dict[str, Dict[str, Any]],
+        window: int = 100,
+        breaker_failures: int = 5,
+        breaker_error_rate: float = 0.5,
+        breaker_cooldown: float = 30.0,
+        default_latency: float = 5.0,
+        prices: Optional[Dict[str, float]] = None
+    ):
+        self.policies = policies
+        self.prices = dict(prices or {})
+        self.window = window
+        self.breaker_failures = breaker_failures
+        self.breaker_error_rate = breaker_error_rate
+        self.breaker_cooldown = breaker_cooldown
+        self.default_latency = default_latency
+        self._health: Dict[str, _ModelHealth] = {}
+        self._decisions: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _get_health(self, model_id: str) -> _ModelHealth:
+        health = self._health.get(model_id)
+        if health is None:
+            health = self._health[model_id] = _ModelHealth(self.window)
+        return health
+
+    def _available(self, health: _ModelHealth, now: float) -> bool:
+        """Indica se o modelo pode ser tentado; em meia-abertura, reserva a chamada de teste."""
+        if health.state == OPEN and now - health.opened_at >= self.breaker_cooldown:
+            health.state = HALF_OPEN
+            health.probing = False
+        if health.state == HALF_OPEN:
+            if health.probing:
+                return False
+            health.probing = True
+            return True
+        return health.state == CLOSED
+
+    def _cost(self, health: _ModelHealth) -> float:
+        p95 = health.percentile(0.95)
+        latency = p95 if p95 is not None else self.default_latency
+        return latency * (1 + health.in_flight) * (1 + 4 * health.error_rate)
+
+    def candidates(self, policy: str) -> List[str]:
+        """Modelos a tentar, em ordem, para uma chamada da política (sem os de circuito aberto).
+
+        Um modelo em meia-abertura é entregue a um único chamador, que fica com a
+        chamada de teste: ele deve encerrá-la com `end` ou `cancel`, ou devolvê-la
+        com `release` se não chegar a usar o modelo.
+        """
+        if policy not in self.policies:
+            raise ValueError(f"Política de roteamento {policy} não encontrada nas configurações.")
+        config = self.policies[policy]
+        models = list(config["models"])
+        now = time.monotonic()
+        with self._lock:
+            healthy = [model_id for model_id in models if self._available(self._get_health(model_id), now)]
+            objective = config.get("objective", "quality")
+            if objective == "latency":
+                healthy.sort(key=lambda model_id: self._cost(self._health[model_id]))
+            elif objective == "cost":
+                healthy.sort(key=lambda model_id: (
+                    self.prices.get(model_id, 0.0), self._cost(self._health[model_id])
+                ))
+            elif config.get("max_p95"):
+                # Modelos acima do limite de latência vão para o fim (ainda servem de fallback)
+                healthy.sort(key=lambda model_id: (self._health[model_id].percentile(0.95) or 0.0) > config["max_p95"])
+            if healthy:
+                decisions = self._decisions.setdefault(policy, {})
+                decisions[healthy[0]] = decisions.get(healthy[0], 0) + 1
+        return healthy
+
+    def begin(self, model_id: str) -> float:
+        """Marca o início de uma chamada (conta na fila do modelo)."""
+        with self._lock:
+            self._get_health(model_id).in_flight += 1
+        return time.monotonic()
+
+    def release(self, model_id: str):
+        """Devolve a chamada de teste reservada por `candidates` para um modelo não usado."""
+        with self._lock:
+            health = self._get_health(model_id)
+            if health.state == HALF_OPEN:
+                health.probing = False
+
+    def cancel(self, model_id: str):
+        """Encerra uma chamada interrompida pelo orçamento da execução, sem registrar resultado."""
+        with self._lock:
+            health = self._get_health(model_id)
+            health.in_flight -= 1
+            health.probing = False
+
+    def end(self, model_id: str, started: float, success: bool, fallback: bool = False):
+        """Registra o resultado de uma chamada e atualiza o circuit breaker."""
+        elapsed = time.monotonic() - started
+        with self._lock:
+            health = self._get_health(model_id)
+            health.in_flight -= 1
+            health.outcomes.append(success)
+            health.metrics["calls"] += 1
+            if fallback:
+                health.metrics["fallbacks"] += 1
+            if success:
+                health.latencies.append(elapsed)
+                health.consecutive_failures = 0
+                if health.state == HALF_OPEN:
+                    health.state = CLOSED
+                    logger.info(f"Circuito do modelo {model_id} fechado.")
+                return
+
+            health.metrics["failures"] += 1
+            health.consecutive_failures += 1
+            high_error_rate = (
+                len(health.outcomes) >= 10 and health.error_rate >= self.breaker_error_rate
+            )
+            if health.state == HALF_OPEN or health.consecutive_failures >= self.breaker_failures or high_error_rate:
+                if health.state != OPEN:
+                    health.metrics["circuit_opens"] += 1
+                    logger.warning(
+                        f"Circuito do modelo {model_id} aberto por {self.breaker_cooldown:.0f}s "
+                        f"({health.consecutive_failures} falhas seguidas, taxa de erro {health.error_rate:.0%})."
+                    )
+                health.state = OPEN
+                health.opened_at = time.monotonic()
+                health.probing = False
+
+    def call(self, policy: str, invoke: Callable[[str], Any]) -> Tuple[str, Any]:
+        """Executa `invoke(model_id)` nos candidatos da política até um deles responder.
+
+        Retorna (modelo usado, resultado). Falhas contam no circuito do modelo e
+        passam ao próximo candidato; um orçamento esgotado interrompe a chamada
+        sem contar como falha nem tentar outro modelo.
+        """
+        candidates = self.candidates(policy)
+        if not candidates:
+            raise RuntimeError(f"Nenhum modelo disponível para a política {policy} (circuitos abertos).")
+
+        error: Optional[Exception] = None
+        tried = 0
+        try:
+            for position, model_id in enumerate(candidates):
+                tried = position + 1
+                started = self.begin(model_id)
+                try:
+                    result = invoke(model_id)
+                except Exception as e:
+                    budget = current_budget()
+                    if isinstance(e, BudgetExceeded) or (budget is not None and budget.exhausted()):
+                        self.cancel(model_id)
+                        if isinstance(e, BudgetExceeded):
+                            raise
+                        raise BudgetExceeded(budget.reason) from e
+                    self.end(model_id, started, success=False, fallback=position > 0)
+                    logger.warning(f"Modelo {model_id} falhou na política {policy}: {str(e)}")
+                    error = e
+                    continue
+                self.end(model_id, started, success=True, fallback=position > 0)
+                return model_id, result
+        finally:
+            # Chamadas de teste reservadas para modelos que não chegaram a ser tentados
+            for model_id in candidates[tried:]:
+                self.release(model_id)
+
+        logger.error(f"Erro em todos os modelos da política {policy}: {str(error)}")
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        """Por modelo: latências, taxa de erro, fila e estado do circuito; decisões por política."""
+        with self._lock:
+            models = {
+                model_id: dict(
+                    health.metrics,
+                    p50=health.percentile(0.5),
+                    p95=health.percentile(0.95),
+                    error_rate=health.error_rate,
+                    in_flight=health.in_flight,
+                    circuit=health.state
+                )
+                for model_id, health in self._health.items()
+            }
+            decisions = {policy: dict(counts) for policy, counts in self._decisions.items()}
+        return {"models": models, "decisions": decisions}
+
+
+class RoutedLLM(BaseLLM):
+    """LLM do LangChain que delega cada chamada ao modelo escolhido pelo `ModelRouter`."""
+
+    router: Any
+    policy: str
+    get_llm: Callable[[str], BaseLLM]
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"policy": self.policy}
+
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> LLMResult:
+        model_id, result = self.router.call(
+            self.policy, lambda model_id: self.get_llm(model_id).generate(prompts, stop=stop, **kwargs)
+        )
+        return LLMResult(generations=result.generations, llm_output=dict(result.llm_output or {}, model_id=model_id))
@@ -0,0 +1,135 @@
+"""
+Registro preguiçoso de componentes.
+
+Nenhum subsistema pesado (modelos, embeddings, banco vetorial, equipes) é
+construído na importação do pacote. Cada componente é criado na primeira vez
+em que é solicitado e o tempo de construção fica registrado para diagnóstico.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ComponentRegistry:
+    """Registro thread-safe de componentes construídos sob demanda."""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._timings: Dict[str, float] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """Registra a fábrica de um componente (substitui a anterior)."""
+        with self._lock:
+            self._factories[name] = factory
+            self._locks.setdefault(name, threading.RLock())
+            self._instances.pop(name, None)
+            self._timings.pop(name, None)
+
+    def names(self):
+        """Lista os componentes registrados, na ordem de registro."""
+        return list(self._factories.keys())
+
+    def is_initialized(self, name: str) -> bool:
+        """Indica se o componente já foi construído."""
+        return name in self._instances
+
+    def get(self, name: str) -> Any:
+        """Obtém o componente, construindo-o na primeira chamada."""
+        if name in self._instances:
+            return self._instances[name]
+
+        with self._lock:
+            if name not in self._factories:
+                raise ValueError(f"Componente '{name}' não registrado.")
+            factory = self._factories[name]
+            component_lock = self._locks[name]
+
+        with component_lock:
+            if name in self._instances:
+                return self._instances[name]
+
+            start = time.perf_counter()
+            try:
+                instance = factory()
+            except Exception as e:
+                logger.error(f"Erro ao inicializar o componente {name}: {str(e)}")
+                raise
+            elapsed = time.perf_counter() - start
+
+            self._instances[name] = instance
+            self._timings[name] = elapsed
+            logger.info(f"Componente {name} inicializado em {elapsed:.2f}s.")
+            return instance
+
+    def warmup(self, names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """Constrói antecipadamente os componentes indicados (ou todos).
+
+        Retorna o tempo de construção, em segundos, de cada componente.
+        """
+        names = list(names) if names is not None else self.names()
+        for name in names:
+            self.get(name)
+        return {name: self._timings.get(name, 0.0) for name in names}
+
+    def timings(self) -> Dict[str, float]:
+        """Retorna o tempo de construção dos componentes já inicializados."""
+        return dict(self._timings)
+
+    def reset(self, name: Optional[str] = None):
+        """Descarta uma instância (ou todas) para que seja reconstruída."""
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+                self._timings.clear()
+            else:
+                self._instances.pop(name, None)
+                self._timings.pop(name, None)
+
+
+def _build_model_manager():
+    from agent_fleet.config.settings import settings
+    from agent_fleet.models.model_manager import get_model_manager
+    manager = get_model_manager()
+    manager.preload(settings.MODEL_PRELOAD)
+    return manager
+
+
+def _build_embeddings():
+    return registry.get("models").get_embeddings()
+
+
+def _build_vector_store():
+    # Garante que o tempo dos embeddings seja contabilizado separadamente
+    registry.get("embeddings")
+    from agent_fleet.vector_store.vector_store import get_vector_store
+    return get_vector_store()
+
+
+def _build_crew_manager():
+    registry.get("vector_store")
+    from agent_fleet.crew.crew_manager import get_crew_manager
+    return get_crew_manager()
+
+
+# Instância global
+registry = ComponentRegistry()
+registry.register("models", _build_model_manager)
+registry.register("embeddings", _build_embeddings)
+registry.register("vector_store", _build_vector_store)
+registry.register("crew", _build_crew_manager)
+
+
+def get_component(name: str) -> Any:
+    """Obtém um componente do registro global."""
+    return registry.get(name)
+
+
+def warmup(names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """Pré-aquece componentes do registro global e retorna os tempos."""
+    return registry.warmup(names)
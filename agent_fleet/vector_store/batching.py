@@ -0,0 +1,120 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingQuery:
+    __slots__ = ("query", "k", "filter", "future")
+
+    def __init__(self, query: str, k: int, filter: Optional[Dict[str, Any]]):
+        self.query = query
+        self.k = k
+        self.filter = filter
+        self.future: Future = Future()
+
+
+class QueryBatcher:
+    """Agrupa consultas concorrentes em lotes (micro-batching).
+
+    Cada consulta individual entra em uma fila; uma thread de despacho espera a
+    primeira, coleta as que chegarem em até `max_wait_ms` (ou até `max_batch_size`)
+    e executa todas com uma única chamada a `search_batch`, que embute as consultas
+    em uma passada e faz uma única busca no FAISS. `search` espera no máximo
+    `timeout` segundos pelo resultado.
+    """
+
+    def __init__(
+        self,
+        search_batch: Callable[..., List[List[Document]]],
+        max_wait_ms: float = 2.0,
+        max_batch_size: int = 64,
+        timeout: Optional[float] = 30.0
+    ):
+        self.search_batch = search_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self.timeout = timeout
+        self._queue: "queue.Queue[Optional[_PendingQuery]]" = queue.Queue()
+        self._closed = False
+        self._metrics = {"queries": 0, "batches": 0}
+        self._thread = threading.Thread(target=self._run, name="vector-store-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> Future:
+        """Enfileira uma consulta; o resultado (lista de documentos) chega pelo Future."""
+        if self._closed:
+            raise RuntimeError("QueryBatcher encerrado.")
+        if not self._thread.is_alive():
+            raise RuntimeError("Thread de despacho do QueryBatcher encerrada.")
+        pending = _PendingQuery(query, k, filter)
+        self._queue.put(pending)
+        return pending.future
+
+    def search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """Versão bloqueante de `submit`; levanta `TimeoutError` após `timeout` segundos."""
+        future = self.submit(query, k, filter)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Busca em lote não concluída em {self.timeout}s.")
+
+    def _collect(self, first: _PendingQuery) -> List[_PendingQuery]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            try:
+                # Um único k (o maior) para todo o lote; cada consulta recebe seus k primeiros
+                k = max(item.k for item in batch)
+                results = self.search_batch(
+                    [item.query for item in batch],
+                    k=k,
+                    filters=[item.filter for item in batch]
+                )
+                for item, documents in zip(batch, results):
+                    item.future.set_result(documents[:item.k])
+            except Exception as e:
+                logger.error(f"Erro na busca em lote: {str(e)}")
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+            self._metrics["queries"] += len(batch)
+            self._metrics["batches"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Consultas, lotes e tamanho médio de lote."""
+        metrics = dict(self._metrics)
+        metrics["avg_batch_size"] = metrics["queries"] / metrics["batches"] if metrics["batches"] else 0.0
+        return metrics
+
+    def close(self):
+        """Encerra a thread de despacho após processar as consultas pendentes."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
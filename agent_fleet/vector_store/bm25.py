@@ -0,0 +1,168 @@
+import re
+import math
+import pickle
+import logging
+import threading
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Palavras, números e códigos compostos (ex.: "ABC-123", "v2.1", "NF/2024")
+_TOKEN_RE = re.compile(r"\w+(?:[-./]\w+)*", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokeniza em minúsculas, sem acentos; códigos compostos geram o token inteiro e suas partes."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    tokens = []
+    for match in _TOKEN_RE.finditer(text):
+        token = match.group()
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r"[-./]", token) if part)
+    return tokens
+
+
+class BM25Index:
+    """Índice invertido BM25 em memória, alinhado às linhas do índice FAISS.
+
+    Cada termo guarda duas listas compactas e paralelas: linhas (`array('i')`,
+    crescentes) e frequências no documento (`array('H')`), ~6 bytes por
+    ocorrência. Novos documentos são anexados ao final (atualização incremental);
+    as estatísticas do corpus (N, tamanho médio) são mantidas a cada inclusão.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._rows: Dict[str, array] = {}
+        self._freqs: Dict[str, array] = {}
+        self._lengths = array("I")
+        self._total_length = 0
+        self._deleted: set = set()
+        self._lock = threading.Lock()
+
+    @property
+    def doc_count(self) -> int:
+        return len(self._lengths) - len(self._deleted)
+
+    def add(self, start_row: int, texts: Iterable[str]):
+        """Indexa textos de linhas consecutivas, a partir de `start_row`."""
+        with self._lock:
+            if start_row > len(self._lengths):
+                self._lengths.extend([0] * (start_row - len(self._lengths)))
+            for row, text in enumerate(texts, start=start_row):
+                counts: Dict[str, int] = {}
+                for token in tokenize(text or ""):
+                    counts[token] = counts.get(token, 0) + 1
+                for term, count in counts.items():
+                    self._rows.setdefault(term, array("i")).append(row)
+                    self._freqs.setdefault(term, array("H")).append(min(count, 0xFFFF))
+                length = sum(counts.values())
+                if row < len(self._lengths):
+                    self._lengths[row] = length
+                else:
+                    self._lengths.append(length)
+                self._total_length += length
+
+    def remove_rows(self, rows: Iterable[int]):
+        """Exclui linhas das buscas (as ocorrências são descartadas na próxima reconstrução)."""
+        with self._lock:
+            for row in rows:
+                row = int(row)
+                if 0 <= row < len(self._lengths) and row not in self._deleted:
+                    self._deleted.add(row)
+                    self._total_length -= self._lengths[row]
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        allowed_rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Retorna (linhas, pontuações) das `k` melhores linhas para a consulta."""
+        terms = set(tokenize(query))
+        with self._lock:
+            total = self.doc_count
+            if not terms or total == 0:
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32)
+            avg_length = max(self._total_length / total, 1e-9)
+
+            candidate_rows, candidate_scores = [], []
+            for term in terms:
+                postings = self._rows.get(term)
+                if postings is None:
+                    continue
+                rows = np.frombuffer(postings, dtype=np.int32).astype(np.int64)
+                freqs = np.frombuffer(self._freqs[term], dtype=np.uint16).astype(np.float32)
+                idf = math.log(1 + (total - len(rows) + 0.5) / (len(rows) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths[rows] / avg_length)
+                candidate_rows.append(rows)
+                candidate_scores.append(idf * freqs * (self.k1 + 1) / (freqs + norm))
+            deleted = np.fromiter(self._deleted, dtype=np.int64) if self._deleted else None
+
+        if not candidate_rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        rows = np.concatenate(candidate_rows)
+        scores = np.concatenate(candidate_scores)
+        keep = np.ones(len(rows), dtype=bool)
+        if deleted is not None:
+            keep &= ~np.isin(rows, deleted)
+        if allowed_rows is not None:
+            keep &= np.isin(rows, allowed_rows)
+        rows, scores = rows[keep], scores[keep]
+        if not len(rows):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        unique_rows, inverse = np.unique(rows, return_inverse=True)
+        totals = np.bincount(inverse, weights=scores).astype(np.float32)
+        top = np.argsort(-totals, kind="stable")[:k]
+        return unique_rows[top], totals[top]
+
+    def save(self, file: Union[str, Path]):
+        with self._lock:
+            payload = {
+                "k1": self.k1,
+                "b": self.b,
+                "rows": {term: postings.tobytes() for term, postings in self._rows.items()},
+                "freqs": {term: freqs.tobytes() for term, freqs in self._freqs.items()},
+                "lengths": self._lengths.tobytes(),
+                "total_length": self._total_length,
+                "deleted": sorted(self._deleted)
+            }
+        with open(file, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, file: Union[str, Path]) -> "BM25Index":
+        with open(file, "rb") as f:
+            payload = pickle.load(f)
+        index = cls(payload["k1"], payload["b"])
+        for term, raw in payload["rows"].items():
+            index._rows[term] = array("i")
+            index._rows[term].frombytes(raw)
+        for term, raw in payload["freqs"].items():
+            index._freqs[term] = array("H")
+            index._freqs[term].frombytes(raw)
+        index._lengths.frombytes(payload["lengths"])
+        index._total_length = payload["total_length"]
+        index._deleted = set(payload["deleted"])
+        return index
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int, constant: int = 60) -> List[int]:
+    """Combina listas ordenadas de linhas por Reciprocal Rank Fusion: sum(1 / (constant + posição))."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for position, row in enumerate(ranking):
+            row = int(row)
+            if row < 0:
+                continue
+            scores[row] = scores.get(row, 0.0) + 1.0 / (constant + position + 1)
+    return [row for row, _ in sorted(scores.items(), key=lambda item: -item[1])[:k]]
@@ -0,0 +1,156 @@
+import os
+import re
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Iterable, List
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4  # LSH: candidatos compartilham ao menos uma faixa de 16 bits
+_BAND_BITS = SIMHASH_BITS // SIMHASH_BANDS
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza espaços em branco (duplicatas exatas ignoram apenas formatação)."""
+    return " ".join(text.split())
+
+
+def content_hash(text: str) -> bytes:
+    """Hash do conteúdo normalizado de um chunk."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).digest()
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """SimHash de 64 bits sobre shingles de palavras (textos parecidos => poucos bits diferentes)."""
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) < shingle_size:
+        shingles = [" ".join(tokens)]
+    else:
+        shingles = [" ".join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)]
+
+    weights = [0] * SIMHASH_BITS
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+
+    value = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            value |= 1 << bit
+    return value
+
+
+def _to_signed(value: int) -> int:
+    """Converte um inteiro de 64 bits sem sinal para o INTEGER com sinal do SQLite."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _bands(value: int) -> List[int]:
+    mask = (1 << _BAND_BITS) - 1
+    return [(value >> (band * _BAND_BITS)) & mask for band in range(SIMHASH_BANDS)]
+
+
+class DedupIndex:
+    """Índice persistente de hashes para ingestão idempotente.
+
+    Guarda o hash exato de cada chunk indexado e, opcionalmente, seu SimHash
+    (com faixas LSH para encontrar candidatos a quase-duplicata sem varrer tudo).
+    """
+
+    def __init__(self, path: str, near_duplicates: bool = False, max_distance: int = 3):
+        self.path = path
+        self.near_duplicates = near_duplicates
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS content_hashes (hash BLOB PRIMARY KEY, doc_id TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_content_doc ON content_hashes(doc_id)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS simhashes ("
+            "doc_id TEXT PRIMARY KEY, simhash INTEGER NOT NULL, "
+            + ", ".join(f"band{band} INTEGER NOT NULL" for band in range(SIMHASH_BANDS))
+            + ")"
+        )
+        for band in range(SIMHASH_BANDS):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_band{band} ON simhashes(band{band})")
+        self._conn.commit()
+
+    def _is_near_duplicate(self, value: int) -> bool:
+        clauses = " OR ".join(f"band{band} = ?" for band in range(SIMHASH_BANDS))
+        rows = self._conn.execute(
+            f"SELECT simhash FROM simhashes WHERE {clauses}",
+            _bands(value)
+        ).fetchall()
+        return any(
+            bin((stored & ((1 << 64) - 1)) ^ value).count("1") <= self.max_distance
+            for (stored,) in rows
+        )
+
+    def filter(self, documents: Iterable[Document]) -> List[Document]:
+        """Remove duplicatas já indexadas e repetições dentro do próprio lote."""
+        unique: List[Document] = []
+        seen_hashes = set()
+        seen_simhashes: List[int] = []
+
+        with self._lock:
+            for doc in documents:
+                digest = content_hash(doc.page_content)
+                if digest in seen_hashes or self._conn.execute(
+                    "SELECT 1 FROM content_hashes WHERE hash = ?", (digest,)
+                ).fetchone():
+                    continue
+
+                if self.near_duplicates:
+                    value = simhash(doc.page_content)
+                    if any(bin(value ^ other).count("1") <= self.max_distance for other in seen_simhashes):
+                        continue
+                    if self._is_near_duplicate(value):
+                        continue
+                    seen_simhashes.append(value)
+
+                seen_hashes.add(digest)
+                unique.append(doc)
+        return unique
+
+    def register(self, ids: List[str], documents: List[Document]):
+        """Registra os hashes dos documentos efetivamente indexados."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO content_hashes (hash, doc_id) VALUES (?, ?)",
+                [(content_hash(doc.page_content), doc_id) for doc_id, doc in zip(ids, documents)]
+            )
+            if self.near_duplicates:
+                rows = []
+                for doc_id, doc in zip(ids, documents):
+                    value = simhash(doc.page_content)
+                    rows.append((doc_id, _to_signed(value), *_bands(value)))
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO simhashes VALUES (?, ?{', ?' * SIMHASH_BANDS})",
+                    rows
+                )
+            self._conn.commit()
+
+    def forget(self, ids: List[str]):
+        """Remove os hashes de documentos excluídos do banco vetorial."""
+        with self._lock:
+            self._conn.executemany("DELETE FROM content_hashes WHERE doc_id = ?", [(i,) for i in ids])
+            self._conn.executemany("DELETE FROM simhashes WHERE doc_id = ?", [(i,) for i in ids])
+            self._conn.commit()
+
+    def clear(self):
+        """Esvazia o índice (usado quando o banco vetorial é recriado)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM content_hashes")
+            self._conn.execute("DELETE FROM simhashes")
+            self._conn.commit()
@@ -0,0 +1,331 @@
+"""
+Tipos de índice FAISS configuráveis para o banco de dados vetorial.
+
+Tipos suportados (`VECTOR_STORE_INDEX_TYPE`):
+
+- `flat`: busca exata (padrão, custo linear no tamanho do corpus)
+- `ivf_flat`: listas invertidas com vetores completos (`nlist`, `nprobe`)
+- `ivf_pq`: listas invertidas com quantização por produto (`nlist`, `nprobe`, `pq_m`)
+- `hnsw`: grafo HNSW (`M`, `efSearch`)
+- `sq8`: quantização escalar de 8 bits
+- `int8_rerank` / `binary_rerank`: primeira passada em códigos int8 (d bytes/vetor) ou
+  binários (d/8 bytes/vetor) e reordenação exata dos `rerank_factor * k` candidatos
+  com os vetores float32 mapeados em memória (ver `quantized`)
+
+Relatório de recall@k, memória por vetor e latência pela linha de comando, sobre os
+vetores já indexados:
+
+    python -m agent_fleet.vector_store.index_factory --k 10 --queries 200 --types flat,ivf_flat,hnsw
+"""
+import math
+import time
+import logging
+import argparse
+import tempfile
+from typing import Any, Dict, List, Optional
+import numpy as np
+from agent_fleet.config.settings import settings
+from agent_fleet.vector_store.quantized import QuantizedIndex, build_quantized
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq8", "int8_rerank", "binary_rerank")
+TRAINED_INDEX_TYPES = ("ivf_flat", "ivf_pq", "sq8", "int8_rerank", "binary_rerank")
+RERANK_INDEX_TYPES = {"int8_rerank": "int8", "binary_rerank": "binary"}
+# Tipos cujo `reconstruct` devolve vetores aproximados (os originais ficam em `<base>.f32`)
+LOSSY_INDEX_TYPES = ("ivf_pq", "sq8")
+
+
+def index_params_from_settings() -> Dict[str, Any]:
+    """Parâmetros de índice definidos nas configurações."""
+    return {
+        "index_type": settings.VECTOR_STORE_INDEX_TYPE,
+        "nlist": settings.VECTOR_STORE_NLIST,
+        "nprobe": settings.VECTOR_STORE_NPROBE,
+        "hnsw_m": settings.VECTOR_STORE_HNSW_M,
+        "ef_search": settings.VECTOR_STORE_EF_SEARCH,
+        "pq_m": settings.VECTOR_STORE_PQ_M,
+        "rerank_factor": settings.VECTOR_STORE_RERANK_FACTOR
+    }
+
+
+def _nlist_for(count: int, nlist: int) -> int:
+    # Regra usual: ~4 * sqrt(N) listas, com ao menos 39 pontos de treino por lista
+    nlist = nlist or int(4 * math.sqrt(max(count, 1)))
+    return max(1, min(nlist, count // 39 or 1))
+
+
+def factory_string(index_type: str, dim: int, count: int, nlist: int = 0,
+                   hnsw_m: int = 32, pq_m: int = 64, **_) -> str:
+    """Traduz o tipo configurado para a string do `faiss.index_factory`."""
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "ivf_flat":
+        return f"IVF{_nlist_for(count, nlist)},Flat"
+    if index_type == "ivf_pq":
+        if dim % pq_m:
+            raise ValueError(f"pq_m ({pq_m}) deve dividir a dimensão dos vetores ({dim}).")
+        return f"IVF{_nlist_for(count, nlist)},PQ{pq_m}"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m}"
+    if index_type == "sq8":
+        return "SQ8"
+    raise ValueError(f"Tipo de índice não suportado: {index_type}")
+
+
+def index_type_of(index) -> str:
+    """Identifica o tipo configurável de um índice FAISS existente."""
+    import faiss
+    from agent_fleet.vector_store.mmap_store import LayeredIndex
+
+    if isinstance(index, LayeredIndex):
+        index = index.base
+    if isinstance(index, QuantizedIndex):
+        return f"{index.quantization}_rerank"
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "sq8"
+    if isinstance(index, faiss.IndexFlat):
+        return "flat"
+    return type(index).__name__
+
+
+def apply_search_params(index, nprobe: int = 8, ef_search: int = 64, rerank_factor: int = 4, **_):
+    """Aplica os parâmetros de busca (nprobe / efSearch / candidatos da reordenação) ao índice."""
+    import faiss
+    from agent_fleet.vector_store.mmap_store import LayeredIndex
+
+    target = index.base if isinstance(index, LayeredIndex) else index
+    if isinstance(target, QuantizedIndex):
+        target.rerank_factor = max(1, rerank_factor)
+        return
+    ivf = faiss.try_extract_index_ivf(target)
+    if ivf is not None:
+        ivf.nprobe = nprobe
+    downcast = faiss.downcast_index(target)
+    if isinstance(downcast, faiss.IndexHNSW):
+        downcast.hnsw.efSearch = ef_search
+
+
+def stores_exact_vectors(index) -> bool:
+    """Indica se `extract_vectors` devolve os vetores originais (sem perda da quantização)."""
+    return index_type_of(index) not in LOSSY_INDEX_TYPES
+
+
+def extract_vectors(index, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+    """Reconstrói os vetores armazenados (aproximados, em índices com quantização).
+
+    Não altera `index`: em IVF sem mapa direto, o mapa é montado em um clone,
+    já que o índice em uso pode estar sendo lido por outras threads.
+    """
+    import faiss
+    from agent_fleet.vector_store.mmap_store import LayeredIndex
+
+    end = index.ntotal if end is None else end
+    if end <= start:
+        return np.zeros((0, index.d), dtype=np.float32)
+    private = False
+    if isinstance(index, LayeredIndex):
+        if start >= index.base.ntotal:
+            return index.delta.reconstruct_n(start - index.base.ntotal, end - start)
+        index = index.to_index()
+        private = True
+    if isinstance(index, QuantizedIndex):
+        # Vetores completos, não os códigos quantizados
+        return index.reconstruct_n(start, end - start)
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        if not private:
+            index = faiss.clone_index(index)
+            ivf = faiss.try_extract_index_ivf(index)
+        ivf.make_direct_map()
+    return index.reconstruct_n(start, end - start)
+
+
+def build_index(vectors: np.ndarray, metric: Optional[int] = None, **params):
+    """Cria, treina (se necessário) e popula um índice do tipo configurado."""
+    import faiss
+
+    metric = faiss.METRIC_L2 if metric is None else metric
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if params.get("index_type") in RERANK_INDEX_TYPES:
+        return build_quantized(
+            vectors, metric, RERANK_INDEX_TYPES[params["index_type"]], params.get("rerank_factor", 4)
+        )
+    count, dim = vectors.shape
+    index = faiss.index_factory(dim, factory_string(dim=dim, count=count, **params), metric)
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    apply_search_params(index, **params)
+    return index
+
+
+def empty_like(index):
+    """Índice vazio do mesmo tipo e com o mesmo treino (IVF/PQ/SQ, quantização)."""
+    import faiss
+
+    if isinstance(index, QuantizedIndex):
+        return index.empty_copy()
+    empty = faiss.clone_index(index)
+    empty.reset()
+    return empty
+
+
+def memory_per_vector(index) -> float:
+    """Bytes por vetor mantidos em memória pelo índice.
+
+    Para índices com reordenação, conta apenas os códigos quantizados: os vetores
+    completos ficam no arquivo mapeado em memória.
+    """
+    import faiss
+
+    if index.ntotal == 0:
+        return 0.0
+    if isinstance(index, QuantizedIndex):
+        return float(index.code_size)
+    return len(faiss.serialize_index(index)) / index.ntotal
+
+
+def should_rebuild(index, trained_on: int, min_train_size: int, retrain_growth: float, **params) -> bool:
+    """Decide se o índice deve ser reconstruído (troca de tipo ou crescimento do corpus)."""
+    desired = params.get("index_type", "flat")
+    current = index_type_of(index)
+    count = index.ntotal
+
+    if desired == "flat":
+        return current != "flat"
+    if count < min_train_size:
+        # Coleções pequenas ficam no índice exato até haver dados de treino suficientes
+        return False
+    if current != desired:
+        return True
+    return desired in TRAINED_INDEX_TYPES and trained_on > 0 and count >= trained_on * retrain_growth
+
+
+def evaluate(index, vectors: np.ndarray, queries: np.ndarray, k: int = 10,
+             ground_truth: Optional[np.ndarray] = None) -> Dict[str, float]:
+    """Mede recall@k (contra a busca exata), memória por vetor, latência por consulta e vazão em lote."""
+    import faiss
+
+    if ground_truth is None:
+        exact = faiss.IndexFlat(vectors.shape[1], index.metric_type)
+        exact.add(vectors)
+        _, ground_truth = exact.search(queries, k)
+
+    latencies = []
+    found = np.empty_like(ground_truth)
+    for row, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found[row] = ids[0]
+
+    start = time.perf_counter()
+    index.search(queries, k)
+    batch_elapsed = time.perf_counter() - start
+
+    recall = np.mean([
+        len(set(found[row]) & set(ground_truth[row]) - {-1}) / k
+        for row in range(len(queries))
+    ])
+    return {
+        "recall_at_k": float(recall),
+        "bytes_per_vector": memory_per_vector(index),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "qps": len(queries) / batch_elapsed if batch_elapsed else 0.0
+    }
+
+
+def compare_index_types(vectors: np.ndarray, queries: np.ndarray, k: int = 10,
+                        index_types=INDEX_TYPES, **params) -> List[Dict[str, Any]]:
+    """Constrói cada tipo de índice sobre os mesmos vetores e reporta recall, memória e latência.
+
+    Índices com reordenação são gravados em um diretório temporário antes da
+    medição, para que a reordenação leia os vetores do arquivo mapeado, como em produção.
+    """
+    import faiss
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, ground_truth = exact.search(queries, k)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for index_type in index_types:
+            try:
+                start = time.perf_counter()
+                index = build_index(vectors, **{**params, "index_type": index_type})
+                build_seconds = time.perf_counter() - start
+                if isinstance(index, QuantizedIndex):
+                    index.save(tmp_dir, index_type)
+                metrics = evaluate(index, vectors, queries, k, ground_truth)
+                results.append({"index_type": index_type, "build_seconds": build_seconds, **metrics})
+            except Exception as e:
+                logger.error(f"Erro ao avaliar o índice {index_type}: {str(e)}")
+    return results
+
+
+def load_persisted_vectors(path: Optional[str] = None) -> np.ndarray:
+    """Lê os vetores da base e dos segmentos persistidos, sem carregar o modelo de embeddings."""
+    import faiss
+    from agent_fleet.vector_store.segments import SegmentLog
+
+    segments = SegmentLog(path or settings.VECTOR_STORE_PATH)
+    if not segments.exists():
+        raise ValueError("Nenhum banco de dados vetorial persistido.")
+
+    if segments.base_file(".qmeta") is not None:
+        base = QuantizedIndex.load(segments.base_dir(), segments.manifest["base"])
+    else:
+        base = faiss.read_index(str(segments.base_file(".faiss")))
+    parts = [extract_vectors(base)]
+    for segment in segments.manifest["segments"]:
+        if segment.get("kind") == "delete":
+            continue
+        _, _, _, vectors = segments.read_segment(segment)
+        if len(vectors):
+            parts.append(vectors)
+    return np.vstack(parts).astype(np.float32)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Ponto de entrada do relatório de recall/latência."""
+    parser = argparse.ArgumentParser(description="Compara tipos de índice FAISS sobre o corpus indexado.")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--types", default=",".join(INDEX_TYPES))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    vectors = load_persisted_vectors()
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    noise = rng.normal(scale=vectors.std() * 0.1, size=(len(sample), vectors.shape[1]))
+    queries = (vectors[sample] + noise).astype(np.float32)
+
+    params = index_params_from_settings()
+    params.pop("index_type")
+    results = compare_index_types(
+        vectors, queries, k=args.k,
+        index_types=[t.strip() for t in args.types.split(",") if t.strip()],
+        **params
+    )
+    print(f"{len(vectors)} vetores, {len(queries)} consultas, k={args.k}")
+    print(f"{'índice':<15}{'recall@k':>10}{'bytes/vet':>11}{'p50 ms':>10}{'p95 ms':>10}{'QPS':>12}{'build s':>10}")
+    for r in results:
+        print(f"{r['index_type']:<15}{r['recall_at_k']:>10.3f}{r['bytes_per_vector']:>11.1f}{r['p50_ms']:>10.3f}"
+              f"{r['p95_ms']:>10.3f}{r['qps']:>12.1f}{r['build_seconds']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
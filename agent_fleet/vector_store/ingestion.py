@@ -0,0 +1,223 @@
+"""
+Pipeline de ingestão de documentos para o banco de dados vetorial.
+
+Etapas (geradores encadeados, memória limitada pelo tamanho dos lotes):
+
+    arquivos -> carregamento + divisão em chunks (pool de processos) -> lotes -> add_documents
+
+Uso pela linha de comando:
+
+    python -m agent_fleet.vector_store.ingestion ./docs --batch-size 256 --workers 4
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Sequence
+from langchain.schema import Document
+from agent_fleet.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXTENSIONS = (".txt", ".md", ".rst", ".csv", ".json", ".html", ".htm", ".xml", ".py")
+
+
+@dataclass
+class IngestionStats:
+    """Contadores de progresso e vazão da ingestão."""
+    files: int = 0
+    failed_files: int = 0
+    chunks: int = 0
+    batches: int = 0
+    bytes: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def throughput(self) -> dict:
+        elapsed = max(self.elapsed, 1e-9)
+        return {
+            "files_per_sec": self.files / elapsed,
+            "chunks_per_sec": self.chunks / elapsed,
+            "mb_per_sec": self.bytes / elapsed / (1024 * 1024)
+        }
+
+    def summary(self) -> str:
+        rates = self.throughput()
+        return (
+            f"{self.files} arquivos ({self.failed_files} com erro), {self.chunks} chunks, "
+            f"{self.batches} lotes em {self.elapsed:.1f}s — "
+            f"{rates['files_per_sec']:.1f} arquivos/s, {rates['chunks_per_sec']:.1f} chunks/s, "
+            f"{rates['mb_per_sec']:.2f} MB/s"
+        )
+
+
+def iter_files(paths: Iterable[str], extensions: Sequence[str] = DEFAULT_EXTENSIONS) -> Iterator[Path]:
+    """Percorre arquivos e diretórios (recursivamente), em ordem estável."""
+    extensions = tuple(ext.lower() for ext in extensions)
+    for raw_path in paths:
+        path = Path(raw_path)
+        if path.is_file():
+            yield path
+        elif path.is_dir():
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(extensions):
+                        yield Path(root) / name
+        else:
+            logger.warning(f"Caminho não encontrado: {path}")
+
+
+def load_file(path: Path) -> Document:
+    """Carrega um arquivo de texto como um único documento."""
+    text = path.read_text(encoding="utf-8", errors="replace")
+    return Document(page_content=text, metadata={"source": str(path)})
+
+
+def split_document(document: Document, chunk_size: int, chunk_overlap: int) -> List[Document]:
+    """Divide um documento em chunks, preservando os metadados da origem."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+    chunks = splitter.split_documents([document])
+    for position, chunk in enumerate(chunks):
+        chunk.metadata["chunk"] = position
+    return chunks
+
+
+def _parse_file(path: str, chunk_size: int, chunk_overlap: int) -> tuple:
+    """Carrega e divide um arquivo (executado nos processos do pool)."""
+    file_path = Path(path)
+    size = file_path.stat().st_size
+    return size, split_document(load_file(file_path), chunk_size, chunk_overlap)
+
+
+def iter_chunks(
+    files: Iterable[Path],
+    stats: IngestionStats,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+    workers: Optional[int] = None
+) -> Iterator[Document]:
+    """Carrega e divide os arquivos em paralelo, mantendo poucos arquivos em voo."""
+    chunk_size = chunk_size or settings.CHUNK_SIZE
+    chunk_overlap = settings.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+    workers = workers or settings.INGESTION_WORKERS or os.cpu_count() or 1
+
+    def consume(path: Path, get_result: Callable[[], tuple]) -> Iterator[Document]:
+        try:
+            size, chunks = get_result()
+        except Exception as e:
+            stats.failed_files += 1
+            logger.error(f"Erro ao processar o arquivo {path}: {str(e)}")
+            return
+        stats.files += 1
+        stats.bytes += size
+        yield from chunks
+
+    if workers <= 1:
+        for path in files:
+            yield from consume(path, partial(_parse_file, str(path), chunk_size, chunk_overlap))
+        return
+
+    # Janela limitada de arquivos em voo: a memória não cresce com o tamanho do corpus
+    max_in_flight = workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: Deque = deque()
+        for path in files:
+            future = pool.submit(_parse_file, str(path), chunk_size, chunk_overlap)
+            pending.append((path, future.result))
+            if len(pending) >= max_in_flight:
+                yield from consume(*pending.popleft())
+        while pending:
+            yield from consume(*pending.popleft())
+
+
+def iter_batches(chunks: Iterable[Document], batch_size: int) -> Iterator[List[Document]]:
+    """Agrupa os chunks em lotes de tamanho fixo."""
+    batch: List[Document] = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest(
+    paths: Iterable[str],
+    vector_store=None,
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    extensions: Sequence[str] = DEFAULT_EXTENSIONS,
+    progress_interval: float = 10.0
+) -> IngestionStats:
+    """Indexa arquivos no banco de dados vetorial, lote a lote."""
+    if vector_store is None:
+        from agent_fleet.vector_store.vector_store import get_vector_store
+        vector_store = get_vector_store()
+
+    batch_size = batch_size or settings.INGESTION_BATCH_SIZE
+    stats = IngestionStats()
+    last_report = time.perf_counter()
+
+    chunks = iter_chunks(iter_files(paths, extensions), stats, workers=workers)
+    for batch in iter_batches(chunks, batch_size):
+        vector_store.add_documents(batch)
+        stats.chunks += len(batch)
+        stats.batches += 1
+
+        if time.perf_counter() - last_report >= progress_interval:
+            logger.info(f"Ingestão em andamento: {stats.summary()}")
+            last_report = time.perf_counter()
+
+    logger.info(f"Ingestão concluída: {stats.summary()}")
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    """Ponto de entrada da linha de comando."""
+    parser = argparse.ArgumentParser(description="Indexa arquivos no banco de dados vetorial.")
+    parser.add_argument("paths", nargs="+", help="Arquivos ou diretórios a indexar")
+    parser.add_argument("--batch-size", type=int, default=settings.INGESTION_BATCH_SIZE,
+                        help="Chunks por lote de embedding")
+    parser.add_argument("--workers", type=int, default=settings.INGESTION_WORKERS,
+                        help="Processos para leitura e divisão (0 = núcleos disponíveis)")
+    parser.add_argument("--extensions", default=",".join(DEFAULT_EXTENSIONS),
+                        help="Extensões aceitas nos diretórios, separadas por vírgula")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    try:
+        stats = ingest(
+            args.paths,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            extensions=[ext.strip() for ext in args.extensions.split(",") if ext.strip()]
+        )
+    except Exception as e:
+        logger.error(f"Erro na ingestão: {str(e)}", exc_info=True)
+        sys.exit(1)
+
+    print(stats.summary())
+
+
+if __name__ == "__main__":
+    main()
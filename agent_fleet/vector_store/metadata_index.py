@@ -0,0 +1,156 @@
+import pickle
+import logging
+import threading
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple, Union
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Acima desta densidade (linhas permitidas / total) o seletor usa bitmap em vez de lista de ids
+_BITMAP_DENSITY = 1 / 64
+
+
+def _indexable(value: Any) -> bool:
+    return isinstance(value, (str, int, float, bool)) or value is None
+
+
+class MetadataIndex:
+    """Índice invertido de metadados: campo -> valor -> linhas do índice FAISS.
+
+    Permite transformar filtros por metadados em seletores de ids do FAISS,
+    de modo que a busca percorra apenas os vetores que satisfazem o filtro
+    (pré-filtragem), em vez de filtrar os candidatos depois da busca.
+    """
+
+    def __init__(self, fields: Optional[Sequence[str]] = None):
+        self.fields = set(fields) if fields else None
+        self._postings: Dict[str, Dict[Any, array]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, start_row: int, metadatas: Iterable[Dict[str, Any]]):
+        """Indexa os metadados de linhas consecutivas, a partir de `start_row`."""
+        with self._lock:
+            for row, metadata in enumerate(metadatas, start=start_row):
+                for field, value in (metadata or {}).items():
+                    if self.fields is not None and field not in self.fields:
+                        continue
+                    if not _indexable(value):
+                        continue
+                    self._postings.setdefault(field, {}).setdefault(value, array("q")).append(row)
+
+    def supports(self, filter: Dict[str, Any]) -> bool:
+        """Indica se todos os campos do filtro estão indexados."""
+        return all(self.fields is None or field in self.fields for field in filter)
+
+    def lookup(self, filter: Dict[str, Any]) -> np.ndarray:
+        """Linhas que satisfazem o filtro (mesma semântica do filtro do LangChain FAISS).
+
+        Cada campo deve ser igual ao valor dado ou, se o valor for uma lista,
+        igual a algum dos itens; todos os campos precisam ser satisfeitos.
+        """
+        result: Optional[np.ndarray] = None
+        with self._lock:
+            for field, expected in filter.items():
+                values = expected if isinstance(expected, list) else [expected]
+                postings = self._postings.get(field, {})
+                parts = [
+                    np.frombuffer(postings[value], dtype=np.int64)
+                    for value in values
+                    if _indexable(value) and value in postings
+                ]
+                rows = np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+                result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+                if not len(result):
+                    break
+        return result if result is not None else np.zeros(0, dtype=np.int64)
+
+    def remove_rows(self, rows: Iterable[int]):
+        """Retira linhas de todas as listas (usado quando linhas são descartadas)."""
+        rows = set(int(row) for row in rows)
+        if not rows:
+            return
+        with self._lock:
+            for field_postings in self._postings.values():
+                for value, postings in list(field_postings.items()):
+                    kept = array("q", (row for row in postings if row not in rows))
+                    if kept:
+                        field_postings[value] = kept
+                    else:
+                        del field_postings[value]
+
+    def save(self, file: Union[str, Path]):
+        with self._lock:
+            payload = {
+                "fields": sorted(self.fields) if self.fields is not None else None,
+                "postings": {
+                    field: {value: postings.tobytes() for value, postings in values.items()}
+                    for field, values in self._postings.items()
+                }
+            }
+        with open(file, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, file: Union[str, Path]) -> "MetadataIndex":
+        with open(file, "rb") as f:
+            payload = pickle.load(f)
+        index = cls(payload["fields"])
+        for field, values in payload["postings"].items():
+            index._postings[field] = {}
+            for value, raw in values.items():
+                postings = array("q")
+                postings.frombytes(raw)
+                index._postings[field][value] = postings
+        return index
+
+
+def make_selector(rows: np.ndarray, ntotal: int) -> Tuple[Any, Any]:
+    """Cria um seletor de ids do FAISS; retorna também o buffer que deve permanecer vivo."""
+    import faiss
+
+    if len(rows) > ntotal * _BITMAP_DENSITY:
+        bitmap = np.zeros((ntotal + 7) // 8, dtype=np.uint8)
+        np.bitwise_or.at(bitmap, rows >> 3, (1 << (rows & 7)).astype(np.uint8))
+        return faiss.IDSelectorBitmap(ntotal, faiss.swig_ptr(bitmap)), bitmap
+    rows = np.ascontiguousarray(rows, dtype=np.int64)
+    return faiss.IDSelectorBatch(rows), rows
+
+
+def search_parameters(index, selector):
+    """Parâmetros de busca com seletor de ids, preservando nprobe / efSearch do índice."""
+    import faiss
+
+    if not isinstance(index, faiss.Index):
+        # Índices compostos em Python (ex.: `QuantizedIndex`) repassam os parâmetros à primeira passada
+        return faiss.SearchParameters(sel=selector)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    downcast = faiss.downcast_index(index)
+    if isinstance(downcast, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=max(downcast.hnsw.efSearch, 1))
+    return faiss.SearchParameters(sel=selector)
+
+
+def filtered_search(index, queries: np.ndarray, k: int, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Busca apenas entre as linhas permitidas (`rows`), com seletores de ids do FAISS."""
+    from agent_fleet.vector_store.mmap_store import LayeredIndex
+
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    if isinstance(index, LayeredIndex):
+        base_total = index.base.ntotal
+        base_rows, delta_rows = rows[rows < base_total], rows[rows >= base_total] - base_total
+        parts = []
+        if len(base_rows):
+            selector, keepalive = make_selector(base_rows, base_total)
+            parts.append(index.base.search(queries, k, params=search_parameters(index.base, selector)))
+        if len(delta_rows):
+            selector, keepalive_delta = make_selector(delta_rows, index.delta.ntotal)
+            distances, indices = index.delta.search(queries, k, params=search_parameters(index.delta, selector))
+            parts.append((distances, np.where(indices >= 0, indices + base_total, -1)))
+        return index.merge_results(parts, k)
+
+    selector, keepalive = make_selector(rows, index.ntotal)
+    return index.search(queries, k, params=search_parameters(index, selector))
@@ -0,0 +1,252 @@
+import os
+import json
+import mmap
+import hashlib
+import logging
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from langchain.schema import Document
+from langchain.docstore.base import Docstore, AddableMixin
+
+logger = logging.getLogger(__name__)
+
+# Tabela id -> linha, ordenada pelo hash do id (busca binária direto no arquivo mapeado)
+IDMAP_DTYPE = np.dtype([("h", "<u8"), ("row", "<i8")])
+
+
+def _hash_id(doc_id: str) -> int:
+    return int.from_bytes(hashlib.blake2b(doc_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def write_columnar_docstore(
+    path: Union[str, Path],
+    name: str,
+    rows: Iterable[Tuple[str, Document]]
+) -> int:
+    """Grava os documentos em formato indexado por deslocamento.
+
+    Arquivos gerados (`rows` deve seguir a ordem das linhas do índice FAISS):
+
+    - `<name>.docs`: registros JSON (id, texto, metadados) concatenados
+    - `<name>.offsets`: int64[N + 1] com o início de cada registro
+    - `<name>.idmap`: pares (hash do id, linha) ordenados pelo hash
+
+    Retorna o total de bytes gravados.
+    """
+    path = Path(path)
+    offsets = [0]
+    hashes = []
+
+    with open(path / f"{name}.docs", "wb") as f:
+        for row, (doc_id, doc) in enumerate(rows):
+            data = json.dumps(
+                {"id": doc_id, "text": doc.page_content, "metadata": doc.metadata or {}},
+                ensure_ascii=False,
+                default=str
+            ).encode("utf-8")
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+            hashes.append((_hash_id(doc_id), row))
+        f.flush()
+        os.fsync(f.fileno())
+
+    idmap = np.array(hashes, dtype=IDMAP_DTYPE)
+    idmap.sort(order="h")
+    for ext, array in ((".offsets", np.asarray(offsets, dtype=np.int64)), (".idmap", idmap)):
+        with open(path / f"{name}{ext}", "wb") as f:
+            array.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    return sum((path / f"{name}{ext}").stat().st_size for ext in (".docs", ".offsets", ".idmap"))
+
+
+def read_columnar_rows(path: Union[str, Path], name: str) -> Iterator[Tuple[str, Document]]:
+    """Itera sobre (id, documento) de uma base colunar, na ordem das linhas."""
+    docstore = ColumnarDocstore(path, name)
+    try:
+        for row in range(docstore.base_count):
+            record = docstore.record(row)
+            yield record["id"], Document(page_content=record["text"], metadata=record["metadata"])
+    finally:
+        docstore.close()
+
+
+class ColumnarDocstore(Docstore, AddableMixin):
+    """Docstore somente-leitura mapeado em memória, com camada de escrita em memória.
+
+    O texto e os metadados da base ficam no cache de páginas do sistema operacional
+    e são compartilhados entre processos; apenas os documentos adicionados depois
+    do carregamento ocupam o heap do processo.
+    """
+
+    def __init__(self, path: Union[str, Path], name: str):
+        path = Path(path)
+        self._offsets = self._memmap(path / f"{name}.offsets", np.int64)
+        self._idmap = self._memmap(path / f"{name}.idmap", IDMAP_DTYPE)
+        self._file = open(path / f"{name}.docs", "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._docs = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._overlay: Dict[str, Document] = {}
+        self._deleted: set = set()
+
+    @staticmethod
+    def _memmap(file: Path, dtype) -> np.ndarray:
+        if file.stat().st_size == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(file, dtype=dtype, mode="r")
+
+    @property
+    def base_count(self) -> int:
+        return max(len(self._offsets) - 1, 0)
+
+    def record(self, row: int) -> Dict:
+        """Lê o registro bruto de uma linha da base."""
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return json.loads(self._docs[start:end])
+
+    def id_at(self, row: int) -> str:
+        return self.record(row)["id"]
+
+    def row_of(self, doc_id: str) -> Optional[int]:
+        """Localiza a linha da base de um id (busca binária na tabela de hashes)."""
+        if not len(self._idmap):
+            return None
+        h = np.uint64(_hash_id(doc_id))
+        hashes = self._idmap["h"]
+        lo = int(np.searchsorted(hashes, h, side="left"))
+        hi = int(np.searchsorted(hashes, h, side="right"))
+        for pos in range(lo, hi):
+            row = int(self._idmap["row"][pos])
+            if self.id_at(row) == doc_id:
+                return row
+        return None
+
+    def search(self, search: str) -> Union[str, Document]:
+        if search in self._overlay:
+            return self._overlay[search]
+        if search not in self._deleted:
+            row = self.row_of(search)
+            if row is not None:
+                record = self.record(row)
+                return Document(page_content=record["text"], metadata=record["metadata"])
+        return f"ID {search} not found."
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        self._overlay.update(texts)
+
+    def delete(self, ids: List) -> None:
+        for doc_id in ids:
+            if self._overlay.pop(doc_id, None) is None:
+                self._deleted.add(doc_id)
+
+    def close(self):
+        if isinstance(self._docs, mmap.mmap):
+            self._docs.close()
+        self._file.close()
+
+    def __getstate__(self):
+        raise TypeError("ColumnarDocstore não pode ser serializado; grave uma base colunar.")
+
+
+class ColumnarIdMap(MutableMapping):
+    """Mapa linha -> id do docstore, lido sob demanda da base colunar."""
+
+    def __init__(self, docstore: ColumnarDocstore):
+        self._docstore = docstore
+        self._base_count = docstore.base_count
+        self._overlay: Dict[int, str] = {}
+
+    def __getitem__(self, row: int) -> str:
+        row = int(row)
+        if row in self._overlay:
+            return self._overlay[row]
+        if 0 <= row < self._base_count:
+            return self._docstore.id_at(row)
+        raise KeyError(row)
+
+    def __setitem__(self, row: int, doc_id: str):
+        self._overlay[int(row)] = doc_id
+
+    def __delitem__(self, row: int):
+        del self._overlay[int(row)]
+
+    def __iter__(self) -> Iterator[int]:
+        yield from range(self._base_count)
+        yield from (row for row in self._overlay if row >= self._base_count)
+
+    def __len__(self) -> int:
+        return self._base_count + sum(1 for row in self._overlay if row >= self._base_count)
+
+
+class LayeredIndex:
+    """Índice base mapeado em memória (somente leitura) com um índice delta em memória.
+
+    Expõe a parte da API de índices FAISS usada pelo wrapper do LangChain
+    (`add`, `search`, `reconstruct`, `ntotal`). As linhas do delta são numeradas
+    após as da base.
+    """
+
+    def __init__(self, base, path: Optional[Union[str, Path]] = None):
+        import faiss
+        self.base = base
+        self.path = path
+        self.d = base.d
+        self.metric_type = base.metric_type
+        self.delta = faiss.IndexFlat(base.d, base.metric_type)
+
+    @property
+    def ntotal(self) -> int:
+        return self.base.ntotal + self.delta.ntotal
+
+    @property
+    def is_trained(self) -> bool:
+        return True
+
+    def add(self, x: np.ndarray):
+        self.delta.add(x)
+
+    def search(self, x: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        base_d, base_i = self.base.search(x, k)
+        if self.delta.ntotal == 0:
+            return base_d, base_i
+        delta_d, delta_i = self.delta.search(x, k)
+        delta_i = np.where(delta_i >= 0, delta_i + self.base.ntotal, -1)
+        return self.merge_results([(base_d, base_i), (delta_d, delta_i)], k)
+
+    def merge_results(self, parts: List[Tuple[np.ndarray, np.ndarray]], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Combina resultados parciais (distâncias, linhas) mantendo os k melhores por consulta."""
+        import faiss
+        if len(parts) == 1:
+            return parts[0]
+        distances = np.concatenate([d for d, _ in parts], axis=1)
+        indices = np.concatenate([i for _, i in parts], axis=1)
+        higher_is_better = self.metric_type == faiss.METRIC_INNER_PRODUCT
+        keys = np.where(indices < 0, np.inf, -distances if higher_is_better else distances)
+        order = np.argsort(keys, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+    def reconstruct(self, key: int) -> np.ndarray:
+        key = int(key)
+        if key < self.base.ntotal:
+            return self.base.reconstruct(key)
+        return self.delta.reconstruct(key - self.base.ntotal)
+
+    def to_index(self):
+        """Materializa base + delta em um único índice em memória, do mesmo tipo da base."""
+        import faiss
+        # Índices mapeados (ex.: listas invertidas em disco) não podem ser clonados;
+        # a base é relida do arquivo, sem mmap
+        merged = faiss.read_index(str(self.path))
+        if self.delta.ntotal:
+            merged.add(self.delta.reconstruct_n(0, self.delta.ntotal))
+        return merged
+
+
+def read_index_mmap(file: Union[str, Path]):
+    """Lê um índice FAISS mapeado em memória, somente leitura, quando suportado."""
+    import faiss
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    return LayeredIndex(faiss.read_index(str(file), flags), path=file)
@@ -0,0 +1,230 @@
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATIONS = ("int8", "binary")
+# Linhas copiadas por vez ao gravar o arquivo de vetores completos
+_WRITE_CHUNK_ROWS = 65536
+
+
+class QuantizedIndex:
+    """Busca em duas etapas: primeira passada em vetores quantizados e reordenação exata.
+
+    - `int8`: quantização escalar de 8 bits (`faiss.IndexScalarQuantizer`), d bytes por vetor
+    - `binary`: um bit por dimensão (acima/abaixo da média do treino), busca por
+      distância de Hamming (`faiss.IndexBinaryFlat`), d/8 bytes por vetor
+
+    A primeira passada retorna `rerank_factor * k` candidatos, reordenados pela
+    distância exata sobre os vetores float32 (a binária, mais grosseira, costuma
+    precisar de um fator maior, ex.: 10). Após `save`, esses vetores ficam em
+    um arquivo mapeado em memória (`<base>.f32`): só os códigos quantizados e as
+    linhas adicionadas depois da última gravação ocupam o heap.
+
+    Expõe a parte da API de índices FAISS usada pelo banco vetorial (`add`,
+    `search` com `params`, `reconstruct`, `reconstruct_n`, `ntotal`).
+    """
+
+    def __init__(self, d: int, metric_type: int, quantization: str = "int8", rerank_factor: int = 4):
+        import faiss
+
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Quantização não suportada: {quantization}")
+        if quantization == "binary" and d % 8:
+            raise ValueError(f"A quantização binária exige dimensão múltipla de 8 (recebido {d}).")
+        self.d = d
+        self.metric_type = metric_type
+        self.quantization = quantization
+        self.rerank_factor = max(1, rerank_factor)
+        self.thresholds: Optional[np.ndarray] = None
+        if quantization == "int8":
+            self.coarse = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit, metric_type)
+        else:
+            self.coarse = faiss.IndexBinaryFlat(d)
+        # (vetores da última gravação, possivelmente mapeados; buffer das linhas novas; linhas no buffer)
+        self._vectors: Tuple[np.ndarray, np.ndarray, int] = (
+            np.zeros((0, d), dtype=np.float32), np.zeros((0, d), dtype=np.float32), 0
+        )
+
+    @property
+    def ntotal(self) -> int:
+        base, _, added = self._vectors
+        return len(base) + added
+
+    @property
+    def is_trained(self) -> bool:
+        return self.thresholds is not None if self.quantization == "binary" else self.coarse.is_trained
+
+    @property
+    def code_size(self) -> int:
+        """Bytes por vetor mantidos em memória pela primeira passada."""
+        return self.d // 8 if self.quantization == "binary" else self.coarse.sa_code_size()
+
+    def train(self, x: np.ndarray):
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        if self.quantization == "binary":
+            self.thresholds = x.mean(axis=0).astype(np.float32)
+        else:
+            self.coarse.train(x)
+
+    def _encode(self, x: np.ndarray) -> np.ndarray:
+        if self.quantization == "binary":
+            return np.packbits(x > self.thresholds, axis=1, bitorder="little")
+        return x
+
+    def add(self, x: np.ndarray):
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        if not self.is_trained:
+            raise RuntimeError("QuantizedIndex precisa ser treinado antes de receber vetores.")
+        self.coarse.add(self._encode(x))
+        base, buffer, added = self._vectors
+        if added + len(x) > len(buffer):
+            grown = np.zeros((max(added + len(x), 2 * len(buffer), 1024), self.d), dtype=np.float32)
+            grown[:added] = buffer[:added]
+            buffer = grown
+        buffer[added:added + len(x)] = x
+        self._vectors = (base, buffer, added + len(x))
+
+    def reset(self):
+        self.coarse.reset()
+        self._vectors = (np.zeros((0, self.d), dtype=np.float32), np.zeros((0, self.d), dtype=np.float32), 0)
+
+    def empty_copy(self) -> "QuantizedIndex":
+        """Novo índice vazio com o mesmo treino."""
+        import faiss
+
+        copy = QuantizedIndex(self.d, self.metric_type, self.quantization, self.rerank_factor)
+        copy.thresholds = self.thresholds
+        if self.quantization == "int8":
+            copy.coarse = faiss.clone_index(self.coarse)
+            copy.coarse.reset()
+        return copy
+
+    def _gather(self, rows: np.ndarray) -> np.ndarray:
+        """Vetores completos das linhas dadas (leitura aleatória no arquivo mapeado)."""
+        base, buffer, _ = self._vectors
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(buffer):
+            return np.asarray(base[rows], dtype=np.float32)
+        in_base = rows < len(base)
+        result = np.empty((len(rows), self.d), dtype=np.float32)
+        result[in_base] = base[rows[in_base]]
+        result[~in_base] = buffer[rows[~in_base] - len(base)]
+        return result
+
+    def reconstruct(self, key: int) -> np.ndarray:
+        return self._gather(np.array([int(key)]))[0]
+
+    def reconstruct_n(self, start: int, count: int) -> np.ndarray:
+        return self._gather(np.arange(start, start + count))
+
+    def search(self, x: np.ndarray, k: int, params=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Primeira passada quantizada (com o seletor de `params`) e reordenação exata."""
+        import faiss
+
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        if self.ntotal == 0:
+            return np.full((len(x), k), np.inf, dtype=np.float32), np.full((len(x), k), -1, dtype=np.int64)
+        candidates = min(k * self.rerank_factor, self.ntotal)
+        _, rows = self.coarse.search(self._encode(x), candidates, params=params)
+
+        valid = rows >= 0
+        vectors = self._gather(np.where(valid, rows, 0).ravel()).reshape(len(x), candidates, self.d)
+        if self.metric_type == faiss.METRIC_INNER_PRODUCT:
+            exact = np.einsum("qcd,qd->qc", vectors, x)
+            keys = np.where(valid, -exact, np.inf)
+        else:
+            exact = ((vectors - x[:, None, :]) ** 2).sum(axis=2)
+            keys = np.where(valid, exact, np.inf)
+
+        order = np.argsort(keys, axis=1, kind="stable")[:, :k]
+        distances = np.take_along_axis(exact, order, axis=1).astype(np.float32)
+        indices = np.where(
+            np.take_along_axis(valid, order, axis=1), np.take_along_axis(rows, order, axis=1), -1
+        )
+        if order.shape[1] < k:
+            pad = k - order.shape[1]
+            distances = np.pad(distances, ((0, 0), (0, pad)), constant_values=np.inf)
+            indices = np.pad(indices, ((0, 0), (0, pad)), constant_values=-1)
+        return distances, indices
+
+    # ------------------------------------------------------------------
+    # Persistência
+    # ------------------------------------------------------------------
+
+    def save(self, directory: Union[str, Path], name: str) -> int:
+        """Grava `<name>.qidx` (códigos), `<name>.f32` (vetores) e `<name>.qmeta`; retorna os bytes gravados.
+
+        Em seguida o índice passa a ler os vetores completos do arquivo gravado
+        (mapeado em memória), liberando a cópia em heap.
+        """
+        import faiss
+
+        directory = Path(directory)
+        if self.quantization == "binary":
+            faiss.write_index_binary(self.coarse, str(directory / f"{name}.qidx"))
+        else:
+            faiss.write_index(self.coarse, str(directory / f"{name}.qidx"))
+
+        count = self.ntotal
+        with open(directory / f"{name}.f32", "wb") as f:
+            for start in range(0, count, _WRITE_CHUNK_ROWS):
+                f.write(self.reconstruct_n(start, min(_WRITE_CHUNK_ROWS, count - start)).tobytes())
+        with open(directory / f"{name}.qmeta", "w", encoding="utf-8") as f:
+            json.dump(self._meta(count), f)
+
+        self._vectors = (
+            self._map_vectors(directory / f"{name}.f32", count, self.d),
+            np.zeros((0, self.d), dtype=np.float32),
+            0
+        )
+        return sum((directory / f"{name}{ext}").stat().st_size for ext in (".qidx", ".f32", ".qmeta"))
+
+    def _meta(self, count: int) -> Dict[str, Any]:
+        return {
+            "quantization": self.quantization,
+            "d": self.d,
+            "metric_type": int(self.metric_type),
+            "count": count,
+            "thresholds": self.thresholds.tolist() if self.thresholds is not None else None
+        }
+
+    @staticmethod
+    def _map_vectors(file: Path, count: int, d: int) -> np.ndarray:
+        if count == 0:
+            return np.zeros((0, d), dtype=np.float32)
+        return np.memmap(file, dtype=np.float32, mode="r", shape=(count, d))
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], name: str, rerank_factor: int = 4) -> "QuantizedIndex":
+        """Carrega um índice gravado por `save` (vetores completos mapeados em memória)."""
+        import faiss
+
+        directory = Path(directory)
+        with open(directory / f"{name}.qmeta", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(meta["d"], meta["metric_type"], meta["quantization"], rerank_factor)
+        if meta["thresholds"] is not None:
+            index.thresholds = np.array(meta["thresholds"], dtype=np.float32)
+        if index.quantization == "binary":
+            index.coarse = faiss.read_index_binary(str(directory / f"{name}.qidx"))
+        else:
+            index.coarse = faiss.read_index(str(directory / f"{name}.qidx"))
+        index._vectors = (
+            cls._map_vectors(directory / f"{name}.f32", meta["count"], meta["d"]),
+            np.zeros((0, meta["d"]), dtype=np.float32),
+            0
+        )
+        return index
+
+
+def build_quantized(vectors: np.ndarray, metric_type: int, quantization: str, rerank_factor: int = 4) -> QuantizedIndex:
+    """Cria, treina e popula um `QuantizedIndex`."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = QuantizedIndex(vectors.shape[1], metric_type, quantization, rerank_factor)
+    index.train(vectors)
+    index.add(vectors)
+    return index
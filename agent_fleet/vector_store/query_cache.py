@@ -0,0 +1,161 @@
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Normaliza a consulta para o nível exato do cache (espaços e maiúsculas)."""
+    return " ".join(query.split()).casefold()
+
+
+def filter_key(filter: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Chave estável de um filtro; None se o filtro não puder ser cacheado (ex.: função)."""
+    if filter is None:
+        return ""
+    if not isinstance(filter, dict):
+        return None
+    return json.dumps(filter, sort_keys=True, default=str)
+
+
+class _Entry:
+    __slots__ = ("documents", "vector", "created")
+
+    def __init__(self, documents: List[Document], vector: Optional[np.ndarray], created: float):
+        self.documents = documents
+        self.vector = vector
+        self.created = created
+
+
+class QueryResultCache:
+    """Cache de resultados de busca em dois níveis.
+
+    1. Exato: consulta normalizada + k + filtro.
+    2. Semântico (opcional): consulta cujo embedding tenha similaridade de cosseno
+       maior ou igual a `semantic_threshold` com uma consulta já respondida,
+       com o mesmo k e filtro.
+
+    As entradas expiram após `ttl_seconds` e são removidas por LRU acima de
+    `max_items`. `invalidate()` descarta tudo (chamado quando o índice muda);
+    resultados calculados antes da invalidação são ignorados em `put`.
+    """
+
+    def __init__(self, max_items: int = 1024, ttl_seconds: float = 300, semantic_threshold: float = 0.0):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+        self._entries: "OrderedDict[Tuple[str, int, str], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._metrics = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    @property
+    def semantic(self) -> bool:
+        return self.semantic_threshold > 0
+
+    @property
+    def generation(self) -> int:
+        """Versão atual do cache; muda a cada invalidação."""
+        return self._generation
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry.created > self.ttl_seconds
+
+    def get(self, query: str, k: int, filter: Optional[Dict[str, Any]] = None) -> Optional[List[Document]]:
+        """Nível exato. Não conta como falha: a consulta ainda pode acertar o nível semântico."""
+        fkey = filter_key(filter)
+        if fkey is None:
+            return None
+        key = (normalize_query(query), k, fkey)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry, time.monotonic()):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self._metrics["exact_hits"] += 1
+            return list(entry.documents)
+
+    def get_similar(self, vector: np.ndarray, k: int, filter: Optional[Dict[str, Any]] = None) -> Optional[List[Document]]:
+        """Nível semântico: a entrada mais próxima acima do limiar de cosseno."""
+        fkey = filter_key(filter)
+        if fkey is None or not self.semantic:
+            self._count_miss()
+            return None
+        query = self._unit(vector)
+        now = time.monotonic()
+        with self._lock:
+            best_key, best_score = None, self.semantic_threshold
+            for key, entry in self._entries.items():
+                if key[1] != k or key[2] != fkey or entry.vector is None or self._expired(entry, now):
+                    continue
+                score = float(np.dot(query, entry.vector))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                self._metrics["misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._metrics["semantic_hits"] += 1
+            return list(self._entries[best_key].documents)
+
+    def put(
+        self,
+        query: str,
+        k: int,
+        filter: Optional[Dict[str, Any]],
+        documents: List[Document],
+        vector: Optional[np.ndarray] = None,
+        generation: Optional[int] = None
+    ):
+        """Armazena um resultado (ignorado se o índice mudou desde `generation`)."""
+        fkey = filter_key(filter)
+        if fkey is None:
+            return
+        key = (normalize_query(query), k, fkey)
+        unit = self._unit(vector) if vector is not None and self.semantic else None
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = _Entry(list(documents), unit, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+                self._metrics["evictions"] += 1
+
+    def invalidate(self):
+        """Descarta todas as entradas (o conteúdo do índice mudou)."""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._metrics["invalidations"] += 1
+
+    def _count_miss(self):
+        with self._lock:
+            self._metrics["misses"] += 1
+
+    @staticmethod
+    def _unit(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def stats(self) -> Dict[str, float]:
+        """Acertos por nível, falhas e taxa de acerto."""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["items"] = len(self._entries)
+        hits = metrics["exact_hits"] + metrics["semantic_hits"]
+        total = hits + metrics["misses"]
+        metrics["hit_rate"] = hits / total if total else 0.0
+        metrics["exact_hit_rate"] = metrics["exact_hits"] / total if total else 0.0
+        metrics["semantic_hit_rate"] = metrics["semantic_hits"] / total if total else 0.0
+        return metrics
@@ -0,0 +1,610 @@
+import os
+import json
+import shutil
+import logging
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+import numpy as np
+from langchain.vectorstores import FAISS
+from langchain.schema import Document
+from langchain.embeddings.base import Embeddings
+from langchain.docstore.in_memory import InMemoryDocstore
+from agent_fleet.vector_store.mmap_store import (
+    ColumnarDocstore,
+    ColumnarIdMap,
+    LayeredIndex,
+    read_columnar_rows,
+    read_index_mmap,
+    write_columnar_docstore,
+)
+from agent_fleet.vector_store.quantized import QuantizedIndex
+from agent_fleet.vector_store.index_factory import extract_vectors, stores_exact_vectors
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+SNAPSHOTS_DIR = "snapshots"
+LEGACY_BASE_NAME = "index"
+BASE_EXTENSIONS = (".faiss", ".pkl", ".docs", ".offsets", ".idmap", ".metaidx", ".bm25", ".qidx", ".f32", ".qmeta")
+
+
+class SegmentLog:
+    """Persistência incremental do banco vetorial em segmentos somente-anexação.
+
+    Layout em disco (dentro de `VECTOR_STORE_PATH`):
+
+    - `snapshots/base-NNNNNN/`: uma versão imutável da base — `<base>.faiss` +
+      `<base>.docs/.offsets/.idmap` (docstore colunar, ver `mmap_store`) e os
+      índices auxiliares; em índices com perda (IVF-PQ, SQ8), `<base>.f32` guarda
+      os vetores originais; bases antigas ficam na raiz (`<base>.pkl` é o formato
+      do `FAISS.save_local`)
+    - `segments/seg-NNNNNN.vec`: vetores float32 anexados, linha a linha
+    - `segments/seg-NNNNNN.jsonl`: documentos (id, texto, metadados) do segmento
+    - `segments/seg-NNNNNN.del`: ids excluídos (segmentos de exclusão, `kind: "delete"`)
+    - `manifest.json`: versão atual da base, lista de segmentos vivos e o modelo
+      de embeddings (nome e dimensão) que gerou os vetores
+
+    O manifesto é o ponteiro para a versão atual: cada `append` grava apenas o
+    próprio segmento e substitui o manifesto atomicamente (rename). Uma nova
+    base é montada em um diretório temporário, renomeada para `snapshots/` e
+    só então publicada no manifesto; uma escrita interrompida nunca deixa o
+    banco em estado parcial. As `keep_snapshots` versões mais recentes são
+    mantidas para leitores de outros processos que ainda não recarregaram.
+    """
+
+    def __init__(self, path: str, max_segments: int = 32, compaction_ratio: float = 0.5,
+                 keep_snapshots: int = 2):
+        self.path = Path(path)
+        self.segments_dir = self.path / "segments"
+        self.snapshots_dir = self.path / SNAPSHOTS_DIR
+        self.max_segments = max_segments
+        self.compaction_ratio = compaction_ratio
+        self.keep_snapshots = max(1, keep_snapshots)
+        self._lock = threading.Lock()
+        self.manifest, self._stamp = self._read_manifest()
+        self.loaded_base_rows = 0
+        # Estado do último `load`: id -> linha (ver `load`) e linhas excluídas
+        self.loaded_id_rows: Dict[str, int] = {}
+        self.loaded_deleted_rows: List[int] = []
+
+    # ------------------------------------------------------------------
+    # Manifesto
+    # ------------------------------------------------------------------
+
+    def _manifest_stamp(self) -> Optional[Tuple[int, int, int]]:
+        """Identifica a versão do manifesto no disco (cada rename cria um novo inode)."""
+        try:
+            stat = os.stat(self.path / MANIFEST_NAME)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _read_manifest(self) -> Tuple[Optional[Dict[str, Any]], Any]:
+        """Lê o manifesto do disco; retorna (manifesto, carimbo da versão lida)."""
+        manifest_path = self.path / MANIFEST_NAME
+        # O carimbo é lido antes do conteúdo: uma troca no meio do caminho gera
+        # no máximo uma recarga a mais, nunca uma perdida
+        stamp = self._manifest_stamp()
+        if stamp is not None:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f), stamp
+        if (self.path / f"{LEGACY_BASE_NAME}.faiss").exists():
+            # Banco salvo no formato antigo: a base é o próprio index.faiss/index.pkl
+            manifest = self._new_manifest(base=LEGACY_BASE_NAME)
+            manifest["base_bytes"] = sum(
+                (self.path / f"{LEGACY_BASE_NAME}{ext}").stat().st_size
+                for ext in (".faiss", ".pkl")
+                if (self.path / f"{LEGACY_BASE_NAME}{ext}").exists()
+            )
+            return manifest, None
+        return None, None
+
+    @staticmethod
+    def _new_manifest(base: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "version": 1,
+            "base": base,
+            "base_bytes": 0,
+            "segments": [],
+            "next_segment": 1,
+            "next_base": 1
+        }
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        """Grava o manifesto atomicamente (arquivo temporário + rename)."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path / f"{MANIFEST_NAME}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path / MANIFEST_NAME)
+        self.manifest = manifest
+        self._stamp = self._manifest_stamp()
+
+    def exists(self) -> bool:
+        """Indica se há um banco vetorial persistido."""
+        return self.manifest is not None
+
+    def changed_on_disk(self) -> bool:
+        """Indica se outro processo publicou uma nova versão do manifesto."""
+        return self._manifest_stamp() != self._stamp
+
+    def read_disk_manifest(self) -> Tuple[Optional[Dict[str, Any]], Any]:
+        """Lê o manifesto atual do disco sem adotá-lo; retorna (manifesto, carimbo)."""
+        return self._read_manifest()
+
+    def appended_segments(self, manifest: Optional[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """Segmentos anexados em `manifest` desde o manifesto atual.
+
+        None se a base mudou ou segmentos foram incorporados (é preciso recarregar).
+        """
+        if manifest is None or self.manifest is None or manifest.get("base") != self.manifest.get("base"):
+            return None
+        current = self.live_segment_names()
+        names = [seg["name"] for seg in manifest["segments"]]
+        if names[:len(current)] != current:
+            return None
+        return manifest["segments"][len(current):]
+
+    def adopt(self, manifest: Dict[str, Any], stamp):
+        """Passa a usar um manifesto lido por `read_disk_manifest` (após aplicar seus segmentos)."""
+        self.manifest = manifest
+        self._stamp = stamp
+
+    def base_dir(self, manifest: Optional[Dict[str, Any]] = None) -> Path:
+        """Diretório dos arquivos da base (a raiz, para bases anteriores aos snapshots)."""
+        manifest = manifest or self.manifest or {}
+        return self.path / manifest["base_dir"] if manifest.get("base_dir") else self.path
+
+    @property
+    def segment_count(self) -> int:
+        return len(self.manifest["segments"]) if self.manifest else 0
+
+    @property
+    def segment_bytes(self) -> int:
+        return sum(seg["bytes"] for seg in self.manifest["segments"]) if self.manifest else 0
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def load(self, embeddings: Embeddings, use_mmap: bool = False) -> FAISS:
+        """Carrega a base e reaplica os segmentos vivos, na ordem do manifesto.
+
+        Com `use_mmap=True`, vetores e documentos da base ficam mapeados em memória
+        (somente leitura, compartilhados entre processos pelo cache de páginas);
+        apenas os segmentos e as novas inserções ocupam o heap.
+
+        Segmentos de exclusão removem os documentos do docstore; as linhas
+        correspondentes ficam em `loaded_deleted_rows` (o vetor permanece no
+        índice até a próxima compação). `loaded_id_rows` mapeia id -> linha de
+        todas as linhas, exceto as da base mapeada em memória, que são
+        localizadas por `ColumnarDocstore.row_of`.
+        """
+        if self.manifest is None:
+            raise ValueError("Nenhum banco de dados vetorial persistido.")
+
+        base = self.manifest.get("base")
+        base_dir = self.base_dir()
+        if base is None:
+            # Banco criado sem documento inicial: só há segmentos
+            import faiss
+            dims = [seg["dim"] for seg in self.manifest["segments"] if seg["dim"]]
+            if not dims:
+                raise ValueError("Nenhum banco de dados vetorial persistido.")
+            store = FAISS(embeddings, faiss.IndexFlatL2(dims[0]), InMemoryDocstore({}), {})
+        elif self.manifest.get("base_format", "pickle") == "pickle":
+            if use_mmap:
+                logger.warning(
+                    "Base no formato antigo (pickle) não suporta mmap; "
+                    "será convertida na próxima compação."
+                )
+            store = FAISS.load_local(str(base_dir), embeddings, index_name=base)
+        elif use_mmap:
+            docstore = ColumnarDocstore(base_dir, base)
+            store = FAISS(
+                embeddings,
+                self._read_base_index(base_dir, base, use_mmap),
+                docstore,
+                ColumnarIdMap(docstore)
+            )
+        else:
+            rows = list(read_columnar_rows(base_dir, base))
+            store = FAISS(
+                embeddings,
+                self._read_base_index(base_dir, base, use_mmap),
+                InMemoryDocstore({doc_id: doc for doc_id, doc in rows}),
+                {row: doc_id for row, (doc_id, _) in enumerate(rows)}
+            )
+
+        self.loaded_base_rows = store.index.ntotal
+        id_rows: Dict[str, int] = {}
+        if not isinstance(store.docstore, ColumnarDocstore):
+            id_rows = {doc_id: row for row, doc_id in store.index_to_docstore_id.items()}
+        deleted_rows = self.apply_segments(store, self.read_segments(self.manifest["segments"]), id_rows)
+
+        self.loaded_id_rows = id_rows
+        self.loaded_deleted_rows = deleted_rows
+        return store
+
+    @staticmethod
+    def _read_base_index(base_dir: Path, base: str, use_mmap: bool):
+        """Índice da base: quantizado com reordenação (vetores sempre mapeados) ou FAISS."""
+        import faiss
+
+        if (base_dir / f"{base}.qmeta").exists():
+            return QuantizedIndex.load(base_dir, base)
+        if use_mmap:
+            return read_index_mmap(base_dir / f"{base}.faiss")
+        return faiss.read_index(str(base_dir / f"{base}.faiss"))
+
+    def read_segments(self, segments: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Any]]:
+        """Lê o conteúdo de segmentos (anexação ou exclusão), para `apply_segments`."""
+        return [
+            (segment, self.read_deletions(segment) if segment.get("kind") == "delete"
+             else self.read_segment(segment))
+            for segment in segments
+        ]
+
+    @staticmethod
+    def apply_segments(store: FAISS, contents: List[Tuple[Dict[str, Any], Any]],
+                       id_rows: Dict[str, int]) -> List[int]:
+        """Reaplica segmentos lidos sobre o banco; atualiza `id_rows` e retorna as linhas excluídas."""
+        deleted_rows: List[int] = []
+        for segment, content in contents:
+            if segment.get("kind") == "delete":
+                for doc_id in content:
+                    row = id_rows.pop(doc_id, None)
+                    if row is None and isinstance(store.docstore, ColumnarDocstore):
+                        row = store.docstore.row_of(doc_id)
+                    if row is not None and isinstance(store.docstore.search(doc_id), Document):
+                        store.docstore.delete([doc_id])
+                        deleted_rows.append(row)
+                continue
+            ids, texts, metadatas, vectors = content
+            if ids:
+                start = store.index.ntotal
+                store.add_embeddings(
+                    zip(texts, vectors.tolist()),
+                    metadatas=metadatas,
+                    ids=ids
+                )
+                id_rows.update((doc_id, start + offset) for offset, doc_id in enumerate(ids))
+        return deleted_rows
+
+    def read_segment(self, segment: Dict[str, Any]) -> Tuple[List[str], List[str], List[Dict], np.ndarray]:
+        """Lê os documentos e vetores de um segmento."""
+        name = segment["name"]
+        ids, texts, metadatas = [], [], []
+        with open(self.segments_dir / f"{name}.jsonl", "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                ids.append(record["id"])
+                texts.append(record["text"])
+                metadatas.append(record["metadata"])
+
+        vectors = np.fromfile(self.segments_dir / f"{name}.vec", dtype=np.float32)
+        vectors = vectors.reshape(segment["count"], segment["dim"]) if segment["count"] else vectors
+        return ids, texts, metadatas, vectors
+
+    def read_vectors(self, dim: int, total: int, start: int = 0, end: Optional[int] = None) -> Optional[np.ndarray]:
+        """Vetores float32 originais das linhas [start, end) do estado persistido.
+
+        As linhas são as da base seguidas das dos segmentos vivos, como em `load`.
+        A base contribui com `<base>.f32` (índices com perda ou com reordenação)
+        ou, em índices exatos, com os vetores do próprio `.faiss`. Retorna None se
+        a base não guarda os vetores originais (bases antigas com perda) ou se o
+        estado persistido não tem `total` linhas.
+        """
+        import faiss
+
+        end = total if end is None else end
+        parts: List[np.ndarray] = []
+        base = self.manifest.get("base") if self.manifest else None
+        if base:
+            base_dir = self.base_dir()
+            if (base_dir / f"{base}.f32").exists():
+                if (base_dir / f"{base}.f32").stat().st_size:
+                    parts.append(np.memmap(base_dir / f"{base}.f32", dtype=np.float32, mode="r").reshape(-1, dim))
+            elif (base_dir / f"{base}.faiss").exists():
+                index = faiss.read_index(str(base_dir / f"{base}.faiss"), faiss.IO_FLAG_READ_ONLY)
+                if not stores_exact_vectors(index):
+                    return None
+                parts.append(extract_vectors(index))
+            else:
+                return None
+        for segment in self.manifest["segments"] if self.manifest else []:
+            if segment.get("kind") != "delete" and segment["count"]:
+                vectors = np.fromfile(self.segments_dir / f"{segment['name']}.vec", dtype=np.float32)
+                parts.append(vectors.reshape(segment["count"], dim))
+
+        if sum(len(part) for part in parts) != total:
+            return None
+        selected, offset = [], 0
+        for part in parts:
+            low, high = max(start - offset, 0), min(end - offset, len(part))
+            if low < high:
+                selected.append(np.asarray(part[low:high], dtype=np.float32))
+            offset += len(part)
+        return np.vstack(selected) if selected else np.zeros((0, dim), dtype=np.float32)
+
+    def read_deletions(self, segment: Dict[str, Any]) -> List[str]:
+        """Lê os ids de um segmento de exclusão."""
+        with open(self.segments_dir / f"{segment['name']}.del", "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def remove_orphans(self):
+        """Remove segmentos e snapshots que não constam no manifesto (escritas interrompidas).
+
+        Só deve ser chamado pelo processo escritor: para um leitor, os arquivos de
+        um segmento em gravação também parecem órfãos.
+        """
+        if self.manifest is None:
+            return
+        if self.segments_dir.exists():
+            live = {seg["name"] for seg in self.manifest["segments"]}
+            for file in self.segments_dir.iterdir():
+                if file.name.split(".")[0] not in live:
+                    try:
+                        file.unlink()
+                    except OSError:
+                        pass
+        if self.snapshots_dir.exists():
+            for directory in self.snapshots_dir.iterdir():
+                if directory.name.endswith(".tmp"):
+                    shutil.rmtree(directory, ignore_errors=True)
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def append(self, ids: List[str], texts: List[str], metadatas: List[Dict], vectors: np.ndarray):
+        """Anexa um novo segmento; o custo de I/O é proporcional apenas ao lote."""
+        with self._lock:
+            manifest = dict(self.manifest or self._new_manifest())
+            entry = self._write_segment(manifest, ids, texts, metadatas, vectors)
+            manifest["segments"] = manifest["segments"] + [entry]
+            self._write_manifest(manifest)
+
+    def _write_segment(self, manifest: Dict[str, Any], ids: List[str], texts: List[str],
+                       metadatas: List[Dict], vectors: np.ndarray) -> Dict[str, Any]:
+        """Grava os arquivos de um segmento (ainda fora do manifesto) e reserva seu nome."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        name = f"seg-{manifest['next_segment']:06d}"
+        manifest["next_segment"] += 1
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+
+        with open(self.segments_dir / f"{name}.jsonl", "w", encoding="utf-8") as f:
+            for id_, text, metadata in zip(ids, texts, metadatas):
+                f.write(json.dumps(
+                    {"id": id_, "text": text, "metadata": metadata or {}},
+                    ensure_ascii=False,
+                    default=str
+                ) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        with open(self.segments_dir / f"{name}.vec", "wb") as f:
+            vectors.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        size = sum((self.segments_dir / f"{name}{ext}").stat().st_size for ext in (".jsonl", ".vec"))
+        return {
+            "name": name,
+            "count": len(ids),
+            "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+            "bytes": size
+        }
+
+    def append_deletions(self, ids: List[str]):
+        """Anexa um segmento de exclusão com os ids removidos."""
+        with self._lock:
+            manifest = dict(self.manifest or self._new_manifest())
+            manifest["segments"] = manifest["segments"] + [self._write_deletions(manifest, ids)]
+            self._write_manifest(manifest)
+
+    def _write_deletions(self, manifest: Dict[str, Any], ids: List[str]) -> Dict[str, Any]:
+        name = f"seg-{manifest['next_segment']:06d}"
+        manifest["next_segment"] += 1
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+
+        with open(self.segments_dir / f"{name}.del", "w", encoding="utf-8") as f:
+            json.dump(list(ids), f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        return {
+            "name": name,
+            "kind": "delete",
+            "count": len(ids),
+            "dim": 0,
+            "bytes": (self.segments_dir / f"{name}.del").stat().st_size
+        }
+
+    def needs_compaction(self) -> bool:
+        """Indica se os segmentos acumulados justificam uma compação."""
+        if not self.manifest or not self.manifest["segments"]:
+            return False
+        if self.segment_count >= self.max_segments:
+            return True
+        base_bytes = self.manifest.get("base_bytes") or 0
+        return base_bytes > 0 and self.segment_bytes > base_bytes * self.compaction_ratio
+
+    @property
+    def index_info(self) -> Dict[str, Any]:
+        """Tipo do índice persistido e quantidade de vetores usada no último treino."""
+        return dict(self.manifest.get("index") or {}) if self.manifest else {}
+
+    def set_index_info(self, info: Dict[str, Any]):
+        with self._lock:
+            manifest = dict(self.manifest or self._new_manifest())
+            manifest["index"] = info
+            self._write_manifest(manifest)
+
+    @property
+    def embedding_info(self) -> Dict[str, Any]:
+        """Modelo de embeddings (`model`) e dimensão (`dim`) dos vetores persistidos."""
+        return dict(self.manifest.get("embedding") or {}) if self.manifest else {}
+
+    def set_embedding_info(self, info: Dict[str, Any]):
+        with self._lock:
+            manifest = dict(self.manifest or self._new_manifest())
+            manifest["embedding"] = info
+            self._write_manifest(manifest)
+
+    def live_segment_names(self) -> List[str]:
+        return [seg["name"] for seg in self.manifest["segments"]] if self.manifest else []
+
+    def base_file(self, extension: str) -> Optional[Path]:
+        """Caminho de um arquivo da base atual (ex.: ".metaidx"), se existir."""
+        if not self.manifest or not self.manifest.get("base"):
+            return None
+        file = self.base_dir() / f"{self.manifest['base']}{extension}"
+        return file if file.exists() else None
+
+    def write_base(self, store: FAISS, covered: Optional[List[str]] = None, sidecars: Optional[Dict] = None,
+                   vectors: Optional[np.ndarray] = None, embedding: Optional[Dict[str, Any]] = None):
+        """Grava uma nova base (formato colunar) e descarta os segmentos que ela incorpora.
+
+        Deve ser chamado com as escritas no banco bloqueadas (trava de leitura), para
+        que `covered` corresponda exatamente ao estado em memória. Por padrão,
+        `covered` são todos os segmentos vivos. `sidecars` mapeia extensões de
+        arquivo a índices auxiliares (com `save(file)`) gravados junto com a base;
+        `vectors`, os vetores originais das linhas de `store` (ver `write_snapshot`).
+        """
+        covered = self.live_segment_names() if covered is None else covered
+        self.publish(self.write_snapshot(store, sidecars, vectors, embedding), covered)
+
+    def write_snapshot(self, store: FAISS, sidecars: Optional[Dict] = None,
+                       vectors: Optional[np.ndarray] = None,
+                       embedding: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Grava uma nova versão da base em `snapshots/`, ainda sem publicá-la.
+
+        Os arquivos são gravados em um diretório temporário, renomeado ao final:
+        um diretório de snapshot sempre está completo. Em índices com perda, os
+        vetores originais (`vectors` ou, se omitidos, os do estado persistido
+        atual, que deve corresponder a `store`) são gravados em `<base>.f32`.
+        `embedding` (modelo e dimensão dos vetores) vai para o manifesto na publicação.
+        """
+        import faiss
+
+        with self._lock:
+            manifest = dict(self.manifest or self._new_manifest())
+            name = f"base-{manifest['next_base']:06d}"
+            manifest["next_base"] += 1
+            if self.manifest is not None:
+                self.manifest = manifest
+        tmp_dir = self.snapshots_dir / f"{name}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        index = store.index.to_index() if isinstance(store.index, LayeredIndex) else store.index
+        if isinstance(index, QuantizedIndex):
+            # Passa a reordenar a partir do arquivo gravado (o rename do diretório preserva o mapeamento)
+            base_bytes = index.save(tmp_dir, name)
+        else:
+            faiss.write_index(index, str(tmp_dir / f"{name}.faiss"))
+            base_bytes = (tmp_dir / f"{name}.faiss").stat().st_size
+            if not stores_exact_vectors(index):
+                base_bytes += self._write_float_vectors(tmp_dir / f"{name}.f32", index, vectors)
+        rows = (
+            (store.index_to_docstore_id[row], store.docstore.search(store.index_to_docstore_id[row]))
+            for row in range(index.ntotal)
+        )
+        base_bytes += write_columnar_docstore(tmp_dir, name, rows)
+        for extension, sidecar in (sidecars or {}).items():
+            if sidecar is not None:
+                sidecar.save(tmp_dir / f"{name}{extension}")
+
+        os.replace(tmp_dir, self.snapshots_dir / name)
+        return {"name": name, "base_bytes": base_bytes, "next_base": manifest["next_base"], "embedding": embedding}
+
+    def _write_float_vectors(self, file: Path, index, vectors: Optional[np.ndarray]) -> int:
+        """Grava os vetores originais de um índice com perda; retorna os bytes gravados."""
+        if vectors is None:
+            vectors = self.read_vectors(index.d, index.ntotal)
+        if vectors is None or len(vectors) != index.ntotal:
+            logger.warning(
+                "Vetores originais indisponíveis para a nova base; retreinos usarão vetores reconstruídos."
+            )
+            return 0
+        with open(file, "wb") as f:
+            np.ascontiguousarray(vectors, dtype=np.float32).tofile(f)
+        return file.stat().st_size
+
+    def publish(self, snapshot: Dict[str, Any], covered: Iterable[str],
+                segments: Optional[List[Dict[str, Any]]] = None):
+        """Aponta o manifesto para um snapshot gravado por `write_snapshot` (troca atômica).
+
+        Os segmentos em `covered` saem do manifesto e `segments` (gravados com a
+        nova base, ex.: por uma reindexação) entram no lugar deles.
+        """
+        covered = set(covered)
+        with self._lock:
+            manifest = dict(self.manifest or self._new_manifest())
+            old_base, old_base_dir = manifest.get("base"), self.base_dir(manifest)
+            manifest["base"] = snapshot["name"]
+            manifest["base_dir"] = f"{SNAPSHOTS_DIR}/{snapshot['name']}"
+            manifest["base_format"] = "columnar"
+            manifest["base_bytes"] = snapshot["base_bytes"]
+            manifest["next_base"] = max(manifest["next_base"], snapshot["next_base"])
+            if snapshot.get("embedding"):
+                manifest["embedding"] = snapshot["embedding"]
+            manifest["segments"] = [
+                seg for seg in manifest["segments"] if seg["name"] not in covered
+            ] + list(segments or [])
+            for segment in segments or []:
+                manifest["next_segment"] = max(manifest["next_segment"], int(segment["name"][4:]) + 1)
+            self._write_manifest(manifest)
+
+            # Só remove os arquivos antigos depois que o novo manifesto está no disco
+            # (mapeamentos abertos por leitores continuam válidos após o unlink)
+            if old_base and old_base_dir == self.path:
+                for ext in BASE_EXTENSIONS:
+                    try:
+                        (self.path / f"{old_base}{ext}").unlink()
+                    except OSError:
+                        pass
+            self._prune_snapshots()
+            for segment_name in covered:
+                for ext in (".jsonl", ".vec", ".del"):
+                    try:
+                        (self.segments_dir / f"{segment_name}{ext}").unlink()
+                    except OSError:
+                        pass
+
+        logger.info(f"Nova versão publicada: base {snapshot['name']}, {len(covered)} segmentos incorporados.")
+
+    def write_segment(self, ids: List[str], texts: List[str], metadatas: List[Dict],
+                      vectors: np.ndarray) -> Dict[str, Any]:
+        """Grava um segmento fora do manifesto, para ser publicado com uma nova base."""
+        return self._reserve(lambda manifest: self._write_segment(manifest, ids, texts, metadatas, vectors))
+
+    def write_deletions(self, ids: List[str]) -> Dict[str, Any]:
+        """Grava um segmento de exclusão fora do manifesto, para ser publicado com uma nova base."""
+        return self._reserve(lambda manifest: self._write_deletions(manifest, ids))
+
+    def _reserve(self, write) -> Dict[str, Any]:
+        with self._lock:
+            manifest = dict(self.manifest or self._new_manifest())
+            entry = write(manifest)
+            if self.manifest is not None:
+                self.manifest = manifest
+            return entry
+
+    def _prune_snapshots(self):
+        """Mantém apenas as `keep_snapshots` versões mais recentes (sempre inclui a atual)."""
+        if not self.snapshots_dir.exists():
+            return
+        current = self.manifest.get("base")
+        versions = sorted(
+            directory for directory in self.snapshots_dir.iterdir()
+            if directory.is_dir() and not directory.name.endswith(".tmp")
+        )
+        keep = {directory.name for directory in versions[-self.keep_snapshots:]} | {current}
+        for directory in versions:
+            if directory.name not in keep:
+                shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,482 @@
+"""
+Banco vetorial particionado entre processos (shards), com busca scatter-gather.
+
+Com `VECTOR_STORE_SHARDS` > 0, `get_vector_store()` retorna um `ShardedVectorStore`:
+
+- cada shard é um processo com seu próprio `VectorStoreManager`, em
+  `<VECTOR_STORE_PATH>/shards-<geração>/shard-NN`
+- o coordenador calcula os embeddings (um único modelo carregado) e envia
+  documentos e vetores ao shard dono, escolhido por hash do conteúdo
+  (`hash`) ou do tenant (`tenant`, campo `VECTOR_STORE_SHARD_TENANT_FIELD`)
+- as consultas são enviadas em paralelo aos shards relevantes e os top-k
+  parciais são combinados pela distância
+- quando o número de shards muda, os documentos são redistribuídos em uma
+  nova geração de diretórios, trocada atomicamente em `shards.json`
+
+Os shards são processos locais (`multiprocessing`); a interface de comandos
+(`_ShardClient.call`) é o ponto de troca para shards remotos.
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from langchain.schema import Document
+from langchain.embeddings.base import Embeddings
+from agent_fleet.config.settings import settings
+from agent_fleet.vector_store.dedup import content_hash
+from agent_fleet.vector_store.vector_store import _ReadWriteLock
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_NAME = "shards.json"
+PARTITIONS = ("hash", "tenant")
+EXPORT_CHUNK_SIZE = 50000
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash: ao passar de N para N+1 shards, só ~1/(N+1) das chaves mudam."""
+    b, j = -1, 0
+    key &= (1 << 64) - 1
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & ((1 << 64) - 1)
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+def _key_of(value: Union[str, bytes]) -> int:
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), "little")
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """Embeddings dos shards: os vetores sempre chegam prontos do coordenador."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        raise RuntimeError("Shards não calculam embeddings; use add_embeddings/similarity_search_by_vectors.")
+
+    def embed_query(self, text: str) -> List[float]:
+        raise RuntimeError("Shards não calculam embeddings; use add_embeddings/similarity_search_by_vectors.")
+
+
+def _shard_main(path: str, overrides: Dict[str, Any], conn):
+    """Laço de comandos de um processo shard."""
+    from agent_fleet.vector_store.vector_store import VectorStoreManager
+
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    logging.basicConfig(level=settings.LOG_LEVEL)
+
+    try:
+        store = VectorStoreManager(path=path, embeddings=PrecomputedEmbeddings(), seed=False)
+    except Exception as e:
+        conn.send(("error", f"Erro ao iniciar o shard {path}: {str(e)}"))
+        return
+    conn.send(("ok", None))
+
+    while True:
+        try:
+            command, args = conn.recv()
+        except EOFError:
+            break
+        try:
+            if command == "close":
+                store.close()
+                conn.send(("ok", None))
+                break
+            elif command == "add":
+                documents, vectors, ids, replace = args
+                if store.dedup is not None and not replace:
+                    kept = {id(doc) for doc in store.dedup.filter(documents)}
+                    mask = [id(doc) in kept for doc in documents]
+                    documents = [doc for doc, keep in zip(documents, mask) if keep]
+                    ids = [doc_id for doc_id, keep in zip(ids, mask) if keep]
+                    vectors = vectors[mask]
+                result = store.add_embeddings(documents, vectors, ids, replace=replace) if documents else []
+            elif command == "delete":
+                result = store.delete(args[0])
+            elif command == "search":
+                vectors, k, filters = args
+                result = store.similarity_search_by_vectors(vectors, k, filters)
+            elif command == "export":
+                start, count = args
+                result = store.export_rows(start, count)
+            elif command == "count":
+                result = store.count()
+            elif command == "compact":
+                store.compact(force=True)
+                result = None
+            else:
+                raise ValueError(f"Comando desconhecido: {command}")
+            conn.send(("ok", result))
+        except Exception as e:
+            logger.error(f"Erro no shard {path} ({command}): {str(e)}")
+            conn.send(("error", str(e)))
+
+
+class _ShardClient:
+    """Processo shard e o canal de comandos até ele."""
+
+    def __init__(self, path: Path, context):
+        self.path = path
+        parent_conn, child_conn = context.Pipe()
+        self._conn = parent_conn
+        self._lock = threading.Lock()
+        self.process = context.Process(
+            target=_shard_main,
+            args=(str(path), settings.model_dump(), child_conn),
+            name=f"vector-store-{path.name}",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self._receive()
+
+    def _receive(self):
+        status, value = self._conn.recv()
+        if status != "ok":
+            raise RuntimeError(value)
+        return value
+
+    def call(self, command: str, *args):
+        with self._lock:
+            self._conn.send((command, args))
+            return self._receive()
+
+    def close(self):
+        try:
+            self.call("close")
+        except (EOFError, OSError, RuntimeError):
+            pass
+        self.process.join(timeout=30)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class ShardedVectorStore:
+    """Banco vetorial particionado entre processos shard (mesma API de busca do `VectorStoreManager`)."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        num_shards: Optional[int] = None,
+        partition: Optional[str] = None,
+        tenant_field: Optional[str] = None,
+        embeddings: Optional[Embeddings] = None
+    ):
+        from agent_fleet.models.model_manager import get_model_manager
+
+        self.path = Path(path or settings.VECTOR_STORE_PATH)
+        self.partition = partition or settings.VECTOR_STORE_SHARD_PARTITION
+        self.tenant_field = tenant_field or settings.VECTOR_STORE_SHARD_TENANT_FIELD
+        if self.partition not in PARTITIONS:
+            raise ValueError(f"Particionamento não suportado: {self.partition}")
+        num_shards = num_shards or settings.VECTOR_STORE_SHARDS
+        if num_shards < 1:
+            raise ValueError("É necessário ao menos um shard.")
+
+        self.embeddings = embeddings or get_model_manager().get_embeddings()
+        self._context = multiprocessing.get_context("spawn")
+        # `_write_lock` serializa inserções e rebalanceamentos; `_swap_lock` protege a troca de geração
+        self._write_lock = threading.Lock()
+        self._swap_lock = _ReadWriteLock()
+        self._executor_size = num_shards
+        self._executor = ThreadPoolExecutor(max_workers=num_shards, thread_name_prefix="vector-shard")
+        self.shards: List[_ShardClient] = []
+
+        try:
+            layout = self._read_layout()
+            if layout is None:
+                layout = {"generation": 1, "num_shards": num_shards,
+                          "partition": self.partition, "tenant_field": self.tenant_field}
+                self.shards = self._start_generation(layout["generation"], num_shards)
+                self._write_layout(layout)
+            else:
+                self.shards = self._start_generation(layout["generation"], layout["num_shards"])
+            self.layout = layout
+
+            if (layout["num_shards"] != num_shards or layout["partition"] != self.partition
+                    or layout.get("tenant_field") != self.tenant_field):
+                self.rebalance(num_shards)
+            logger.info(f"Banco vetorial particionado em {len(self.shards)} shards ({self.partition}).")
+        except Exception as e:
+            logger.error(f"Erro ao inicializar o banco vetorial particionado: {str(e)}")
+            self.close()
+            raise
+
+    # ------------------------------------------------------------------
+    # Layout
+    # ------------------------------------------------------------------
+
+    def _read_layout(self) -> Optional[Dict[str, Any]]:
+        layout_path = self.path / LAYOUT_NAME
+        if not layout_path.exists():
+            return None
+        with open(layout_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_layout(self, layout: Dict[str, Any]):
+        """Grava o layout atomicamente (arquivo temporário + rename)."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path / f"{LAYOUT_NAME}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(layout, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path / LAYOUT_NAME)
+
+    def _generation_dir(self, generation: int) -> Path:
+        return self.path / f"shards-{generation:04d}"
+
+    def _start_generation(self, generation: int, num_shards: int) -> List[_ShardClient]:
+        base = self._generation_dir(generation)
+        base.mkdir(parents=True, exist_ok=True)
+        paths = [base / f"shard-{shard:02d}" for shard in range(num_shards)]
+        # Os processos sobem em paralelo (cada um carrega a própria partição)
+        return list(self._executor.map(lambda path: _ShardClient(path, self._context), paths))
+
+    # ------------------------------------------------------------------
+    # Particionamento
+    # ------------------------------------------------------------------
+
+    def _tenant_shard(self, tenant: Any, num_shards: int) -> int:
+        return jump_hash(_key_of(str(tenant)), num_shards)
+
+    def shard_for(self, document: Document, num_shards: int) -> int:
+        """Shard dono de um documento, entre `num_shards` shards."""
+        if self.partition == "tenant":
+            return self._tenant_shard((document.metadata or {}).get(self.tenant_field, ""), num_shards)
+        return jump_hash(_key_of(content_hash(document.page_content)), num_shards)
+
+    def _shards_for_filter(self, filter: Optional[Dict[str, Any]], num_shards: int) -> List[int]:
+        """Shards que podem conter resultados para o filtro (roteamento por tenant)."""
+        if self.partition == "tenant" and isinstance(filter, dict) and self.tenant_field in filter:
+            tenants = filter[self.tenant_field]
+            tenants = tenants if isinstance(tenants, list) else [tenants]
+            return sorted({self._tenant_shard(tenant, num_shards) for tenant in tenants})
+        return list(range(num_shards))
+
+    def _scatter(self, calls: Dict[int, Tuple]) -> Dict[int, Any]:
+        """Executa um comando por shard, em paralelo (chamar sob `_swap_lock`)."""
+        futures = {
+            shard: self._executor.submit(self.shards[shard].call, *call)
+            for shard, call in calls.items()
+        }
+        return {shard: future.result() for shard, future in futures.items()}
+
+    # ------------------------------------------------------------------
+    # API do banco vetorial
+    # ------------------------------------------------------------------
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> List[str]:
+        """Calcula os embeddings e distribui os documentos entre os shards."""
+        try:
+            if not documents:
+                return []
+            added = self._write(documents, ids, replace=False)
+            logger.info(f"Adicionados {len(added)} documentos ao banco vetorial particionado.")
+            return added
+        except Exception as e:
+            logger.error(f"Erro ao adicionar documentos ao banco vetorial particionado: {str(e)}")
+            raise
+
+    def upsert(self, documents: List[Document], ids: Optional[List[str]] = None) -> List[str]:
+        """Insere ou substitui documentos pelo ID.
+
+        O shard dono depende do conteúdo (ou do tenant), que pode mudar entre
+        versões; por isso a versão anterior é excluída em todos os shards.
+        """
+        try:
+            if not documents:
+                return []
+            return self._write(documents, ids, replace=True)
+        except Exception as e:
+            logger.error(f"Erro ao atualizar documentos no banco vetorial particionado: {str(e)}")
+            raise
+
+    def delete(self, ids: List[str]) -> int:
+        """Exclui documentos pelo ID em todos os shards; retorna quantos existiam."""
+        try:
+            with self._write_lock, self._swap_lock.read():
+                return self._delete_everywhere(ids)
+        except Exception as e:
+            logger.error(f"Erro ao excluir documentos do banco vetorial particionado: {str(e)}")
+            raise
+
+    def _delete_everywhere(self, ids: List[str]) -> int:
+        return sum(self._scatter({shard: ("delete", list(ids)) for shard in range(len(self.shards))}).values())
+
+    def _write(self, documents: List[Document], ids: Optional[List[str]], replace: bool) -> List[str]:
+        from agent_fleet.vector_store.vector_store import VectorStoreManager
+
+        ids = VectorStoreManager.document_ids(documents, ids)
+        vectors = np.array(
+            self.embeddings.embed_documents([doc.page_content for doc in documents]),
+            dtype=np.float32
+        )
+        # Escritas são serializadas com o rebalanceamento para não se perderem na troca
+        with self._write_lock, self._swap_lock.read():
+            if replace:
+                self._delete_everywhere(ids)
+            added = set(self._distribute(documents, vectors, ids, self.shards, replace=replace))
+        return [doc_id for doc_id in ids if doc_id in added]
+
+    def _distribute(self, documents: List[Document], vectors: np.ndarray, ids: List[str],
+                    shards: List[_ShardClient], replace: bool = False) -> List[str]:
+        owners = np.array([self.shard_for(doc, len(shards)) for doc in documents], dtype=np.int64)
+        futures = []
+        for shard in np.unique(owners):
+            positions = np.flatnonzero(owners == shard)
+            futures.append(self._executor.submit(
+                shards[int(shard)].call, "add",
+                [documents[pos] for pos in positions], vectors[positions],
+                [ids[pos] for pos in positions], replace
+            ))
+        return [doc_id for future in futures for doc_id in future.result()]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """Busca por similaridade em todos os shards relevantes."""
+        return self.similarity_search_batch([query], k=k, filters=filter)[0]
+
+    def similarity_search_batch(
+        self,
+        queries: Sequence[str],
+        k: int = 4,
+        filters: Union[None, Dict[str, Any], Sequence[Optional[Dict[str, Any]]]] = None
+    ) -> List[List[Document]]:
+        """Scatter-gather: cada shard recebe apenas as consultas que lhe dizem respeito."""
+        try:
+            if not queries:
+                return []
+            if filters is None or isinstance(filters, dict) or callable(filters):
+                filters = [filters] * len(queries)
+            filters = list(filters)
+            if any(callable(filter) for filter in filters):
+                raise ValueError("Filtros por função não são suportados entre processos; use um dict.")
+
+            embed = getattr(self.embeddings, "embed_queries", self.embeddings.embed_documents)
+            vectors = np.array(embed(list(queries)), dtype=np.float32)
+
+            with self._swap_lock.read():
+                positions: Dict[int, List[int]] = {}
+                for pos, filter in enumerate(filters):
+                    for shard in self._shards_for_filter(filter, len(self.shards)):
+                        positions.setdefault(shard, []).append(pos)
+                partials = self._scatter({
+                    shard: ("search", vectors[pos_list], k, [filters[pos] for pos in pos_list])
+                    for shard, pos_list in positions.items()
+                })
+
+            candidates: List[List[Tuple[Document, float]]] = [[] for _ in queries]
+            for shard, results in partials.items():
+                for pos, scored in zip(positions[shard], results):
+                    candidates[pos].extend(scored)
+            # Índices FAISS padrão usam distância L2: menor é melhor
+            return [[doc for doc, _ in sorted(scored, key=lambda item: item[1])[:k]] for scored in candidates]
+        except Exception as e:
+            logger.error(f"Erro na busca no banco vetorial particionado: {str(e)}")
+            return [[] for _ in queries]
+
+    def hybrid_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                      fetch_k: Optional[int] = None) -> List[Document]:
+        """Os índices BM25 são locais a cada shard; no modo particionado a busca é vetorial."""
+        return self.similarity_search(query, k=k, filter=filter)
+
+    def as_retriever(self, **kwargs):
+        """Retriever do LangChain sobre o banco particionado (buscas "similarity" e "hybrid")."""
+        from agent_fleet.vector_store.vector_store import VectorStoreManagerRetriever
+
+        search_type = kwargs.get("search_type", "similarity")
+        if search_type not in ("similarity", "hybrid"):
+            raise ValueError(f"Tipo de busca não suportado no banco particionado: {search_type}.")
+        return VectorStoreManagerRetriever(
+            manager=self,
+            search_type=search_type,
+            search_kwargs=kwargs.get("search_kwargs", {})
+        )
+
+    def counts(self) -> List[int]:
+        """Quantidade de documentos vivos em cada shard."""
+        with self._swap_lock.read():
+            return [result for _, result in sorted(self._scatter(
+                {shard: ("count",) for shard in range(len(self.shards))}
+            ).items())]
+
+    def compact(self):
+        """Compacta todos os shards."""
+        with self._swap_lock.read():
+            self._scatter({shard: ("compact",) for shard in range(len(self.shards))})
+
+    # ------------------------------------------------------------------
+    # Rebalanceamento
+    # ------------------------------------------------------------------
+
+    def rebalance(self, num_shards: int):
+        """Redistribui os documentos para `num_shards` shards.
+
+        A nova geração é montada em diretórios próprios enquanto a atual segue
+        atendendo buscas; a troca é feita pelo rename de `shards.json` e só
+        então a geração anterior é removida.
+        """
+        with self._write_lock:
+            old_shards, old_layout = self.shards, self.layout
+            generation = old_layout["generation"] + 1
+            shutil.rmtree(self._generation_dir(generation), ignore_errors=True)
+            if num_shards > self._executor_size:
+                executor = ThreadPoolExecutor(max_workers=num_shards, thread_name_prefix="vector-shard")
+                # Buscas usam o executor sob o lado de leitura: a troca espera as que estão em andamento
+                with self._swap_lock.write():
+                    old_executor, self._executor = self._executor, executor
+                    self._executor_size = num_shards
+                old_executor.shutdown(wait=False)
+
+            new_shards = self._start_generation(generation, num_shards)
+            try:
+                moved = 0
+                # A compação descarta as linhas excluídas: a exportação percorre só linhas vivas
+                for shard in old_shards:
+                    shard.call("compact")
+                for shard in old_shards:
+                    start = 0
+                    while True:
+                        ids, documents, vectors = shard.call("export", start, EXPORT_CHUNK_SIZE)
+                        if not ids:
+                            break
+                        moved += len(self._distribute(documents, vectors, ids, new_shards))
+                        start += len(ids)
+                for shard in new_shards:
+                    shard.call("compact")
+            except Exception as e:
+                logger.error(f"Erro ao rebalancear o banco vetorial: {str(e)}")
+                for shard in new_shards:
+                    shard.close()
+                raise
+
+            with self._swap_lock.write():
+                self.layout = {"generation": generation, "num_shards": num_shards,
+                               "partition": self.partition, "tenant_field": self.tenant_field}
+                self._write_layout(self.layout)
+                self.shards = new_shards
+
+        for shard in old_shards:
+            shard.close()
+        shutil.rmtree(self._generation_dir(old_layout["generation"]), ignore_errors=True)
+        logger.info(
+            f"Banco vetorial rebalanceado: {old_layout['num_shards']} -> {num_shards} shards "
+            f"({moved} documentos)."
+        )
+
+    def close(self):
+        """Encerra os processos shard."""
+        for shard in self.shards:
+            shard.close()
+        self.shards = []
+        self._executor.shutdown(wait=False)
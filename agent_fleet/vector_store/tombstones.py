@@ -0,0 +1,105 @@
+import logging
+import threading
+from typing import Iterable, Tuple
+import numpy as np
+from agent_fleet.vector_store.metadata_index import search_parameters
+
+logger = logging.getLogger(__name__)
+
+
+class Tombstones:
+    """Bitmap de linhas excluídas do índice FAISS (1 bit por linha).
+
+    Linhas excluídas continuam no índice até a próxima compação, mas são
+    ignoradas nas buscas por meio de um seletor `IDSelectorNot(IDSelectorBitmap)`.
+    """
+
+    def __init__(self):
+        self._bits = np.zeros(0, dtype=np.uint8)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, row: int) -> bool:
+        row = int(row)
+        byte = row >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] & (1 << (row & 7)))
+
+    def add(self, rows: Iterable[int]) -> int:
+        """Marca linhas como excluídas; retorna quantas eram novas."""
+        rows = np.unique(np.asarray(list(rows), dtype=np.int64))
+        if not len(rows):
+            return 0
+        with self._lock:
+            needed = int(rows[-1] >> 3) + 1
+            if needed > len(self._bits):
+                grown = np.zeros(max(needed, len(self._bits) * 2), dtype=np.uint8)
+                grown[:len(self._bits)] = self._bits
+                self._bits = grown
+            masks = (1 << (rows & 7)).astype(np.uint8)
+            new = int(np.count_nonzero((self._bits[rows >> 3] & masks) == 0))
+            np.bitwise_or.at(self._bits, rows >> 3, masks)
+            self._count += new
+            return new
+
+    def mask(self, rows: np.ndarray) -> np.ndarray:
+        """Vetor booleano: quais das linhas dadas estão excluídas."""
+        rows = np.asarray(rows, dtype=np.int64)
+        inside = (rows >= 0) & ((rows >> 3) < len(self._bits))
+        result = np.zeros(len(rows), dtype=bool)
+        result[inside] = (self._bits[rows[inside] >> 3] >> (rows[inside] & 7)) & 1 == 1
+        return result
+
+    def bitmap(self, ntotal: int) -> np.ndarray:
+        """Bitmap no formato do `faiss.IDSelectorBitmap` para `ntotal` linhas."""
+        size = (ntotal + 7) // 8
+        bitmap = np.zeros(size, dtype=np.uint8)
+        used = min(size, len(self._bits))
+        bitmap[:used] = self._bits[:used]
+        return bitmap
+
+    def rows(self) -> np.ndarray:
+        """Linhas excluídas, em ordem crescente."""
+        return np.flatnonzero(np.unpackbits(self._bits, bitorder="little")).astype(np.int64)
+
+    def clear(self):
+        with self._lock:
+            self._bits = np.zeros(0, dtype=np.uint8)
+            self._count = 0
+
+
+def _excluding_selector(bitmap: np.ndarray, ntotal: int):
+    import faiss
+
+    inner = faiss.IDSelectorBitmap(ntotal, faiss.swig_ptr(bitmap))
+    return faiss.IDSelectorNot(inner), (inner, bitmap)
+
+
+def search_excluding(index, queries: np.ndarray, k: int, tombstones: Tombstones) -> Tuple[np.ndarray, np.ndarray]:
+    """Busca ignorando as linhas excluídas (seletor negado sobre o bitmap de exclusões)."""
+    from agent_fleet.vector_store.mmap_store import LayeredIndex
+
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    if not len(tombstones):
+        return index.search(queries, k)
+
+    if isinstance(index, LayeredIndex):
+        base_total, delta_total = index.base.ntotal, index.delta.ntotal
+        bits = np.unpackbits(tombstones.bitmap(index.ntotal), bitorder="little")
+        parts = []
+        if base_total:
+            selector, keepalive = _excluding_selector(tombstones.bitmap(base_total), base_total)
+            parts.append(index.base.search(queries, k, params=search_parameters(index.base, selector)))
+        if delta_total:
+            delta_bitmap = np.packbits(bits[base_total:base_total + delta_total], bitorder="little")
+            selector_delta, keepalive_delta = _excluding_selector(delta_bitmap, delta_total)
+            distances, indices = index.delta.search(
+                queries, k, params=search_parameters(index.delta, selector_delta)
+            )
+            parts.append((distances, np.where(indices >= 0, indices + base_total, -1)))
+        return index.merge_results(parts, k)
+
+    selector, keepalive = _excluding_selector(tombstones.bitmap(index.ntotal), index.ntotal)
+    return index.search(queries, k, params=search_parameters(index, selector))
@@ -1,103 +1,1393 @@
 import os
+import time
+import uuid
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
+import numpy as np
 from langchain.vectorstores import FAISS, Chroma
-from langchain.schema import Document
+from langchain.vectorstores.utils import maximal_marginal_relevance
+from langchain.schema import Document, BaseRetriever
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun
 from langchain.embeddings.base import Embeddings
+from langchain.docstore.in_memory import InMemoryDocstore
 from agent_fleet.config.settings import settings
 from agent_fleet.models.model_manager import get_model_manager
+from agent_fleet.vector_store.segments import SegmentLog
+from agent_fleet.vector_store.dedup import DedupIndex
+from agent_fleet.vector_store.metadata_index import MetadataIndex, filtered_search
+from agent_fleet.vector_store.batching import QueryBatcher
+from agent_fleet.vector_store.query_cache import QueryResultCache
+from agent_fleet.vector_store.bm25 import BM25Index, reciprocal_rank_fusion
+from agent_fleet.vector_store.tombstones import Tombstones, search_excluding
+from agent_fleet.vector_store.mmap_store import ColumnarDocstore, LayeredIndex
+from agent_fleet.vector_store.index_factory import (
+    apply_search_params,
+    build_index,
+    empty_like,
+    extract_vectors,
+    index_params_from_settings,
+    should_rebuild,
+    stores_exact_vectors,
+)
 
 logger = logging.getLogger(__name__)
 
-class VectorStoreManager:
-    """Gerenciador de armazenamento vetorial para RAG."""
+# Tipos de busca atendidos por `as_retriever`
+SEARCH_TYPES = ("similarity", "hybrid", "mmr")
+
+
+def embedding_model_id(embeddings: Embeddings) -> str:
+    """Identificador do modelo de embeddings (nome do modelo ou, na falta dele, a classe)."""
+    return str(
+        getattr(embeddings, "model_name", None) or getattr(embeddings, "model", None) or type(embeddings).__name__
+    )
+
+class _ReadWriteLock:
+    """Trava leitores/escritor: buscas concorrentes, escritas exclusivas."""
     
     def __init__(self):
-        self.model_manager = get_model_manager()
-        self.embeddings = self.model_manager.get_embeddings()
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+    
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+    
+    @contextmanager
+    def write(self):
+        with self._cond:
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+def _matches_filter(filter, metadata: Dict[str, Any]) -> bool:
+    """Mesma semântica de filtro do LangChain FAISS (dict ou função sobre os metadados)."""
+    if callable(filter):
+        return filter(metadata)
+    return all(
+        metadata.get(key) in value if isinstance(value, list) else metadata.get(key) == value
+        for key, value in filter.items()
+    )
+
+class VectorStoreManager:
+    """Gerenciador de armazenamento vetorial para RAG.
+    
+    Use `get_vector_store()` para obter a instância compartilhada do processo;
+    instanciar diretamente carrega uma nova cópia do índice em memória.
+    """
+    
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        embeddings: Optional[Embeddings] = None,
+        seed: bool = True,
+        read_only: Optional[bool] = None
+    ):
+        """
+        Args:
+            path: diretório do banco (padrão: `VECTOR_STORE_PATH`)
+            embeddings: modelo de embeddings (padrão: o do `ModelManager`)
+            seed: cria o documento de boas-vindas quando o banco ainda não existe
+            read_only: leitor de um banco escrito por outro processo (padrão:
+                `VECTOR_STORE_READ_ONLY`); não grava nada e acompanha as novas
+                versões com `refresh()`
+        """
+        self.path = path or settings.VECTOR_STORE_PATH
+        self.model_manager = get_model_manager() if embeddings is None else None
+        self.embeddings = embeddings or self.model_manager.get_embeddings()
+        self.seed = seed
+        self.read_only = settings.VECTOR_STORE_READ_ONLY if read_only is None else read_only
         self.vector_store = None
+        self._rw_lock = _ReadWriteLock()
+        self.segments = self._new_segment_log()
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._rebuild_thread: Optional[threading.Thread] = None
+        self._reindex_thread: Optional[threading.Thread] = None
+        # Serializa compação, reconstrução e reindexação (todas publicam uma nova base)
+        self._maintenance_lock = threading.Lock()
+        self._reload_thread: Optional[threading.Thread] = None
+        self._reload_stop = threading.Event()
+        self.metadata_index: Optional[MetadataIndex] = None
+        self.bm25_index: Optional[BM25Index] = None
+        # Exclusões lógicas (até a próxima compação) e id -> linha (ver SegmentLog.load)
+        self.tombstones = Tombstones()
+        self._id_rows: Dict[str, int] = {}
+        self._batcher: Optional[QueryBatcher] = None
+        self._batcher_lock = threading.Lock()
+        self.query_cache = QueryResultCache(
+            max_items=settings.VECTOR_STORE_QUERY_CACHE_SIZE,
+            ttl_seconds=settings.VECTOR_STORE_QUERY_CACHE_TTL,
+            semantic_threshold=settings.VECTOR_STORE_QUERY_CACHE_SIMILARITY
+        ) if settings.VECTOR_STORE_QUERY_CACHE_SIZE > 0 else None
+        self.dedup = DedupIndex(
+            os.path.join(self.path, "dedup.sqlite"),
+            near_duplicates=settings.VECTOR_STORE_NEAR_DEDUP == "simhash",
+            max_distance=settings.VECTOR_STORE_SIMHASH_DISTANCE
+        ) if settings.VECTOR_STORE_DEDUP and not self.read_only else None
         self._initialize_vector_store()
+        if settings.VECTOR_STORE_RELOAD_INTERVAL > 0:
+            self._reload_thread = threading.Thread(
+                target=self._watch_for_new_versions,
+                name="vector-store-reload",
+                daemon=True
+            )
+            self._reload_thread.start()
+    
+    def _new_segment_log(self) -> SegmentLog:
+        return SegmentLog(
+            self.path,
+            max_segments=settings.VECTOR_STORE_MAX_SEGMENTS,
+            compaction_ratio=settings.VECTOR_STORE_COMPACTION_RATIO,
+            keep_snapshots=settings.VECTOR_STORE_SNAPSHOTS_KEEP
+        )
     
     def _initialize_vector_store(self):
         """Inicializa o armazenamento vetorial."""
         try:
-            if os.path.exists(settings.VECTOR_STORE_PATH):
-                self.vector_store = FAISS.load_local(
-                    settings.VECTOR_STORE_PATH, 
-                    self.embeddings
-                )
+            if self.segments.exists():
+                self.vector_store = self._load_vector_store()
                 logger.info("Banco de dados vetorial carregado com sucesso.")
+                if not self.read_only:
+                    self.segments.remove_orphans()
+                    self._maybe_rebuild_index()
+            elif self.read_only:
+                logger.info("Banco de dados vetorial ainda não publicado; aguardando o processo escritor.")
             else:
-                # Cria um banco de dados vazio
-                self.vector_store = FAISS.from_texts(
-                    ["Bem-vindo ao sistema de agentes autônomos."],
-                    self.embeddings
-                )
-                self._save_vector_store()
+                self.metadata_index = self._new_metadata_index()
+                self.bm25_index = self._new_bm25_index()
+                if self.seed:
+                    # Cria um banco de dados vazio
+                    welcome = "Bem-vindo ao sistema de agentes autônomos."
+                    self.vector_store = FAISS.from_texts([welcome], self.embeddings)
+                    if self.metadata_index is not None:
+                        self.metadata_index.add(0, [{}])
+                    if self.bm25_index is not None:
+                        self.bm25_index.add(0, [welcome])
+                    self._save_vector_store()
+                if self.dedup is not None:
+                    # Hashes de um banco anterior não valem para o banco recriado
+                    self.dedup.clear()
                 logger.info("Novo banco de dados vetorial criado.")
         except Exception as e:
             logger.error(f"Erro ao inicializar o banco de dados vetorial: {str(e)}")
             raise
     
+    def _load_vector_store(self) -> FAISS:
+        """Carrega a base e os segmentos do disco, aplicando os parâmetros de busca."""
+        state = self._load_state(self.segments)
+        self._apply_state(state)
+        return state["store"]
+    
+    def _load_state(self, segments: SegmentLog) -> Dict[str, Any]:
+        """Monta, sem alterar o gerenciador, o estado (banco e índices auxiliares) de uma versão."""
+        store = segments.load(self.embeddings, use_mmap=settings.VECTOR_STORE_MMAP)
+        self._check_embedding_info(segments.embedding_info, store.index.d)
+        apply_search_params(store.index, **index_params_from_settings())
+        deleted_rows = segments.loaded_deleted_rows
+        tombstones = Tombstones()
+        tombstones.add(deleted_rows)
+        metadata_index = bm25_index = None
+        if settings.VECTOR_STORE_METADATA_INDEX:
+            metadata_index = self._load_row_index(
+                segments, store, ".metaidx", MetadataIndex, self._new_metadata_index, lambda doc: doc.metadata, {}
+            )
+            metadata_index.remove_rows(deleted_rows)
+        if settings.VECTOR_STORE_BM25:
+            bm25_index = self._load_row_index(
+                segments, store, ".bm25", BM25Index, self._new_bm25_index, lambda doc: doc.page_content, ""
+            )
+            bm25_index.remove_rows(deleted_rows)
+        return {
+            "store": store,
+            "metadata_index": metadata_index,
+            "bm25_index": bm25_index,
+            "id_rows": segments.loaded_id_rows,
+            "tombstones": tombstones
+        }
+    
+    def _embedding_info(self, dim: int, embeddings: Optional[Embeddings] = None) -> Dict[str, Any]:
+        """Modelo e dimensão dos vetores, gravados no manifesto com cada base."""
+        return {"model": embedding_model_id(embeddings or self.embeddings), "dim": int(dim)}
+    
+    def _check_embedding_info(self, info: Dict[str, Any], dim: Optional[int]):
+        """Levanta ValueError se a versão persistida foi gerada por outro modelo de embeddings.
+        
+        Bancos gravados antes do registro do modelo no manifesto não são verificados.
+        """
+        if not info:
+            return
+        model = embedding_model_id(self.embeddings)
+        if info.get("model") != model or (dim is not None and info.get("dim", dim) != dim):
+            current = f"{model} ({dim} dimensões)" if dim is not None else model
+            raise ValueError(
+                f"O banco vetorial em {self.path} foi indexado com {info.get('model')} "
+                f"({info.get('dim')} dimensões), mas o modelo de embeddings em uso é {current}; "
+                f"abra o banco com o modelo original e use `reindex(embeddings=...)`."
+            )
+    
+    def _apply_state(self, state: Dict[str, Any]):
+        """Troca o estado em uso (chamar sob a trava de escrita, exceto na inicialização)."""
+        self.vector_store = state["store"]
+        self.metadata_index = state["metadata_index"]
+        self.bm25_index = state["bm25_index"]
+        self._id_rows = state["id_rows"]
+        self.tombstones = state["tombstones"]
+        if self.query_cache is not None:
+            self.query_cache.invalidate()
+    
+    def _new_metadata_index(self) -> Optional[MetadataIndex]:
+        if not settings.VECTOR_STORE_METADATA_INDEX:
+            return None
+        return MetadataIndex(settings.VECTOR_STORE_METADATA_FIELDS or None)
+    
+    def _new_bm25_index(self) -> Optional[BM25Index]:
+        if not settings.VECTOR_STORE_BM25:
+            return None
+        return BM25Index(k1=settings.VECTOR_STORE_BM25_K1, b=settings.VECTOR_STORE_BM25_B)
+    
+    def _load_row_index(self, segments: SegmentLog, store: FAISS, extension: str, index_class, create, field, missing):
+        """Carrega um índice auxiliar (alinhado às linhas do FAISS) gravado com a base.
+        
+        As linhas dos segmentos são indexadas em seguida; bases antigas, sem o
+        arquivo do índice, são indexadas por completo a partir do docstore.
+        Linhas excluídas recebem o valor `missing`.
+        """
+        index_file = segments.base_file(extension)
+        if index_file is not None:
+            index = index_class.load(index_file)
+            start = segments.loaded_base_rows
+        else:
+            index = create()
+            start = 0
+        
+        def values():
+            for row in range(start, store.index.ntotal):
+                doc = store.docstore.search(store.index_to_docstore_id[row])
+                yield field(doc) if isinstance(doc, Document) else missing
+        
+        index.add(start, values())
+        return index
+    
+    def _row_indexes(self) -> Dict[str, Any]:
+        """Índices auxiliares gravados junto com cada base, por extensão de arquivo."""
+        return {".metaidx": self.metadata_index, ".bm25": self.bm25_index}
+    
     def _save_vector_store(self):
-        """Salva o banco de dados vetorial no disco."""
+        """Salva o banco de dados vetorial completo no disco, como uma nova base.
+        
+        Incorpora todos os segmentos vivos; o chamador deve impedir escritas concorrentes.
+        """
         try:
-            os.makedirs(settings.VECTOR_STORE_PATH, exist_ok=True)
-            self.vector_store.save_local(settings.VECTOR_STORE_PATH)
+            self.segments.write_base(
+                self.vector_store, sidecars=self._row_indexes(),
+                embedding=self._embedding_info(self.vector_store.index.d)
+            )
         except Exception as e:
             logger.error(f"Erro ao salvar o banco de dados vetorial: {str(e)}")
             raise
     
-    def add_documents(self, documents: List[Document]):
-        """Adiciona documentos ao banco de dados vetorial."""
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> List[str]:
+        """Adiciona documentos ao banco de dados vetorial.
+        
+        Os novos vetores e documentos são gravados em um segmento somente-anexação;
+        a base completa só é reescrita pela compação em segundo plano. Chunks já
+        indexados (e, se configurado, quase-duplicatas) são ignorados, o que torna a
+        reingestão idempotente. Retorna os IDs dos documentos efetivamente adicionados.
+        
+        Os IDs vêm de `ids`, do campo de metadados `VECTOR_STORE_ID_FIELD` ou são
+        gerados; para substituir documentos existentes, use `upsert`.
+        """
         try:
             if not documents:
-                return
-                
-            # Cria um novo FAISS com os documentos
-            new_store = FAISS.from_documents(documents, self.embeddings)
+                return []
             
-            # Se já existir um banco de dados, mescla com o novo
-            if self.vector_store is not None:
-                self.vector_store.merge_from(new_store)
-            else:
-                self.vector_store = new_store
+            received = len(documents)
+            ids = self.document_ids(documents, ids)
+            if self.dedup is not None:
+                # Filtro prévio para não calcular embeddings de duplicatas conhecidas;
+                # a verificação definitiva é refeita sob a trava em `add_embeddings`
+                kept = {id(doc) for doc in self.dedup.filter(documents)}
+                ids = [doc_id for doc_id, doc in zip(ids, documents) if id(doc) in kept]
+                documents = [doc for doc in documents if id(doc) in kept]
+            if not documents:
+                logger.info(f"{received} documentos duplicados ignorados.")
+                return []
             
-            # Salva as alterações
-            self._save_vector_store()
-            logger.info(f"Adicionados {len(documents)} documentos ao banco de dados vetorial.")
+            texts = [doc.page_content for doc in documents]
+            # O embedding é o passo mais caro e é feito fora da trava
+            vectors = np.array(self.embeddings.embed_documents(texts), dtype=np.float32)
+            added = self.add_embeddings(documents, vectors, ids, dedup=True)
+            
+            skipped = received - len(added)
+            if skipped:
+                logger.info(f"{skipped} documentos duplicados ignorados.")
+            return added
             
         except Exception as e:
             logger.error(f"Erro ao adicionar documentos ao banco de dados vetorial: {str(e)}")
             raise
     
+    def upsert(self, documents: List[Document], ids: Optional[List[str]] = None) -> List[str]:
+        """Insere ou substitui documentos pelo ID (ver `add_documents` para a origem dos IDs).
+        
+        As versões anteriores são excluídas logicamente na mesma operação, sob a
+        mesma trava; buscas nunca veem as duas versões ao mesmo tempo.
+        """
+        try:
+            if not documents:
+                return []
+            ids = self.document_ids(documents, ids)
+            vectors = np.array(
+                self.embeddings.embed_documents([doc.page_content for doc in documents]),
+                dtype=np.float32
+            )
+            return self.add_embeddings(documents, vectors, ids, replace=True)
+        except Exception as e:
+            logger.error(f"Erro ao atualizar documentos no banco de dados vetorial: {str(e)}")
+            raise
+    
+    def delete(self, ids: List[str]) -> int:
+        """Exclui documentos pelo ID; retorna quantos existiam.
+        
+        A exclusão é lógica (bitmap de exclusões respeitado nas buscas) e
+        persistida como um segmento de exclusão. O espaço é recuperado pela
+        compação, disparada quando a fração de linhas excluídas passa de
+        `VECTOR_STORE_TOMBSTONE_RATIO`.
+        """
+        try:
+            self._check_writable()
+            with self._rw_lock.write():
+                deleted = self._delete_locked(ids)
+            if deleted:
+                logger.info(f"Excluídos {deleted} documentos do banco de dados vetorial.")
+                self._maybe_compact_tombstones()
+            return deleted
+        except Exception as e:
+            logger.error(f"Erro ao excluir documentos do banco de dados vetorial: {str(e)}")
+            raise
+    
+    @staticmethod
+    def document_ids(documents: List[Document], ids: Optional[List[str]] = None) -> List[str]:
+        """IDs dos documentos: explícitos, do campo de metadados configurado ou gerados."""
+        if ids is not None:
+            if len(ids) != len(documents):
+                raise ValueError("A quantidade de IDs difere da quantidade de documentos.")
+            return [str(doc_id) for doc_id in ids]
+        field = settings.VECTOR_STORE_ID_FIELD
+        return [
+            str(doc.metadata[field]) if field and doc.metadata and doc.metadata.get(field) is not None
+            else str(uuid.uuid4())
+            for doc in documents
+        ]
+    
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("Banco de dados vetorial aberto somente para leitura.")
+    
+    def _row_of(self, doc_id: str) -> Optional[int]:
+        """Linha viva de um documento (None se não existir ou estiver excluído)."""
+        row = self._id_rows.get(doc_id)
+        if row is None and isinstance(self.vector_store.docstore, ColumnarDocstore):
+            row = self.vector_store.docstore.row_of(doc_id)
+        if row is None or row in self.tombstones:
+            return None
+        return row
+    
+    def _delete_locked(self, ids: List[str]) -> int:
+        """Exclusão lógica; deve ser chamada sob a trava de escrita."""
+        if self.vector_store is None:
+            return 0
+        found = {}
+        for doc_id in ids:
+            row = self._row_of(doc_id)
+            if row is not None:
+                found[doc_id] = row
+        if not found:
+            return 0
+        
+        rows = list(found.values())
+        self.vector_store.docstore.delete(list(found))
+        self.tombstones.add(rows)
+        for doc_id in found:
+            self._id_rows.pop(doc_id, None)
+        if self.metadata_index is not None:
+            self.metadata_index.remove_rows(rows)
+        if self.bm25_index is not None:
+            self.bm25_index.remove_rows(rows)
+        if self.query_cache is not None:
+            self.query_cache.invalidate()
+        self.segments.append_deletions(list(found))
+        if self.dedup is not None:
+            self.dedup.forget(list(found))
+        return len(found)
+    
+    def _maybe_compact_tombstones(self):
+        total = self.vector_store.index.ntotal if self.vector_store is not None else 0
+        if total and len(self.tombstones) / total > settings.VECTOR_STORE_TOMBSTONE_RATIO:
+            self.compact(background=True, force=True)
+    
+    def add_embeddings(
+        self,
+        documents: List[Document],
+        vectors: np.ndarray,
+        ids: Optional[List[str]] = None,
+        replace: bool = False,
+        dedup: bool = False
+    ) -> List[str]:
+        """Adiciona documentos com embeddings já calculados.
+        
+        Usado por `add_documents`, `upsert` e pelos shards, que recebem os vetores
+        prontos do coordenador. Com `replace=True`, documentos com os mesmos IDs
+        são excluídos antes; caso contrário, IDs existentes são um erro. Com
+        `dedup=True`, duplicatas (do índice ou do próprio lote) são descartadas
+        sob a trava de escrita, junto com o registro dos hashes, de modo que
+        inserções concorrentes do mesmo chunk não passam as duas. Retorna os IDs
+        efetivamente adicionados.
+        """
+        try:
+            if not documents:
+                return []
+            self._check_writable()
+            vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+            texts = [doc.page_content for doc in documents]
+            metadatas = [doc.metadata for doc in documents]
+            ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in documents]
+            if len(set(ids)) != len(ids):
+                raise ValueError("IDs repetidos no mesmo lote.")
+            
+            with self._rw_lock.write():
+                if dedup:
+                    keep = self._dedup_mask_locked(documents, vectors)
+                    if not keep.all():
+                        documents = [doc for doc, kept in zip(documents, keep) if kept]
+                        ids = [doc_id for doc_id, kept in zip(ids, keep) if kept]
+                        texts = [doc.page_content for doc in documents]
+                        metadatas = [doc.metadata for doc in documents]
+                        vectors = vectors[keep]
+                    if not documents:
+                        return []
+                
+                if self.vector_store is not None:
+                    if replace:
+                        self._delete_locked(ids)
+                    existing = [doc_id for doc_id in ids if self._row_of(doc_id) is not None]
+                    if existing:
+                        raise ValueError(f"IDs já existentes (use upsert): {existing[:5]}")
+                
+                start_row = self.vector_store.index.ntotal if self.vector_store is not None else 0
+                if self.vector_store is not None:
+                    self.vector_store.add_embeddings(
+                        zip(texts, vectors.tolist()),
+                        metadatas=metadatas,
+                        ids=ids
+                    )
+                else:
+                    self.vector_store = FAISS.from_embeddings(
+                        zip(texts, vectors.tolist()),
+                        self.embeddings,
+                        metadatas=metadatas,
+                        ids=ids
+                    )
+                
+                self._id_rows.update((doc_id, start_row + offset) for offset, doc_id in enumerate(ids))
+                if self.metadata_index is not None:
+                    self.metadata_index.add(start_row, metadatas)
+                if self.bm25_index is not None:
+                    self.bm25_index.add(start_row, texts)
+                if self.query_cache is not None:
+                    self.query_cache.invalidate()
+                
+                # Persiste apenas o lote novo
+                if not self.segments.embedding_info:
+                    self.segments.set_embedding_info(self._embedding_info(vectors.shape[1]))
+                self.segments.append(ids, texts, metadatas, vectors)
+                if self.dedup is not None:
+                    self.dedup.register(ids, documents)
+            logger.info(f"Adicionados {len(documents)} documentos ao banco de dados vetorial.")
+            
+            if self.segments.needs_compaction():
+                self.compact(background=True)
+            elif replace:
+                self._maybe_compact_tombstones()
+            self._maybe_rebuild_index()
+            
+            return ids
+            
+        except Exception as e:
+            logger.error(f"Erro ao adicionar embeddings ao banco de dados vetorial: {str(e)}")
+            raise
+    
+    def _dedup_mask_locked(self, documents: List[Document], vectors: np.ndarray) -> np.ndarray:
+        """Máscara dos documentos a manter; deve ser chamada sob a trava de escrita."""
+        keep = np.ones(len(documents), dtype=bool)
+        if self.dedup is not None:
+            kept = {id(doc) for doc in self.dedup.filter(documents)}
+            keep &= np.array([id(doc) in kept for doc in documents], dtype=bool)
+        if settings.VECTOR_STORE_NEAR_DEDUP == "vector":
+            keep &= self._near_duplicate_mask(vectors)
+        return keep
+    
+    def _near_duplicate_mask(self, vectors: np.ndarray) -> np.ndarray:
+        """Máscara dos vetores a manter: longe do vizinho mais próximo no índice e dos anteriores do lote.
+        
+        Deve ser chamada sob a trava (usa o índice sem travar).
+        """
+        threshold = settings.VECTOR_STORE_NEAR_DEDUP_DISTANCE
+        keep = np.ones(len(vectors), dtype=bool)
+        if self.vector_store is not None and self.vector_store.index.ntotal > 0:
+            distances, indices = search_excluding(self.vector_store.index, vectors, 1, self.tombstones)
+            keep = (indices[:, 0] < 0) | (distances[:, 0] > threshold)
+        
+        # Dentro do lote, mantém a primeira ocorrência de cada grupo de vetores próximos
+        norms = np.einsum("ij,ij->i", vectors, vectors)
+        for row in range(len(vectors) - 1):
+            if not keep[row]:
+                continue
+            later = np.arange(row + 1, len(vectors))
+            distances = norms[later] + norms[row] - 2 * (vectors[later] @ vectors[row])
+            keep[later[distances <= threshold]] = False
+        return keep
+    
+    def compact(self, background: bool = False, force: bool = False):
+        """Incorpora os segmentos anexados em uma nova base no disco.
+        
+        A base é gravada sob trava de leitura: buscas seguem sendo atendidas e
+        novas inserções aguardam o fim da compação. Com `force=True`, grava a base
+        mesmo sem segmentos pendentes (ex.: após reconstruir o índice).
+        """
+        if background:
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+            self._compaction_thread = threading.Thread(
+                target=self._run_compaction,
+                args=(force,),
+                name="vector-store-compaction",
+                daemon=True
+            )
+            self._compaction_thread.start()
+        else:
+            self._run_compaction(force)
+    
+    def _run_compaction(self, force: bool = False):
+        if self.read_only:
+            return
+        try:
+            with self._maintenance_lock:
+                self._compact_locked(force)
+        except Exception as e:
+            logger.error(f"Erro na compação do banco de dados vetorial: {str(e)}")
+    
+    def _compact_locked(self, force: bool):
+        purged = None
+        with self._rw_lock.read():
+            if self.vector_store is None:
+                return
+            if not force and not self.segments.live_segment_names():
+                return
+            if len(self.tombstones):
+                # Linhas excluídas são descartadas fisicamente na nova base
+                purged = self._purged_state()
+                self.segments.write_base(purged["store"], sidecars={
+                    ".metaidx": purged["metadata_index"], ".bm25": purged["bm25_index"]
+                }, vectors=purged["vectors"], embedding=self._embedding_info(self.vector_store.index.d))
+            else:
+                self.segments.write_base(
+                    self.vector_store, sidecars=self._row_indexes(),
+                    embedding=self._embedding_info(self.vector_store.index.d)
+                )
+            snapshot = (self.vector_store.index.ntotal, len(self.tombstones))
+        
+        if purged is not None and not settings.VECTOR_STORE_MMAP:
+            with self._rw_lock.write():
+                if (self.vector_store.index.ntotal, len(self.tombstones)) == snapshot:
+                    self._apply_state(purged)
+                else:
+                    # Houve escritas entre a compação e a troca: o disco está consistente
+                    self.vector_store = self._load_vector_store()
+            logger.info(f"Compação descartou {snapshot[1]} linhas excluídas.")
+        
+        if settings.VECTOR_STORE_MMAP:
+            # Remapeia a nova base: o delta em memória volta a ficar vazio e os
+            # arquivos da base anterior (já removidos do manifesto) são liberados
+            with self._rw_lock.write():
+                self.vector_store = self._load_vector_store()
+    
+    def _purged_state(self) -> Dict[str, Any]:
+        """Cópia do banco sem as linhas excluídas (chamar sob a trava de leitura).
+        
+        O novo índice é um clone vazio do atual (mantém o treino de IVF/PQ/SQ) com
+        os vetores vivos, originais (ver `_float_vectors_locked`); o estado
+        retornado inclui esses vetores em "vectors", para a nova base.
+        """
+        store = self.vector_store
+        index = store.index.to_index() if isinstance(store.index, LayeredIndex) else store.index
+        live = np.flatnonzero(~self.tombstones.mask(np.arange(index.ntotal)))
+        vectors = self._float_vectors_locked(index=index)[live]
+        
+        new_index = empty_like(index)
+        if len(vectors):
+            new_index.add(vectors)
+        apply_search_params(new_index, **index_params_from_settings())
+        
+        ids = [store.index_to_docstore_id[int(row)] for row in live]
+        documents = [self._document_at(row) for row in live]
+        state = self._state_for(new_index, ids, documents, self.embeddings)
+        state["vectors"] = vectors
+        return state
+    
+    def _float_vectors_locked(self, start: int = 0, end: Optional[int] = None, index=None) -> np.ndarray:
+        """Vetores originais das linhas [start, end) (chamar sob a trava).
+        
+        Em índices exatos são os próprios vetores do índice; em índices com perda
+        (IVF-PQ, SQ8) vêm dos float32 persistidos (`<base>.f32` e segmentos), para
+        que retreinos e compações não acumulem o erro da quantização. `index` é o
+        índice atual, se já materializado pelo chamador.
+        """
+        index = self.vector_store.index if index is None else index
+        end = index.ntotal if end is None else end
+        if not stores_exact_vectors(index):
+            vectors = self.segments.read_vectors(index.d, index.ntotal, start, end)
+            if vectors is not None:
+                return vectors
+            logger.warning("Vetores originais indisponíveis (base antiga); usando vetores reconstruídos.")
+        return extract_vectors(index, start, end)
+    
+    def _state_for(self, index, ids: List[str], documents: List[Document], embeddings: Embeddings) -> Dict[str, Any]:
+        """Estado completo (banco em memória e índices auxiliares) para um índice já populado."""
+        new_store = FAISS(
+            embeddings,
+            index,
+            InMemoryDocstore(dict(zip(ids, documents))),
+            dict(enumerate(ids)),
+            normalize_L2=self.vector_store._normalize_L2,
+            distance_strategy=self.vector_store.distance_strategy
+        )
+        metadata_index = self._new_metadata_index()
+        if metadata_index is not None:
+            metadata_index.add(0, [doc.metadata for doc in documents])
+        bm25_index = self._new_bm25_index()
+        if bm25_index is not None:
+            bm25_index.add(0, [doc.page_content for doc in documents])
+        return {
+            "store": new_store,
+            "metadata_index": metadata_index,
+            "bm25_index": bm25_index,
+            "id_rows": {doc_id: row for row, doc_id in enumerate(ids)},
+            "tombstones": Tombstones()
+        }
+    
+    def _maybe_rebuild_index(self):
+        """Agenda a reconstrução do índice quando o tipo configurado ou o volume mudam."""
+        if self.vector_store is None:
+            return
+        index_info = self.segments.index_info
+        trained_on = index_info.get("trained_on") or self.vector_store.index.ntotal
+        if should_rebuild(
+            self.vector_store.index,
+            trained_on=trained_on,
+            min_train_size=settings.VECTOR_STORE_MIN_TRAIN_SIZE,
+            retrain_growth=settings.VECTOR_STORE_RETRAIN_GROWTH,
+            **index_params_from_settings()
+        ):
+            self.rebuild_index(background=True)
+    
+    def rebuild_index(self, background: bool = False):
+        """Reconstrói (e treina, se necessário) o índice com o tipo configurado.
+        
+        Os vetores são extraídos sob trava de leitura e o novo índice é treinado fora
+        dela; buscas continuam no índice anterior até a troca. O treino usa os
+        vetores originais, mesmo quando o índice atual é quantizado (IVF-PQ, SQ8).
+        """
+        if background:
+            if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+                return
+            self._rebuild_thread = threading.Thread(
+                target=self._run_rebuild,
+                name="vector-store-rebuild",
+                daemon=True
+            )
+            self._rebuild_thread.start()
+        else:
+            self._run_rebuild()
+    
+    def _run_rebuild(self):
+        if self.read_only:
+            return
+        try:
+            with self._maintenance_lock:
+                self._rebuild_locked()
+            self.compact(force=True)
+        except Exception as e:
+            logger.error(f"Erro ao reconstruir o índice vetorial: {str(e)}")
+    
+    def _rebuild_locked(self):
+        params = index_params_from_settings()
+        with self._rw_lock.read():
+            index = self.vector_store.index
+            count = index.ntotal
+            metric = index.metric_type
+            vectors = self._float_vectors_locked()
+        
+        start = time.perf_counter()
+        new_index = build_index(vectors, metric=metric, **params)
+        
+        with self._rw_lock.write():
+            current = self.vector_store.index
+            if current.ntotal > count:
+                # Inclui o que foi adicionado durante o treino
+                new_index.add(self._float_vectors_locked(count))
+            self.vector_store.index = new_index
+            if self.query_cache is not None:
+                # Índices aproximados podem ordenar os vizinhos de outra forma
+                self.query_cache.invalidate()
+        
+        self.segments.set_index_info({"type": params["index_type"], "trained_on": count})
+        logger.info(
+            f"Índice reconstruído como {params['index_type']} com {count} vetores "
+            f"em {time.perf_counter() - start:.1f}s."
+        )
+    
+    def reindex(self, embeddings: Optional[Embeddings] = None, background: bool = False):
+        """Reindexa todo o banco em uma nova versão (ex.: ao trocar o modelo de embeddings).
+        
+        Os documentos vivos são embutidos novamente e o índice é montado e gravado
+        como um novo snapshot enquanto as buscas seguem na versão atual. Documentos
+        incluídos ou excluídos durante a reindexação são reaplicados no fim, sob a
+        trava de escrita, e a troca é feita publicando o novo manifesto, que
+        registra o novo modelo: leitores com o modelo antigo recusam a versão e
+        aberturas com outro modelo falham até uma nova reindexação.
+        """
+        if background:
+            if self._reindex_thread is not None and self._reindex_thread.is_alive():
+                return
+            self._reindex_thread = threading.Thread(
+                target=self._run_reindex,
+                args=(embeddings,),
+                name="vector-store-reindex",
+                daemon=True
+            )
+            self._reindex_thread.start()
+        else:
+            self._run_reindex(embeddings)
+    
+    def _run_reindex(self, embeddings: Optional[Embeddings] = None):
+        try:
+            self._check_writable()
+            with self._maintenance_lock:
+                self._reindex_locked(embeddings or self.embeddings)
+        except Exception as e:
+            logger.error(f"Erro ao reindexar o banco de dados vetorial: {str(e)}")
+    
+    def _reindex_locked(self, embeddings: Embeddings):
+        import faiss
+        
+        start = time.perf_counter()
+        params = index_params_from_settings()
+        with self._rw_lock.read():
+            if self.vector_store is None:
+                return
+            metric = self.vector_store.index.metric_type
+            normalize = self.vector_store._normalize_L2
+            deletions = len(self.tombstones)
+            rows, ids, documents, _ = self._export_locked(0, self.vector_store.index.ntotal)
+            marker = self.vector_store.index.ntotal
+        if not ids:
+            logger.warning("Nada a reindexar: o banco de dados vetorial está vazio.")
+            return
+        
+        # 1. Nova base, montada e gravada fora das travas
+        vectors = self._embed_all(documents, embeddings)
+        if normalize:
+            faiss.normalize_L2(vectors)
+        state = self._state_for(build_index(vectors, metric=metric, **params), ids, documents, embeddings)
+        apply_search_params(state["store"].index, **params)
+        snapshot = self.segments.write_snapshot(state["store"], sidecars={
+            ".metaidx": state["metadata_index"], ".bm25": state["bm25_index"]
+        }, vectors=vectors, embedding=self._embedding_info(vectors.shape[1], embeddings))
+        
+        # 2. O que chegou durante a montagem: a maior parte é embutida fora da trava
+        with self._rw_lock.read():
+            late = self._export_locked(marker, self.vector_store.index.ntotal)
+            marker = self.vector_store.index.ntotal
+        late_vectors = self._embed_all(late[2], embeddings, vectors.shape[1])
+        
+        with self._rw_lock.write():
+            rest = self._export_locked(marker, self.vector_store.index.ntotal)
+            added_rows = list(late[0]) + list(rest[0])
+            added_ids = late[1] + rest[1]
+            added_documents = late[2] + rest[2]
+            added_vectors = np.vstack([late_vectors, self._embed_all(rest[2], embeddings, vectors.shape[1])])
+            
+            # Exclusões (e substituições) feitas depois da leitura de cada linha
+            removed_ids: List[str] = []
+            if len(self.tombstones) != deletions:
+                removed_ids = [doc_id for row, doc_id in zip(rows, ids) if self._row_of(doc_id) != row]
+                live = [pos for pos, (row, doc_id) in enumerate(zip(added_rows, added_ids))
+                        if self._row_of(doc_id) == row]
+                added_ids = [added_ids[pos] for pos in live]
+                added_documents = [added_documents[pos] for pos in live]
+                added_vectors = added_vectors[live]
+            
+            contents = []
+            if removed_ids:
+                contents.append((self.segments.write_deletions(removed_ids), removed_ids))
+            if added_ids:
+                contents.append((
+                    self.segments.write_segment(
+                        added_ids,
+                        [doc.page_content for doc in added_documents],
+                        [doc.metadata for doc in added_documents],
+                        added_vectors
+                    ),
+                    (added_ids, [doc.page_content for doc in added_documents],
+                     [doc.metadata for doc in added_documents], added_vectors)
+                ))
+            self.segments.publish(snapshot, self.segments.live_segment_names(), [entry for entry, _ in contents])
+            
+            if settings.VECTOR_STORE_MMAP:
+                self.embeddings = embeddings
+                self.vector_store = self._load_vector_store()
+            else:
+                base_rows = state["store"].index.ntotal
+                deleted_rows = SegmentLog.apply_segments(state["store"], contents, state["id_rows"])
+                if state["metadata_index"] is not None:
+                    state["metadata_index"].add(base_rows, [doc.metadata for doc in added_documents])
+                    state["metadata_index"].remove_rows(deleted_rows)
+                if state["bm25_index"] is not None:
+                    state["bm25_index"].add(base_rows, [doc.page_content for doc in added_documents])
+                    state["bm25_index"].remove_rows(deleted_rows)
+                state["tombstones"].add(deleted_rows)
+                self.embeddings = embeddings
+                self._apply_state(state)
+        
+        self.segments.set_index_info({"type": params["index_type"], "trained_on": len(ids)})
+        logger.info(
+            f"Banco de dados vetorial reindexado ({len(ids) + len(added_ids)} documentos) "
+            f"em {time.perf_counter() - start:.1f}s; nova versão {snapshot['name']}."
+        )
+    
+    @staticmethod
+    def _embed_all(documents: List[Document], embeddings: Embeddings, dim: int = 0) -> np.ndarray:
+        """Embute documentos em lotes de `INGESTION_BATCH_SIZE` (matriz vazia com `dim` colunas se não houver)."""
+        batch_size = max(1, settings.INGESTION_BATCH_SIZE)
+        parts = [
+            np.array(embeddings.embed_documents(
+                [doc.page_content for doc in documents[pos:pos + batch_size]]
+            ), dtype=np.float32)
+            for pos in range(0, len(documents), batch_size)
+        ]
+        return np.vstack(parts) if parts else np.zeros((0, dim), dtype=np.float32)
+    
+    def refresh(self) -> bool:
+        """Passa a usar a versão publicada no disco por outro processo, se houver uma nova.
+        
+        Segmentos anexados desde a última leitura são aplicados de forma
+        incremental; se a base mudou (compação ou reindexação), a nova versão é
+        carregada por completo fora da trava e trocada de uma vez. Retorna True
+        se o estado mudou.
+        """
+        if not self.segments.changed_on_disk():
+            return False
+        for attempt in range(3):
+            try:
+                manifest, stamp = self.segments.read_disk_manifest()
+                if manifest is None:
+                    return False
+                try:
+                    dim = self.vector_store.index.d if self.vector_store is not None else None
+                    self._check_embedding_info(manifest.get("embedding") or {}, dim)
+                except ValueError as e:
+                    # Outro processo reindexou com outro modelo: as consultas daqui seriam incompatíveis
+                    logger.error(f"Nova versão do banco vetorial ignorada: {str(e)}")
+                    return False
+                appended = self.segments.appended_segments(manifest) if self.vector_store is not None else None
+                if appended is not None:
+                    contents = self.segments.read_segments(appended)
+                    with self._rw_lock.write():
+                        start = self.vector_store.index.ntotal
+                        deleted_rows = SegmentLog.apply_segments(self.vector_store, contents, self._id_rows)
+                        new_rows = range(start, self.vector_store.index.ntotal)
+                        if self.metadata_index is not None:
+                            self.metadata_index.add(start, (self._document_at(row).metadata for row in new_rows))
+                            self.metadata_index.remove_rows(deleted_rows)
+                        if self.bm25_index is not None:
+                            self.bm25_index.add(start, (self._document_at(row).page_content for row in new_rows))
+                            self.bm25_index.remove_rows(deleted_rows)
+                        self.tombstones.add(deleted_rows)
+                        self.segments.adopt(manifest, stamp)
+                        if self.query_cache is not None:
+                            self.query_cache.invalidate()
+                else:
+                    segments = self._new_segment_log()
+                    state = self._load_state(segments)
+                    with self._rw_lock.write():
+                        self._apply_state(state)
+                        self.segments = segments
+                logger.info("Banco de dados vetorial atualizado para a versão publicada no disco.")
+                return True
+            except FileNotFoundError:
+                # A versão lida foi substituída durante a leitura (ex.: compação): tenta de novo
+                logger.debug(f"Versão do banco vetorial substituída durante a leitura (tentativa {attempt + 1}).")
+        logger.warning("Não foi possível carregar a nova versão do banco vetorial; mantendo a atual.")
+        return False
+    
+    def _watch_for_new_versions(self):
+        while not self._reload_stop.wait(settings.VECTOR_STORE_RELOAD_INTERVAL):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Erro ao recarregar o banco de dados vetorial: {str(e)}")
+    
     def similarity_search(
         self, 
         query: str, 
         k: int = 4, 
         filter: Optional[Dict[str, Any]] = None
     ) -> List[Document]:
-        """Realiza uma busca por similaridade no banco de dados vetorial."""
+        """Realiza uma busca por similaridade no banco de dados vetorial.
+        
+        Filtros por metadados (dict) são resolvidos no índice de metadados e a busca
+        percorre apenas os vetores permitidos, retornando sempre até `k` resultados.
+        Com `VECTOR_STORE_MICRO_BATCH_MS` > 0, consultas concorrentes são agrupadas
+        em um único lote (se o lote falhar ou demorar demais, a busca é feita diretamente).
+        """
+        if settings.VECTOR_STORE_MICRO_BATCH_MS > 0:
+            try:
+                return self._get_batcher().search(query, k, filter)
+            except Exception as e:
+                logger.error(f"Erro na busca por similaridade em lote; buscando diretamente: {str(e)}")
+        return self.similarity_search_batch([query], k=k, filters=filter)[0]
+    
+    def similarity_search_batch(
+        self,
+        queries: Sequence[str],
+        k: int = 4,
+        filters: Union[None, Dict[str, Any], Sequence[Optional[Dict[str, Any]]]] = None
+    ) -> List[List[Document]]:
+        """Busca várias consultas de uma vez: uma passada de embedding e uma busca no FAISS.
+        
+        `filters` pode ser um único filtro (aplicado a todas as consultas) ou uma
+        lista com um filtro (ou None) por consulta.
+        """
         try:
             if self.vector_store is None:
                 logger.warning("Banco de dados vetorial não inicializado.")
+                return [[] for _ in queries]
+            if not queries:
                 return []
-                
-            return self.vector_store.similarity_search(
-                query=query,
-                k=k,
-                filter=filter
-            )
+            
+            if filters is None or isinstance(filters, dict) or callable(filters):
+                filters = [filters] * len(queries)
+            if len(filters) != len(queries):
+                raise ValueError("É necessário um filtro (ou None) por consulta.")
+            
+            filters = list(filters)
+            cache = self.query_cache
+            results: List[Optional[List[Document]]] = [
+                cache.get(query, k, filter) if cache is not None else None
+                for query, filter in zip(queries, filters)
+            ]
+            pending = [pos for pos, documents in enumerate(results) if documents is None]
+            if not pending:
+                return results
+            
+            embeddings = self.embeddings
+            vectors = np.array(self._embed_queries([queries[pos] for pos in pending]), dtype=np.float32)
+            if cache is not None:
+                for row, pos in enumerate(pending):
+                    results[pos] = cache.get_similar(vectors[row], k, filters[pos])
+                missing = [row for row, pos in enumerate(pending) if results[pos] is None]
+                pending, vectors = [pending[row] for row in missing], vectors[missing]
+                if not pending:
+                    return results
+            
+            query_vectors = vectors.copy()
+            with self._rw_lock.read():
+                if self.embeddings is not embeddings:
+                    # Uma reindexação trocou o modelo entre o embedding e a busca
+                    vectors = np.array(self._embed_queries([queries[pos] for pos in pending]), dtype=np.float32)
+                generation = cache.generation if cache is not None else None
+                found = self._search_vectors(vectors, k, [filters[pos] for pos in pending])
+            for row, (pos, documents) in enumerate(zip(pending, found)):
+                results[pos] = documents
+                if cache is not None:
+                    cache.put(queries[pos], k, filters[pos], documents, query_vectors[row], generation)
+            return results
         except Exception as e:
-            logger.error(f"Erro na busca por similaridade: {str(e)}")
+            logger.error(f"Erro na busca por similaridade em lote: {str(e)}")
+            return [[] for _ in queries]
+    
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        # Os motores locais (e o cache) expõem `embed_queries`; os demais embutem em lote
+        embed = getattr(self.embeddings, "embed_queries", self.embeddings.embed_documents)
+        return embed(queries)
+    
+    def _search_vectors(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        filters: List[Optional[Dict[str, Any]]]
+    ) -> List[List[Document]]:
+        """Executa a busca dos vetores de consulta (deve ser chamada sob o lock de leitura)."""
+        return [self._documents_for_rows(rows) for rows, _ in self._search_rows(vectors, k, filters)]
+    
+    def similarity_search_by_vectors(
+        self,
+        vectors: np.ndarray,
+        k: int = 4,
+        filters: Optional[List[Optional[Dict[str, Any]]]] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """Busca por vetores de consulta já calculados, retornando (documento, distância)."""
+        if self.vector_store is None:
+            return [[] for _ in vectors]
+        vectors = np.array(vectors, dtype=np.float32)
+        filters = filters if filters is not None else [None] * len(vectors)
+        with self._rw_lock.read():
+            return [
+                [
+                    (doc, float(distance))
+                    for row, distance in zip(rows, distances)
+                    for doc in [self._document_at(row)]
+                    if isinstance(doc, Document)
+                ]
+                for rows, distances in self._search_rows(vectors, k, filters)
+            ]
+    
+    def _search_rows(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        filters: List[Optional[Dict[str, Any]]]
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """(linhas, distâncias) mais próximas de cada vetor no FAISS (sob o lock de leitura)."""
+        if self.vector_store._normalize_L2:
+            import faiss
+            faiss.normalize_L2(vectors)
+        
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+        results: List[Tuple[np.ndarray, np.ndarray]] = [empty for _ in filters]
+        
+        # Consultas sem filtro: uma única busca sobre a matriz empilhada
+        plain = [pos for pos, filter in enumerate(filters) if not filter]
+        if plain:
+            distances, indices = search_excluding(self.vector_store.index, vectors[plain], k, self.tombstones)
+            for pos, rows, row_distances in zip(plain, indices, distances):
+                results[pos] = (rows[rows >= 0], row_distances[rows >= 0])
+        
+        for pos, filter in enumerate(filters):
+            if not filter:
+                continue
+            allowed = self._allowed_rows(filter)
+            if allowed is not None:
+                allowed = allowed[~self.tombstones.mask(allowed)]
+                if len(allowed):
+                    distances, indices = filtered_search(
+                        self.vector_store.index, vectors[pos:pos + 1], k, allowed
+                    )
+                    results[pos] = (indices[0][indices[0] >= 0], distances[0][indices[0] >= 0])
+            else:
+                # Filtros não indexados (ou funções): pós-filtragem sobre mais candidatos
+                distances, indices = search_excluding(
+                    self.vector_store.index, vectors[pos:pos + 1], max(k, 20), self.tombstones
+                )
+                kept = [
+                    column for column, row in enumerate(indices[0])
+                    if row >= 0 and _matches_filter(filter, self._document_at(row).metadata)
+                ][:k]
+                results[pos] = (indices[0][kept], distances[0][kept])
+        return results
+    
+    def export_rows(self, start: int = 0, count: Optional[int] = None) -> Tuple[List[str], List[Document], np.ndarray]:
+        """Exporta (ids, documentos, vetores) de um intervalo de linhas, na ordem do índice.
+        
+        Linhas excluídas são omitidas; em índices com quantização os vetores são
+        reconstruídos (aproximados).
+        """
+        with self._rw_lock.read():
+            if self.vector_store is None:
+                return [], [], np.zeros((0, 0), dtype=np.float32)
+            total = self.vector_store.index.ntotal
+            end = total if count is None else min(total, start + count)
+            _, ids, documents, vectors = self._export_locked(start, end)
+        return ids, documents, vectors
+    
+    def _export_locked(self, start: int, end: int) -> Tuple[np.ndarray, List[str], List[Document], np.ndarray]:
+        """(linhas, ids, documentos, vetores) das linhas vivas em [start, end) (sob trava)."""
+        live = np.arange(start, end)
+        live = live[~self.tombstones.mask(live)]
+        ids = [self.vector_store.index_to_docstore_id[int(row)] for row in live]
+        documents = [self._document_at(row) for row in live]
+        if end > start:
+            vectors = self._float_vectors_locked(start, end)[live - start]
+        else:
+            vectors = np.zeros((0, self.vector_store.index.d), dtype=np.float32)
+        return live, ids, documents, vectors
+    
+    def count(self) -> int:
+        """Quantidade de documentos vivos no índice (sem as linhas excluídas)."""
+        return self.vector_store.index.ntotal - len(self.tombstones) if self.vector_store is not None else 0
+    
+    def _allowed_rows(self, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Linhas que satisfazem o filtro pelo índice de metadados (None se não for possível)."""
+        if (filter and isinstance(filter, dict) and self.metadata_index is not None
+                and self.metadata_index.supports(filter)):
+            return self.metadata_index.lookup(filter)
+        return None
+    
+    def hybrid_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        fetch_k: Optional[int] = None
+    ) -> List[Document]:
+        """Busca híbrida: combina a busca vetorial e a BM25 por Reciprocal Rank Fusion.
+        
+        Cada busca retorna `fetch_k` candidatos (padrão: max(4 * k, 20)); a fusão
+        mantém os `k` melhores. Sem índice BM25, equivale a `similarity_search`.
+        """
+        try:
+            if self.vector_store is None:
+                logger.warning("Banco de dados vetorial não inicializado.")
+                return []
+            if self.bm25_index is None:
+                return self.similarity_search(query, k=k, filter=filter)
+            
+            fetch_k = fetch_k or max(4 * k, 20)
+            embeddings = self.embeddings
+            vectors = np.array(self._embed_queries([query]), dtype=np.float32)
+            with self._rw_lock.read():
+                if self.embeddings is not embeddings:
+                    vectors = np.array(self._embed_queries([query]), dtype=np.float32)
+                dense_rows, _ = self._search_rows(vectors, fetch_k, [filter])[0]
+                allowed = self._allowed_rows(filter)
+                if filter and allowed is None:
+                    lexical_rows, _ = self.bm25_index.search(query, fetch_k * 4)
+                    lexical_rows = [
+                        row for row in lexical_rows
+                        if _matches_filter(filter, self._document_at(row).metadata)
+                    ][:fetch_k]
+                else:
+                    lexical_rows, _ = self.bm25_index.search(query, fetch_k, allowed_rows=allowed)
+                fused = reciprocal_rank_fusion(
+                    [dense_rows, lexical_rows], k=k, constant=settings.VECTOR_STORE_RRF_K
+                )
+                return self._documents_for_rows(fused)
+        except Exception as e:
+            logger.error(f"Erro na busca híbrida: {str(e)}")
+            return []
+    
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        """Busca MMR: `fetch_k` candidatos vivos, reordenados por relevância e diversidade.
+        
+        Os candidatos vêm da mesma busca de `similarity_search` (ignorando linhas
+        excluídas e com pré-filtragem), sob o lock de leitura.
+        """
+        try:
+            if self.vector_store is None:
+                logger.warning("Banco de dados vetorial não inicializado.")
+                return []
+            embeddings = self.embeddings
+            vectors = np.array(self._embed_queries([query]), dtype=np.float32)
+            with self._rw_lock.read():
+                if self.embeddings is not embeddings:
+                    vectors = np.array(self._embed_queries([query]), dtype=np.float32)
+                query_vector = vectors[0].copy()
+                rows, _ = self._search_rows(vectors, max(fetch_k, k), [filter])[0]
+                if not len(rows):
+                    return []
+                selected = maximal_marginal_relevance(
+                    query_vector, self._row_vectors_locked(rows), lambda_mult=lambda_mult, k=k
+                )
+                return self._documents_for_rows(rows[selected])
+        except Exception as e:
+            logger.error(f"Erro na busca MMR: {str(e)}")
             return []
     
+    def _row_vectors_locked(self, rows: np.ndarray) -> np.ndarray:
+        """Vetores das linhas indicadas (chamar sob a trava)."""
+        index = self.vector_store.index
+        try:
+            return np.vstack([index.reconstruct(int(row)) for row in rows])
+        except RuntimeError:
+            # IVF sem mapa direto: lê o intervalo que contém as linhas
+            low = int(rows.min())
+            return self._float_vectors_locked(low, int(rows.max()) + 1)[rows - low]
+    
+    def _get_batcher(self) -> QueryBatcher:
+        if self._batcher is None:
+            with self._batcher_lock:
+                if self._batcher is None:
+                    self._batcher = QueryBatcher(
+                        self.similarity_search_batch,
+                        max_wait_ms=settings.VECTOR_STORE_MICRO_BATCH_MS,
+                        max_batch_size=settings.VECTOR_STORE_MICRO_BATCH_SIZE,
+                        timeout=settings.VECTOR_STORE_MICRO_BATCH_TIMEOUT or None
+                    )
+        return self._batcher
+    
+    def close(self):
+        """Encerra as threads auxiliares (micro-batching e recarga de versões)."""
+        self._reload_stop.set()
+        if self._reload_thread is not None:
+            self._reload_thread.join()
+            self._reload_thread = None
+        with self._batcher_lock:
+            if self._batcher is not None:
+                self._batcher.close()
+                self._batcher = None
+    
+    def _document_at(self, row: int):
+        return self.vector_store.docstore.search(self.vector_store.index_to_docstore_id[int(row)])
+    
+    def _documents_for_rows(self, rows) -> List[Document]:
+        """Converte linhas do índice FAISS em documentos (ignora posições vazias)."""
+        documents = []
+        for row in rows:
+            if row < 0:
+                continue
+            doc = self._document_at(row)
+            if isinstance(doc, Document):
+                documents.append(doc)
+        return documents
+    
     def as_retriever(self, **kwargs):
-        """Retorna o banco de dados como um retriever."""
+        """Retorna o banco de dados como um retriever.
+        
+        As buscas passam pelo gerenciador (linhas excluídas, trava de leitura,
+        cache de consultas e pré-filtragem): "similarity", "hybrid" (vetorial +
+        BM25) e "mmr" (`k`, `fetch_k`, `lambda_mult` e `filter` em `search_kwargs`).
+        """
         if self.vector_store is None:
             raise ValueError("Banco de dados vetorial não inicializado.")
-        return self.vector_store.as_retriever(**kwargs)
+        search_type = kwargs.get("search_type", "similarity")
+        if search_type not in SEARCH_TYPES:
+            raise ValueError(f"Tipo de busca não suportado: {search_type} (use {', '.join(SEARCH_TYPES)}).")
+        return VectorStoreManagerRetriever(
+            manager=self,
+            search_type=search_type,
+            search_kwargs=kwargs.get("search_kwargs", {})
+        )
+    
+    def cache_stats(self) -> Dict[str, float]:
+        """Taxas de acerto do cache de consultas."""
+        return self.query_cache.stats() if self.query_cache is not None else {}
 
-# Instância global
-def get_vector_store() -> VectorStoreManager:
+
+class VectorStoreManagerRetriever(BaseRetriever):
+    """Retriever do LangChain que delega a busca ao `VectorStoreManager`."""
+    
+    manager: Any
+    search_type: str = "similarity"
+    search_kwargs: Dict[str, Any] = {}
+    
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        if self.search_type == "mmr":
+            return self.manager.max_marginal_relevance_search(
+                query,
+                k=self.search_kwargs.get("k", 4),
+                fetch_k=self.search_kwargs.get("fetch_k", 20),
+                lambda_mult=self.search_kwargs.get("lambda_mult", 0.5),
+                filter=self.search_kwargs.get("filter")
+            )
+        search = self.manager.hybrid_search if self.search_type == "hybrid" else self.manager.similarity_search
+        return search(
+            query,
+            k=self.search_kwargs.get("k", 4),
+            filter=self.search_kwargs.get("filter")
+        )
+
+# Instância global (uma por processo, compartilhada entre gerenciadores e sessões)
+_instance: Optional[VectorStoreManager] = None
+_instance_lock = threading.Lock()
+_ref_count = 0
+
+def _create_vector_store():
+    if settings.VECTOR_STORE_SHARDS > 0:
+        from agent_fleet.vector_store.sharding import ShardedVectorStore
+        return ShardedVectorStore()
     return VectorStoreManager()
+
+def get_vector_store() -> VectorStoreManager:
+    """Obtém a instância compartilhada do banco vetorial, carregando-a uma única vez.
+    
+    Com `VECTOR_STORE_SHARDS` > 0 a instância é um `ShardedVectorStore`.
+    """
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = _create_vector_store()
+    return _instance
+
+def acquire_vector_store() -> VectorStoreManager:
+    """Obtém a instância compartilhada e registra uma referência ativa."""
+    global _ref_count
+    store = get_vector_store()
+    with _instance_lock:
+        _ref_count += 1
+    return store
+
+def release_vector_store():
+    """Libera uma referência obtida com `acquire_vector_store()`."""
+    global _ref_count
+    with _instance_lock:
+        if _ref_count == 0:
+            logger.warning("release_vector_store() chamado sem referência ativa.")
+            return
+        _ref_count -= 1
+
+@contextmanager
+def vector_store_session():
+    """Context manager que adquire e libera a instância compartilhada."""
+    store = acquire_vector_store()
+    try:
+        yield store
+    finally:
+        release_vector_store()
+
+def vector_store_ref_count() -> int:
+    """Número de referências ativas à instância compartilhada."""
+    return _ref_count
+
+def reset_vector_store(force: bool = False):
+    """Descarta a instância compartilhada para que seja recarregada do disco.
+    
+    Recusa-se a descartar enquanto houver referências ativas, a menos que `force=True`.
+    """
+    global _instance, _ref_count
+    with _instance_lock:
+        if _ref_count and not force:
+            raise RuntimeError(
+                f"Banco de dados vetorial em uso ({_ref_count} referências ativas)."
+            )
+        if _instance is not None:
+            _instance.close()
+        _instance = None
+        _ref_count = 0
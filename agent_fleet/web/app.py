@@ -66,11 +66,12 @@ if 'state' not in st.session_state:
 def initialize_agents():
     """Inicializa os agentes e ferramentas."""
     try:
-        from agent_fleet.crew.crew_manager import get_crew_manager
-        from agent_fleet.vector_store.vector_store import get_vector_store
+        from agent_fleet.registry import warmup
         
-        # Inicializa o gerenciador de equipes
-        crew_manager = get_crew_manager()
+        # Pré-aquece os componentes (modelos, embeddings, banco vetorial e equipes)
+        timings = warmup()
+        logger.info("Componentes inicializados: " + 
+                    ", ".join(f"{name}={elapsed:.2f}s" for name, elapsed in timings.items()))
         
         # Adiciona ferramentas ao agente de pesquisa
         research_tools = [
@@ -169,7 +170,7 @@ def display_chat():
 def process_agent_response(user_input: str):
     """Processa a entrada do usuário e obtém a resposta do agente."""
     try:
-        from crew.crew_manager import get_crew_manager
+        from agent_fleet.registry import get_component
         
         agent_id = st.session_state.state.active_agent
         if not agent_id:
@@ -177,27 +178,18 @@ def process_agent_response(user_input: str):
             return
         
         # Obtém o gerenciador de equipes
-        crew_manager = get_crew_manager()
+        crew_manager = get_component("crew")
         
-        # Cria uma tarefa para o agente
-        task_id = f"task_{len(st.session_state.state.conversation_history)}"
-        crew_manager.add_task(
-            task_id=task_id,
-            description=user_input,
+        # Executa a mensagem diretamente com o agente (sem registrar tarefa nem montar uma equipe)
+        response = crew_manager.run_agent(
             agent_id=agent_id,
+            description=user_input,
             expected_output="Resposta detalhada e útil para o usuário."
         )
-        
-        # Cria uma equipe com um único agente para esta tarefa
-        crew_id = f"crew_{task_id}"
-        crew_manager.create_crew(
-            crew_id=crew_id,
-            task_ids=[task_id]
-        )
-        
-        # Executa a tarefa
-        response = crew_manager.run_crew(crew_id=crew_id)
-        
+        if getattr(response, "partial", False):
+            st.warning(f"Execução interrompida: {response.reason}")
+            response = response or "Não foi possível concluir a resposta dentro do limite de execução."
+
         # Adiciona a resposta ao histórico
         st.session_state.state.conversation_history.append({
             'role': 'assistant',
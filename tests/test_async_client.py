@@ -0,0 +1,168 @@
+"""Testes de retries, hedging e limites por modelo do `AsyncLLMClient` sobre um transporte falso."""
+import asyncio
+import time
+from typing import Callable, Dict
+
+import httpx
+import pytest
+
+from agent_fleet.config.settings import ModelType, settings
+from agent_fleet.models.async_client import AsyncLLMClient, RetryableError, TokenBucket
+
+MODEL_ID = "stub-gpt"
+
+
+class StubAPI:
+    """API de chat falsa: `behaviour(n, request)` decide a resposta da n-ésima chamada."""
+
+    def __init__(self, behaviour: Callable[[int, httpx.Request], Dict]):
+        self.behaviour = behaviour
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.cancelled = 0
+        self.started = []
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        n = self.calls
+        self.started.append(time.monotonic())
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            spec = self.behaviour(n, request)
+            await asyncio.sleep(spec.get("delay", 0.0))
+            status = spec.get("status", 200)
+            if status != 200:
+                return httpx.Response(status, headers=spec.get("headers", {}), json={})
+            return httpx.Response(200, json={"choices": [{"message": {"content": spec.get("text", f"r{n}")}}]})
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def make_client(monkeypatch):
+    clients = []
+
+    def make(behaviour, model: Dict = None, **kwargs):
+        config = {"type": ModelType.OPENAI, "name": "gpt-4", "base_url": "http://stub.local/v1"}
+        config.update(model or {})
+        monkeypatch.setitem(settings.AVAILABLE_MODELS, MODEL_ID, config)
+        api = StubAPI(behaviour)
+        kwargs.setdefault("backoff", 0.001)
+        client = AsyncLLMClient(transport=httpx.MockTransport(api.handle), **kwargs)
+        clients.append(client)
+        return client, api
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+def test_retries_transient_statuses_then_succeeds(make_client):
+    client, api = make_client(lambda n, request: {"status": 503 if n == 1 else 429 if n == 2 else 200, "text": "ok"})
+
+    assert client.complete_sync(MODEL_ID, "olá") == "ok"
+    assert api.calls == 3
+    assert client.stats()[MODEL_ID]["retries"] == 2
+    assert client.stats()[MODEL_ID]["errors"] == 0
+
+
+def test_retry_after_header_sets_the_wait(make_client):
+    client, api = make_client(
+        lambda n, request: {"status": 429, "headers": {"retry-after": "0.3"}} if n == 1 else {}
+    )
+
+    client.complete_sync(MODEL_ID, "olá")
+
+    assert api.calls == 2
+    assert api.started[1] - api.started[0] >= 0.3
+
+
+def test_gives_up_after_the_configured_retries(make_client):
+    client, api = make_client(lambda n, request: {"status": 500}, retries=2)
+
+    with pytest.raises(RetryableError):
+        client.complete_sync(MODEL_ID, "olá")
+    assert api.calls == 3
+    assert client.stats()[MODEL_ID]["errors"] == 1
+
+
+def test_client_errors_are_not_retried(make_client):
+    client, api = make_client(lambda n, request: {"status": 400})
+
+    with pytest.raises(httpx.HTTPStatusError):
+        client.complete_sync(MODEL_ID, "olá")
+    assert api.calls == 1
+
+
+def test_hedge_wins_over_a_slow_primary_and_cancels_it(make_client):
+    # Chamadas 1-20: aquecimento; 21: primária lenta; 22: cópia rápida
+    def behaviour(n, request):
+        return {"delay": 5.0, "text": "lenta"} if n == 21 else {"delay": 0.01, "text": "rápida"}
+
+    client, api = make_client(behaviour, hedge=True, hedge_min_delay=0.1)
+    # O hedging só começa depois de 20 latências observadas
+    for _ in range(20):
+        client.complete_sync(MODEL_ID, "aquecimento")
+
+    start = time.monotonic()
+    assert client.complete_sync(MODEL_ID, "olá") == "rápida"
+
+    assert time.monotonic() - start < 2.0
+    stats = client.stats()[MODEL_ID]
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+    assert api.cancelled == 1 and api.active == 0
+    assert stats["in_flight"] == 0
+
+
+def test_deadline_cancels_primary_and_hedge(make_client):
+    client, api = make_client(
+        lambda n, request: {"delay": 0.01} if n <= 20 else {"delay": 5.0},
+        hedge=True, hedge_min_delay=0.05
+    )
+    for _ in range(20):
+        client.complete_sync(MODEL_ID, "aquecimento")
+
+    with pytest.raises(asyncio.TimeoutError):
+        client.complete_sync(MODEL_ID, "olá", timeout=0.3)
+
+    # Primária e cópia são canceladas junto com a chamada: nada fica ocupando o semáforo
+    assert api.calls == 22 and api.cancelled == 2
+    assert api.active == 0 and client.stats()[MODEL_ID]["in_flight"] == 0
+
+
+def test_concurrency_limit_per_model(make_client):
+    client, api = make_client(lambda n, request: {"delay": 0.05}, model={"concurrency": 2})
+
+    results = client.complete_batch_sync(MODEL_ID, [f"p{n}" for n in range(8)])
+
+    assert len(results) == 8
+    assert api.max_active == 2
+
+
+def test_rate_limit_spaces_requests(make_client):
+    client, api = make_client(lambda n, request: {}, model={"rate_limit": 20, "burst": 1})
+
+    start = time.monotonic()
+    client.complete_batch_sync(MODEL_ID, [f"p{n}" for n in range(6)])
+
+    # Rajada de 1 e 20/s: as 5 requisições seguintes esperam ~50 ms cada
+    assert time.monotonic() - start >= 0.24
+    gaps = [b - a for a, b in zip(api.started, api.started[1:])]
+    assert min(gaps) >= 0.04
+
+
+def test_token_bucket_allows_the_burst_then_throttles():
+    async def acquire_all(bucket: TokenBucket, count: int) -> float:
+        start = time.monotonic()
+        for _ in range(count):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(acquire_all(TokenBucket(rate=10, burst=5), 5)) < 0.05
+    assert asyncio.run(acquire_all(TokenBucket(rate=10, burst=5), 7)) >= 0.18
+    assert asyncio.run(acquire_all(TokenBucket(rate=0, burst=1), 100)) < 0.05
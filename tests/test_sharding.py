@@ -0,0 +1,168 @@
+"""Testes do particionamento (jump hash) e da busca scatter-gather do `ShardedVectorStore`."""
+from typing import Dict, List
+
+import numpy as np
+import pytest
+from langchain.embeddings.base import Embeddings
+from langchain.schema import Document
+
+from agent_fleet.vector_store import sharding
+from agent_fleet.vector_store.sharding import ShardedVectorStore, _key_of, jump_hash
+
+
+class LineEmbeddings(Embeddings):
+    """"doc N" vira o ponto (N, 0): a distância L2² entre "doc A" e "doc B" é (A - B)²."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [[float(text.split()[-1]), 0.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class FakeShard:
+    """Shard em memória com o mesmo protocolo de comandos do processo shard."""
+
+    def __init__(self, path, context):
+        self.path = path
+        self.rows: Dict[str, tuple] = {}
+        self.searches = 0
+
+    def call(self, command, *args):
+        if command == "add":
+            documents, vectors, ids, replace = args
+            for doc, vector, doc_id in zip(documents, vectors, ids):
+                self.rows[doc_id] = (doc, np.asarray(vector, dtype=np.float32))
+            return list(ids)
+        if command == "delete":
+            return sum(self.rows.pop(doc_id, None) is not None for doc_id in args[0])
+        if command == "search":
+            vectors, k, filters = args
+            self.searches += 1
+            results = []
+            for vector, filter in zip(vectors, filters):
+                scored = [
+                    (doc, float(np.sum((row - vector) ** 2)))
+                    for doc, row in self.rows.values()
+                    if not filter or all(doc.metadata.get(key) == value for key, value in filter.items())
+                ]
+                results.append(sorted(scored, key=lambda item: item[1])[:k])
+            return results
+        if command == "export":
+            start, count = args
+            items = list(self.rows.items())[start:start + count]
+            return (
+                [doc_id for doc_id, _ in items],
+                [doc for _, (doc, _) in items],
+                np.array([row for _, (_, row) in items], dtype=np.float32).reshape(-1, 2)
+            )
+        if command == "count":
+            return len(self.rows)
+        if command == "compact":
+            return None
+        raise ValueError(f"Comando desconhecido: {command}")
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def make_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(sharding, "_ShardClient", FakeShard)
+    stores = []
+
+    def make(num_shards: int, partition: str = "hash") -> ShardedVectorStore:
+        store = ShardedVectorStore(
+            path=str(tmp_path / "vs"), num_shards=num_shards, partition=partition,
+            tenant_field="tenant", embeddings=LineEmbeddings()
+        )
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.close()
+
+
+def _documents(count: int) -> List[Document]:
+    return [Document(page_content=f"doc {n}", metadata={"id": f"d{n}", "tenant": f"t{n % 5}"}) for n in range(count)]
+
+
+def _locations(store: ShardedVectorStore) -> Dict[str, int]:
+    return {doc_id: shard for shard, client in enumerate(store.shards) for doc_id in client.rows}
+
+
+def test_jump_hash_is_deterministic_and_in_range():
+    keys = [_key_of(f"chave {n}") for n in range(1000)]
+    for buckets in (1, 2, 7, 64):
+        assigned = [jump_hash(key, buckets) for key in keys]
+        assert assigned == [jump_hash(key, buckets) for key in keys]
+        assert all(0 <= bucket < buckets for bucket in assigned)
+    assert {jump_hash(key, 1) for key in keys} == {0}
+
+
+@pytest.mark.parametrize("buckets", [1, 2, 4, 9])
+def test_jump_hash_moves_about_one_in_n_plus_one_keys_to_the_new_bucket(buckets):
+    keys = [_key_of(f"chave {n}") for n in range(20000)]
+    before = [jump_hash(key, buckets) for key in keys]
+    after = [jump_hash(key, buckets + 1) for key in keys]
+
+    moved = [new for old, new in zip(before, after) if old != new]
+    # Só a chave que vai para o novo bucket muda de lugar
+    assert set(moved) <= {buckets}
+    assert len(moved) / len(keys) == pytest.approx(1 / (buckets + 1), abs=0.02)
+
+
+def test_jump_hash_spreads_keys_evenly():
+    counts = np.bincount([jump_hash(_key_of(f"chave {n}"), 8) for n in range(16000)], minlength=8)
+    assert counts.min() > 0.85 * 2000 and counts.max() < 1.15 * 2000
+
+
+def test_rebalance_moves_documents_only_to_the_new_shard(make_store):
+    store = make_store(2)
+    store.add_documents(_documents(600))
+    before = _locations(store)
+    assert sorted(before) == sorted(f"d{n}" for n in range(600))
+
+    store.rebalance(3)
+    after = _locations(store)
+
+    assert store.layout["num_shards"] == 3 and store.layout["generation"] == 2
+    assert sorted(after) == sorted(before)
+    moved = [doc_id for doc_id in before if after[doc_id] != before[doc_id]]
+    assert all(after[doc_id] == 2 for doc_id in moved)
+    assert len(moved) / len(before) == pytest.approx(1 / 3, abs=0.08)
+
+
+def test_scatter_gather_merges_partials_by_distance(make_store):
+    store = make_store(3)
+    store.add_documents(_documents(200))
+    # Os vizinhos de cada consulta estão espalhados entre os shards
+    assert all(client.rows for client in store.shards)
+
+    # Consultas sem empates de distância, para que a ordem esperada seja única
+    queries = ["doc 0", "doc 57.3", "doc 120.6", "doc 199"]
+    results = store.similarity_search_batch(queries, k=7)
+
+    for query, docs in zip(queries, results):
+        target = float(query.split()[-1])
+        expected = sorted(range(200), key=lambda n: (n - target) ** 2)[:7]
+        assert [int(doc.page_content.split()[-1]) for doc in docs] == expected
+
+
+def test_scatter_gather_returns_at_most_k_when_shards_hold_fewer(make_store):
+    store = make_store(4)
+    store.add_documents(_documents(3))
+    assert [len(docs) for docs in store.similarity_search_batch(["doc 1", "doc 2"], k=10)] == [3, 3]
+
+
+def test_tenant_filter_queries_only_the_owner_shard(make_store):
+    store = make_store(4, partition="tenant")
+    store.add_documents(_documents(100))
+    owner = store._tenant_shard("t3", 4)
+    assert "d3" in store.shards[owner].rows
+
+    docs = store.similarity_search("doc 50", k=4, filter={"tenant": "t3"})
+
+    assert [doc.page_content for doc in docs] == ["doc 48", "doc 53", "doc 43", "doc 58"]
+    assert [client.searches for client in store.shards] == [int(shard == owner) for shard in range(4)]